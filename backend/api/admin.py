@@ -0,0 +1,9 @@
+from django.contrib import admin
+
+from .models import CacheCounter
+
+
+@admin.register(CacheCounter)
+class CacheCounterAdmin(admin.ModelAdmin):
+    list_display = ('key', 'value',)
+    search_fields = ('key',)
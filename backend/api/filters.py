@@ -1,28 +1,82 @@
 from urllib.parse import unquote
 
 from django.contrib.auth import get_user_model
-from django.db.models import Exists, OuterRef
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 import django_filters
 
-from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.tag_mask import filter_by_tags
 
 User = get_user_model()
 
 
+class NumberInFilter(django_filters.BaseInFilter, django_filters.NumberFilter):
+    """Фильтр по списку чисел, переданных через запятую."""
+
+
 class RecipeFilter(django_filters.FilterSet):
-    """Фильтр для рецептов по тегам, избранному, корзине и автору."""
+    """
+    Фильтр для рецептов по тегам, избранному, корзине, автору
+    и имеющимся у пользователя ингредиентам.
+    """
 
     tags = django_filters.ModelMultipleChoiceFilter(
         queryset=Tag.objects.all(),
         field_name='tags__slug',
-        to_field_name='slug')
+        to_field_name='slug',
+        method='filter_by_tags')
     is_favorited = django_filters.CharFilter(method='filter_by_favorites')
     is_in_shopping_cart = django_filters.CharFilter(
         method='filter_by_shopping_cart')
+    have_ingredients = NumberInFilter(method='filter_by_have_ingredients')
+    max_missing = django_filters.NumberFilter(
+        method='filter_by_max_missing', min_value=0)
+    ingredients_all = NumberInFilter(method='filter_by_ingredients_all')
+    ingredients_any = NumberInFilter(method='filter_by_ingredients_any')
+    ingredients_none = NumberInFilter(method='filter_by_ingredients_none')
+    cooking_time_min = django_filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='gte')
+    cooking_time_max = django_filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='lte')
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'is_favorited', 'is_in_shopping_cart', 'author',)
+        fields = ('tags', 'is_favorited', 'is_in_shopping_cart', 'author',
+                  'have_ingredients', 'max_missing', 'ingredients_all',
+                  'ingredients_any', 'ingredients_none', 'cooking_time_min',
+                  'cooking_time_max',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.have_ingredients = None
+
+    def get_recipe_ids(self):
+        """
+        Id отфильтрованных рецептов для страницы списка. При поиске по
+        имеющимся ингредиентам рецепты, прошедшие все фильтры,
+        упорядочиваются индексом ingredient_index по убыванию доли
+        имеющихся ингредиентов, затем по числу недостающих; рецепты,
+        которых ещё нет в индексе процесса, идут в конце.
+        """
+        recipe_ids = self.qs.values_list('pk', flat=True)
+        if self.have_ingredients is None:
+            return recipe_ids
+        filtered = set(recipe_ids.order_by())
+        ranked = [
+            recipe_id for recipe_id, _, _ in ingredient_index.search(
+                self.have_ingredients, recipe_ids=filtered)]
+        ranked.extend(sorted(filtered.difference(ranked), reverse=True))
+        return ranked
+
+    def filter_by_tags(self, queryset, name, value):
+        """
+        Оставляет рецепты хотя бы с одним из тегов, проверяя биты маски
+        тегов рецепта вместо соединения с таблицей тегов.
+        """
+        return filter_by_tags(queryset, [tag.pk for tag in value])
 
     def filter_by_favorites(self, queryset, name, value):
         """Фильтрует рецепты, добавленные в избранное текущим пользователем."""
@@ -34,6 +88,61 @@ class RecipeFilter(django_filters.FilterSet):
         return self._filter_by_relation(queryset, name, value, ShoppingCart,
                                         'recipe')
 
+    def filter_by_have_ingredients(self, queryset, name, value):
+        """
+        Оставляет рецепты, в которых есть хотя бы один из переданных
+        ингредиентов, а вместе с max_missing — только те, для которых
+        не хватает не более указанного числа ингредиентов. Порядок по
+        доле имеющихся ингредиентов задаёт get_recipe_ids после всех
+        остальных фильтров.
+        """
+        ingredient_ids = sorted({int(pk) for pk in value})
+        self.have_ingredients = ingredient_ids
+        queryset = queryset.filter(self._has_ingredients(ingredient_ids))
+        max_missing = self.form.cleaned_data.get('max_missing')
+        if max_missing is None:
+            return queryset
+        missing = (
+            RecipeIngredient.objects
+            .filter(recipe=OuterRef('pk'))
+            .exclude(ingredient_id__in=ingredient_ids)
+            .order_by()
+            .values('recipe')
+            .annotate(count=Count('pk'))
+            .values('count'))
+        return queryset.alias(
+            missing_ingredients=Coalesce(Subquery(missing), 0)
+        ).filter(missing_ingredients__lte=int(max_missing))
+
+    def filter_by_max_missing(self, queryset, name, value):
+        """Применяется вместе с have_ingredients."""
+        return queryset
+
+    def filter_by_ingredients_all(self, queryset, name, value):
+        """Оставляет рецепты, содержащие все переданные ингредиенты."""
+        for ingredient_id in set(value):
+            queryset = queryset.filter(
+                self._has_ingredients([ingredient_id]))
+        return queryset
+
+    def filter_by_ingredients_any(self, queryset, name, value):
+        """Оставляет рецепты хотя бы с одним из переданных ингредиентов."""
+        return queryset.filter(self._has_ingredients(value))
+
+    def filter_by_ingredients_none(self, queryset, name, value):
+        """Исключает рецепты с любым из переданных ингредиентов."""
+        return queryset.filter(~self._has_ingredients(value))
+
+    @staticmethod
+    def _has_ingredients(ingredient_ids):
+        """
+        Подзапрос EXISTS по индексу (ingredient, recipe): в отличие от
+        соединения он не размножает строки рецептов, а в отрицании
+        выполняется как анти-соединение.
+        """
+        return Exists(RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk'), ingredient_id__in=ingredient_ids))
+
     def _filter_by_relation(
             self, queryset, name, value, model, relation_field):
         """Вспомогательный метод для фильтрации по связанным объектам
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from common.cache import namespaces
+
+
+class Command(BaseCommand):
+    help = (
+        'Выводит счётчики обращений к пространствам имён кэша, '
+        'накопленные всеми процессами.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Обнулить счётчики после вывода.',
+        )
+
+    def handle(self, *args, **kwargs):
+        for name, namespace in namespaces.items():
+            counts = namespace.metrics.snapshot()
+            hits = counts['local_hits'] + counts['shared_hits']
+            lookups = hits + counts['misses'] + counts['stale']
+            ratio = f'{hits / lookups:.1%}' if lookups else '—'
+            self.stdout.write(f'{name}: попаданий {ratio}')
+            for counter, value in counts.items():
+                self.stdout.write(f'  {counter}: {value}')
+            if kwargs['reset']:
+                namespace.metrics.reset()
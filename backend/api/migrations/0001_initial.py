@@ -0,0 +1,26 @@
+# Generated by Django 3.2.3 on 2026-10-19 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleState',
+            fields=[
+                ('key', models.CharField(max_length=128, primary_key=True, serialize=False, verbose_name='Ключ')),
+                ('tat', models.FloatField(db_index=True, verbose_name='Теоретическое время следующего запроса')),
+                ('allowed', models.BooleanField(default=True, verbose_name='Последний запрос разрешён')),
+            ],
+            options={
+                'verbose_name': 'Состояние ограничения запросов',
+                'verbose_name_plural': 'Состояния ограничения запросов',
+            },
+        ),
+    ]
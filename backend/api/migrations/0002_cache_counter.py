@@ -0,0 +1,31 @@
+# Generated by Django 3.2.3 on 2026-10-19 14:05
+
+from django.db import migrations, models
+
+
+# Модель CacheCounter перенесена из приложения events; таблицу
+# переименовывает миграция events.0005_move_cache_counter.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+        ('events', '0005_move_cache_counter'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='CacheCounter',
+                    fields=[
+                        ('key', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Ключ')),
+                        ('value', models.BigIntegerField(default=0, verbose_name='Значение')),
+                    ],
+                    options={
+                        'verbose_name': 'Счётчик кэша',
+                        'verbose_name_plural': 'Счётчики кэша',
+                    },
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,53 @@
+from django.db import models
+
+from common.constants import (CACHE_COUNTER_KEY_MAX_LENGTH,
+                              THROTTLE_KEY_MAX_LENGTH)
+
+
+class ThrottleState(models.Model):
+    """
+    Состояние ограничения частоты запросов для пары «область — клиент»:
+    теоретическое время следующего запроса (GCRA) в секундах от начала
+    эпохи и решение по последнему запросу.
+    """
+
+    key = models.CharField(
+        max_length=THROTTLE_KEY_MAX_LENGTH,
+        primary_key=True,
+        verbose_name='Ключ')
+    tat = models.FloatField(
+        db_index=True,
+        verbose_name='Теоретическое время следующего запроса')
+    allowed = models.BooleanField(
+        default=True,
+        verbose_name='Последний запрос разрешён')
+
+    class Meta:
+        verbose_name = 'Состояние ограничения запросов'
+        verbose_name_plural = 'Состояния ограничения запросов'
+
+    def __str__(self):
+        return self.key
+
+
+class CacheCounter(models.Model):
+    """
+    Общий для всех процессов счётчик кэша: версия тега или накопленное
+    значение метрики пространства имён (см. common.cache). Изменяется
+    только атомарным прибавлением common.db.increment.
+    """
+
+    key = models.CharField(
+        max_length=CACHE_COUNTER_KEY_MAX_LENGTH,
+        primary_key=True,
+        verbose_name='Ключ')
+    value = models.BigIntegerField(
+        default=0,
+        verbose_name='Значение')
+
+    class Meta:
+        verbose_name = 'Счётчик кэша'
+        verbose_name_plural = 'Счётчики кэша'
+
+    def __str__(self):
+        return f'{self.key}: {self.value}'
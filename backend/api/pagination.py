@@ -1,4 +1,13 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from common.constants import ERROR_INVALID_CURSOR, FEED_PAGE_SIZE
 
 
 class CommonPagination(PageNumberPagination):
@@ -8,3 +17,67 @@ class CommonPagination(PageNumberPagination):
     """
     page_size = 6
     page_size_query_param = 'limit'
+
+
+class FeedPagination(BasePagination):
+    """
+    Keyset-пагинация по паре (дата публикации, id рецепта).
+
+    Позиция последнего элемента страницы кодируется в параметр "cursor",
+    поэтому стоимость получения страницы не зависит от её номера.
+    """
+    page_size = FEED_PAGE_SIZE
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+
+    def paginate_positions(self, fetch_positions, request):
+        """
+        Получает позиции страницы через fetch_positions(after, limit)
+        и запоминает позицию для ссылки на следующую страницу.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        positions = fetch_positions(self.decode_cursor(request), page_size + 1)
+
+        self.next_position = (
+            positions[page_size - 1] if len(positions) > page_size else None)
+        return positions[:page_size]
+
+    def get_page_size(self, request):
+        limit = request.query_params.get(self.page_size_query_param, '')
+        if limit.isdigit() and int(limit) > 0:
+            return int(limit)
+        return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            pub_date, recipe_id = b64decode(
+                encoded.encode('ascii')).decode('ascii').split('|')
+            position = (parse_datetime(pub_date), int(recipe_id))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(ERROR_INVALID_CURSOR)
+        if position[0] is None:
+            raise NotFound(ERROR_INVALID_CURSOR)
+        return position
+
+    def encode_cursor(self, position):
+        pub_date, recipe_id = position
+        return b64encode(
+            f'{pub_date.isoformat()}|{recipe_id}'.encode('ascii')
+        ).decode('ascii')
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param,
+            self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
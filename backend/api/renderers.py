@@ -0,0 +1,62 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LINE_SEPARATOR = '\u2028'.encode()
+PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON-рендерер на основе orjson с тем же результатом, что и у
+    стандартного JSONRenderer. Типы, которые orjson не сериализует сам
+    (даты и время, Decimal, ленивые строки), передаются в кодировщик DRF,
+    поэтому их представление не меняется.
+
+    Байт в байт ответы совпадают, если в них нет чисел с плавающей
+    точкой в экспоненциальной записи: orjson пишет 1e16 и 1e-7 вместо
+    1e+16 и 1e-07, а 0.000025 — без экспоненты. Значения после разбора
+    JSON при этом одинаковы.
+
+    Если orjson не установлен, а также для ответов с отступами
+    (браузерный API) и нестандартных настроек UNICODE_JSON и COMPACT_JSON
+    используется стандартная реализация.
+
+    В отличие от JSONRenderer с STRICT_JSON, NaN и бесконечности не
+    приводят к ValueError, а записываются как null: поиск таких значений
+    обходом данных обошёлся бы дороже самой сериализации, а сериализаторы
+    API чисел с плавающей точкой не возвращают. Целые числа больше 64 бит
+    сериализуются стандартной реализацией.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context) is not None:
+            return super().render(
+                data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=(
+                    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS))
+        except orjson.JSONEncodeError:
+            # Например, целые числа больше 64 бит.
+            return super().render(
+                data, accepted_media_type, renderer_context)
+
+        # Как и JSONRenderer, экранируем U+2028 и U+2029, чтобы ответ
+        # оставался корректным JavaScript.
+        if LINE_SEPARATOR in ret or PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(LINE_SEPARATOR, b'\\u2028').replace(
+                PARAGRAPH_SEPARATOR, b'\\u2029')
+        return ret
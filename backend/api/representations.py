@@ -0,0 +1,85 @@
+"""
+Быстрое построение представления рецептов для списков.
+
+Функции возвращают ту же структуру, что и RecipeReadSerializer, но
+собирают её из строк .values() и словарей, загруженных фиксированным
+числом запросов на страницу, не создавая полей и вложенных
+сериализаторов DRF для каждой строки.
+
+Представление разделено на общую часть (карточка рецепта, одинаковая
+для всех пользователей, которая читается из проекции RecipeCard) и
+персональные флаги текущего пользователя.
+"""
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+
+from recipes.cards import get_recipe_cards
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription
+
+User = get_user_model()
+
+
+def serialize_recipes(recipe_ids, request):
+    """
+    Возвращает список представлений рецептов в порядке recipe_ids,
+    совпадающий с RecipeReadSerializer(many=True).data. Отсутствующие
+    в базе рецепты пропускаются.
+    """
+    recipe_ids = list(recipe_ids)
+    cards = get_recipe_cards(recipe_ids)
+    author_ids = {card['author']['id'] for card in cards.values()}
+
+    user = request.user
+    if user.is_authenticated:
+        favorited = set(
+            Favorite.objects
+            .filter(user=user, recipe_id__in=cards)
+            .values_list('recipe_id', flat=True))
+        in_shopping_cart = set(
+            ShoppingCart.objects
+            .filter(user=user, recipe_id__in=cards)
+            .values_list('recipe_id', flat=True))
+        subscribed = set(
+            Subscription.objects
+            .filter(user=user, subscribed_to_id__in=author_ids)
+            .values_list('subscribed_to_id', flat=True))
+    else:
+        favorited = in_shopping_cart = subscribed = frozenset()
+
+    urls = {}
+
+    def absolute_url(name):
+        if not name:
+            return None
+        if name not in urls:
+            urls[name] = request.build_absolute_uri(default_storage.url(name))
+        return urls[name]
+
+    data = []
+    for recipe_id in recipe_ids:
+        card = cards.get(recipe_id)
+        if card is None:
+            continue
+        author = card['author']
+        data.append({
+            'id': recipe_id,
+            'name': card['name'],
+            'image': absolute_url(card['image']),
+            'text': card['text'],
+            'cooking_time': card['cooking_time'],
+            'ingredients': card['ingredients'],
+            'tags': card['tags'],
+            'author': {
+                'id': author['id'],
+                'email': author['email'],
+                'username': author['username'],
+                'first_name': author['first_name'],
+                'last_name': author['last_name'],
+                'is_subscribed': author['id'] in subscribed,
+                'avatar': absolute_url(author['avatar']),
+            },
+            'is_favorited': recipe_id in favorited,
+            'is_in_shopping_cart': recipe_id in in_shopping_cart,
+        })
+    return data
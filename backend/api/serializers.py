@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.core.validators import EmailValidator, RegexValidator
+from django.db import transaction
 from djoser.serializers import (
     UserCreateSerializer as BaseUserCreateSerializer,
     UserSerializer as BaseUserSerializer)
@@ -11,9 +12,15 @@ from common.constants import (ABOVE_ZERO_VALUE, EMAIL_MAX_LENGTH,
                               ERROR_EMPTY_TAGS, ERROR_INVALID_USERNAME,
                               ERROR_RECIPES_LIMIT_NOT_DIGIT, NAME_MAX_LENGTH,
                               REGEX)
-from common.fields import Base64ImageField
+from common.fields import (Base64ImageField, BulkPrimaryKeyRelatedField,
+                           is_same_file)
+from common.storage import release_file
+from recipes.cards import refresh_recipe_cards
+from recipes.ingredient_index import ingredient_index
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
+from recipes.similarity import mark_stale
+from recipes.tag_mask import build_tags_mask
 
 User = get_user_model()
 
@@ -40,8 +47,11 @@ class UserSerializer(BaseUserSerializer):
         super().update(instance, validated_data)
 
         if avatar_data:
+            old_avatar = instance.avatar.name
             instance.avatar = avatar_data
             instance.save()
+            if instance.avatar.name != old_avatar:
+                release_file(old_avatar)
 
         return instance
 
@@ -86,6 +96,13 @@ class UserAvatarSerializer(serializers.ModelSerializer):
         model = User
         fields = ('avatar',)
 
+    def update(self, instance, validated_data):
+        old_avatar = instance.avatar.name
+        instance = super().update(instance, validated_data)
+        if instance.avatar.name != old_avatar:
+            release_file(old_avatar)
+        return instance
+
 
 class SubscriptionUserSerializer(UserSerializer):
     """
@@ -154,19 +171,53 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount',)
 
 
+class RecipeIngredientInputListSerializer(serializers.ListSerializer):
+    """
+    Список ингредиентов рецепта, в котором все переданные идентификаторы
+    ингредиентов разрешаются одним запросом, а ошибки для каждого элемента
+    имеют тот же вид, что и при проверке по одному.
+    """
+
+    def to_internal_value(self, data):
+        ingredients_data = super().to_internal_value(data)
+
+        id_field = self.child.fields['id']
+        ingredients = id_field.fetch(
+            [ingredient_data['id'] for ingredient_data in ingredients_data])
+
+        errors = []
+        for ingredient_data in ingredients_data:
+            ingredient = ingredients.get(ingredient_data['id'])
+            if ingredient is None:
+                try:
+                    id_field.fail(
+                        'does_not_exist', pk_value=ingredient_data['id'])
+                except serializers.ValidationError as error:
+                    errors.append({'id': error.detail})
+            else:
+                ingredient_data['id'] = ingredient
+                errors.append({})
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        return ingredients_data
+
+
 class RecipeIngredientInputSerializer(serializers.ModelSerializer):
     """
     Сериализатор для ввода ингредиентов (через id)
     с количеством при создании рецепта.
     """
 
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all())
+    id = BulkPrimaryKeyRelatedField(
+        queryset=Ingredient.objects.all(), deferred=True)
     amount = serializers.IntegerField(min_value=ABOVE_ZERO_VALUE)
 
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'amount',)
+        list_serializer_class = RecipeIngredientInputListSerializer
 
 
 class RecipeReadSerializer(serializers.ModelSerializer):
@@ -199,7 +250,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     image = Base64ImageField(use_url=True)
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         queryset=Tag.objects.all(), many=True)
     ingredients = RecipeIngredientInputSerializer(
         many=True, source='recipe_ingredients')
@@ -237,44 +288,142 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
 
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         tags_data = validated_data.pop('tags')
         ingredients_data = validated_data.pop('recipe_ingredients')
 
-        recipe = Recipe.objects.create(**validated_data)
-        recipe.tags.set(tags_data)
+        recipe = Recipe.objects.create(
+            **validated_data,
+            tags_mask=build_tags_mask(tag.pk for tag in tags_data))
 
-        self._set_ingredients(recipe, ingredients_data)
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag) for tag in tags_data)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=ingredient_data['id'],
+                amount=ingredient_data['amount'])
+            for ingredient_data in ingredients_data)
+        self._update_ingredient_index(recipe, ingredients_data)
+        refresh_recipe_cards([recipe.pk])
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
+        """
+        Обновляет рецепт, записывая в базу только реально изменившиеся
+        данные. Названия изменённых полей, а также 'tags' и 'ingredients',
+        сохраняются в атрибуте changes.
+        """
         tags_data = validated_data.pop('tags')
         ingredients_data = validated_data.pop('recipe_ingredients')
 
-        instance = super().update(instance, validated_data)
-
-        instance.tags.set(tags_data)
+        image = validated_data.get('image')
+        if image is not None and is_same_file(instance.image, image):
+            validated_data.pop('image')
+        old_image = instance.image.name
+
+        self.changes = set()
+        for field_name, value in validated_data.items():
+            field = instance._meta.get_field(field_name)
+            current = getattr(instance, field.attname)
+            if field.is_relation:
+                value_to_compare = value.pk if value is not None else None
+            else:
+                value_to_compare = value
+            # Изображение сюда попадает, только если его содержимое другое.
+            if field_name == 'image' or current != value_to_compare:
+                setattr(instance, field_name, value)
+                self.changes.add(field_name)
+
+        if self.changes:
+            instance.save(update_fields=self.changes)
+        if instance.image.name != old_image:
+            release_file(old_image)
+
+        if self._update_tags(instance, tags_data):
+            self.changes.add('tags')
+        if self._update_ingredients(instance, ingredients_data):
+            self.changes.add('ingredients')
+            mark_stale(instance)
+            self._update_ingredient_index(instance, ingredients_data)
+        if self.changes:
+            refresh_recipe_cards([instance.pk])
 
-        self._set_ingredients(instance, ingredients_data)
         return instance
 
-    def _set_ingredients(self, recipe, ingredients_data):
+    def _update_ingredient_index(self, recipe, ingredients_data):
         """
-        Вспомогательный метод для массового создания объектов RecipeIngredient.
+        Обновляет инвертированный индекс ингредиентов после фиксации
+        транзакции, чтобы откат не оставил в нём несуществующие данные.
         """
-        recipe.recipe_ingredients.all().delete()
-
-        recipe_ingredients = [
-            RecipeIngredient(
-                recipe=recipe,
-                ingredient=ingredient_data['id'],
-                amount=ingredient_data['amount']
-            )
-            for ingredient_data in ingredients_data
-        ]
+        ingredient_ids = [
+            ingredient_data['id'].pk for ingredient_data in ingredients_data]
+        transaction.on_commit(
+            lambda: ingredient_index.update_recipe(recipe.pk, ingredient_ids))
 
-        RecipeIngredient.objects.bulk_create(recipe_ingredients)
+    def _update_tags(self, recipe, tags_data):
+        """
+        Добавляет новые и удаляет исключённые теги рецепта.
+        Возвращает True, если набор тегов изменился.
+        """
+        current_ids = set(recipe.tags.values_list('pk', flat=True))
+        new_ids = {tag.pk for tag in tags_data}
+        if current_ids == new_ids:
+            return False
+
+        removed_ids = current_ids - new_ids
+        added_ids = new_ids - current_ids
+        if removed_ids:
+            Recipe.tags.through.objects.filter(
+                recipe=recipe, tag_id__in=removed_ids).delete()
+        if added_ids:
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(recipe=recipe, tag_id=tag_id)
+                for tag_id in added_ids)
+        recipe.tags_mask = build_tags_mask(new_ids)
+        recipe.save(update_fields=['tags_mask'])
+        return True
+
+    def _update_ingredients(self, recipe, ingredients_data):
+        """
+        Приводит ингредиенты рецепта к переданному списку: удаляет только
+        исключённые, обновляет только изменившиеся количества и создаёт
+        только новые строки. Возвращает True, если что-либо изменилось.
+        """
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipe_ingredients.all()}
+        amounts = {
+            ingredient_data['id'].pk: ingredient_data['amount']
+            for ingredient_data in ingredients_data}
+
+        removed_ids = [
+            recipe_ingredient.pk
+            for ingredient_id, recipe_ingredient in current.items()
+            if ingredient_id not in amounts]
+        changed = []
+        created = []
+        for ingredient_id, amount in amounts.items():
+            recipe_ingredient = current.get(ingredient_id)
+            if recipe_ingredient is None:
+                created.append(RecipeIngredient(
+                    recipe=recipe, ingredient_id=ingredient_id,
+                    amount=amount))
+            elif recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+
+        if removed_ids:
+            RecipeIngredient.objects.filter(pk__in=removed_ids).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        if created:
+            RecipeIngredient.objects.bulk_create(created)
+
+        return bool(removed_ids or changed or created)
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
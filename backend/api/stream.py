@@ -0,0 +1,347 @@
+"""
+Поток Server-Sent Events о новых рецептах авторов, на которых подписан
+пользователь.
+
+Поток обслуживается отдельным ASGI-приложением (см. foodgram_backend.asgi)
+без представлений DRF: соединение держится долго, и на каждое приходится
+только ожидание очереди. В каждом процессе работает один NotificationHub:
+он слушает канал PostgreSQL NOTIFY_CHANNEL через отдельное соединение и
+раскладывает уведомления по очередям клиентов, подписанных на автора.
+
+Идентификатор события — пара «номер транзакции-id» события
+recipe.created в outbox, в порядке которой outbox читают потребители:
+событие транзакции, зафиксированной позже, может получить меньший id.
+Клиент, переподключившийся с заголовком Last-Event-ID, сначала получает
+пропущенные события из outbox (пока они не удалены по сроку хранения).
+
+Браузерный EventSource не умеет передавать заголовки, поэтому вместо
+токена он передаёт в параметре ticket короткоживущий подписанный билет,
+выданный API: адрес запроса записывается в журналы nginx и uvicorn.
+"""
+import asyncio
+from collections import defaultdict
+import json
+import logging
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db import close_old_connections, connection
+import psycopg2
+from rest_framework.authtoken.models import Token
+
+from common.constants import (ERROR_STREAM_INVALID_TOKEN, EVENT_RECIPE_CREATED,
+                              NOTIFY_CHANNEL, NOTIFY_RECIPE,
+                              NOTIFY_RECONNECT_DELAY, NOTIFY_SUBSCRIPTION,
+                              SSE_EVENT_NEW_RECIPE, SSE_HEARTBEAT_INTERVAL,
+                              SSE_QUEUE_SIZE, SSE_REPLAY_LIMIT, SSE_RETRY_MS,
+                              SSE_TICKET_MAX_AGE, SSE_TICKET_SALT)
+from events.models import OutboxEvent
+from events.outbox import after_position
+from recipes.models import Recipe
+from users.models import Subscription
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+HEARTBEAT = b': ping\n\n'
+
+
+class StreamClient:
+    """Очередь уведомлений одного подключения и его подписки на авторов."""
+
+    def __init__(self, user_id, author_ids):
+        self.user_id = user_id
+        self.author_ids = set(author_ids)
+        self.queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+        self.closed = asyncio.Event()
+
+    def put(self, message):
+        """
+        Кладёт уведомление в очередь. Если клиент не успевает читать,
+        поток закрывается: клиент переподключится и получит пропущенное
+        из outbox по Last-Event-ID.
+        """
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.closed.set()
+
+
+class NotificationHub:
+    """Раздаёт уведомления из PostgreSQL клиентам своего процесса."""
+
+    def __init__(self):
+        self.clients_by_author = defaultdict(set)
+        self.clients_by_user = defaultdict(set)
+        self.listener = None
+        self.loop = None
+
+    def add(self, client):
+        self.ensure_listening()
+        self.clients_by_user[client.user_id].add(client)
+        for author_id in client.author_ids:
+            self.clients_by_author[author_id].add(client)
+
+    def remove(self, client):
+        self._discard(self.clients_by_user, client.user_id, client)
+        for author_id in client.author_ids:
+            self._discard(self.clients_by_author, author_id, client)
+
+    def dispatch(self, message):
+        """Передаёт уведомление заинтересованным клиентам."""
+        if message['type'] == NOTIFY_RECIPE:
+            for client in self.clients_by_author.get(
+                    message['author_id'], ()):
+                client.put(message)
+        elif message['type'] == NOTIFY_SUBSCRIPTION:
+            author_id = message['author_id']
+            for client in self.clients_by_user.get(message['user_id'], ()):
+                if message['active']:
+                    client.author_ids.add(author_id)
+                    self.clients_by_author[author_id].add(client)
+                else:
+                    client.author_ids.discard(author_id)
+                    self._discard(self.clients_by_author, author_id, client)
+
+    def ensure_listening(self):
+        if self.listener is not None or connection.vendor != 'postgresql':
+            return
+        self.loop = asyncio.get_running_loop()
+        try:
+            self.listener = psycopg2.connect(
+                **connection.get_connection_params())
+            self.listener.set_isolation_level(
+                psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with self.listener.cursor() as cursor:
+                cursor.execute(f'LISTEN {NOTIFY_CHANNEL}')
+        except psycopg2.Error:
+            logger.exception('Не удалось подписаться на уведомления.')
+            self._reset()
+            return
+        self.loop.add_reader(self.listener.fileno(), self._read)
+
+    def _read(self):
+        try:
+            self.listener.poll()
+        except psycopg2.Error:
+            logger.exception('Соединение для уведомлений потеряно.')
+            self._reset()
+            return
+        while self.listener.notifies:
+            notification = self.listener.notifies.pop(0)
+            self.dispatch(json.loads(notification.payload))
+
+    def _reset(self):
+        """
+        Закрывает соединение и все потоки: уведомления могли быть
+        потеряны, поэтому клиенты переподключатся и догонят их из outbox.
+        """
+        if self.listener is not None:
+            if not self.listener.closed:
+                self.loop.remove_reader(self.listener.fileno())
+                self.listener.close()
+            self.listener = None
+        for clients in self.clients_by_user.values():
+            for client in clients:
+                client.closed.set()
+        self.loop.call_later(NOTIFY_RECONNECT_DELAY, self._reconnect)
+
+    def _reconnect(self):
+        if self.clients_by_user:
+            self.ensure_listening()
+
+    @staticmethod
+    def _discard(index, key, client):
+        clients = index.get(key)
+        if clients is not None:
+            clients.discard(client)
+            if not clients:
+                del index[key]
+
+
+hub = NotificationHub()
+
+
+def format_event_id(xid, event_id):
+    return f'{xid}-{event_id}'
+
+
+def parse_event_id(value):
+    """Пара (номер транзакции, id) из идентификатора события или None."""
+    xid, separator, event_id = value.partition('-')
+    if separator and xid.isdigit() and event_id.isdigit():
+        return int(xid), int(event_id)
+    return None
+
+
+def format_event(event_id, data):
+    payload = json.dumps(data, ensure_ascii=False)
+    return (
+        f'id: {event_id}\nevent: {SSE_EVENT_NEW_RECIPE}\n'
+        f'data: {payload}\n\n').encode()
+
+
+def issue_ticket(user_id):
+    """Подписанный билет для подключения пользователя к потоку."""
+    return signing.TimestampSigner(salt=SSE_TICKET_SALT).sign(str(user_id))
+
+
+def _authenticate(key, ticket):
+    """id активного пользователя по токену или билету либо None."""
+    close_old_connections()
+    if key is not None:
+        token = Token.objects.select_related('user').filter(key=key).first()
+        user = token.user if token is not None else None
+    else:
+        try:
+            user_id = signing.TimestampSigner(salt=SSE_TICKET_SALT).unsign(
+                ticket, max_age=SSE_TICKET_MAX_AGE)
+        except signing.BadSignature:
+            return None
+        user = User.objects.filter(pk=user_id).first()
+    if user is None or not user.is_active:
+        return None
+    return user.pk
+
+
+def _get_author_ids(user_id):
+    close_old_connections()
+    return list(
+        Subscription.objects
+        .filter(user_id=user_id)
+        .values_list('subscribed_to_id', flat=True))
+
+
+def _get_missed_events(last_event, author_ids):
+    """
+    Пропущенные события о новых рецептах после события last_event —
+    пары (номер транзакции, id).
+    """
+    close_old_connections()
+    events = list(
+        OutboxEvent.objects
+        .filter(after_position(*last_event), topic=EVENT_RECIPE_CREATED,
+                payload__author_id__in=list(author_ids))
+        .order_by('xid', 'pk')
+        .values_list('xid', 'pk', 'payload')[:SSE_REPLAY_LIMIT])
+    names = dict(
+        Recipe.objects
+        .filter(pk__in=[payload['recipe_id'] for _, _, payload in events])
+        .values_list('pk', 'name'))
+    return [
+        (format_event_id(xid, event_id),
+         {'id': payload['recipe_id'],
+          'name': names[payload['recipe_id']],
+          'author': payload['author_id']})
+        for xid, event_id, payload in events
+        if payload['recipe_id'] in names]
+
+
+def _get_credentials(scope):
+    headers = dict(scope['headers'])
+    query = parse_qs(scope.get('query_string', b'').decode())
+    # EventSource в браузере не умеет передавать заголовки, поэтому
+    # билет и последний id можно передать и в параметрах запроса.
+    authorization = headers.get(b'authorization', b'').decode()
+    key = (authorization.split(' ', 1)[1]
+           if authorization.startswith('Token ') else None)
+    last_event_id = (
+        headers.get(b'last-event-id', b'').decode()
+        or query.get('last_event_id', [''])[0])
+    return (key, query.get('ticket', [None])[0],
+            parse_event_id(last_event_id))
+
+
+async def _respond(send, status, detail):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': json.dumps({'detail': detail}, ensure_ascii=False).encode(),
+    })
+
+
+async def recipe_stream(scope, receive, send):
+    """ASGI-приложение потока уведомлений о новых рецептах."""
+    if scope['method'] != 'GET':
+        return await _respond(send, 405, 'Метод не разрешён.')
+    key, ticket, last_event = _get_credentials(scope)
+    user_id = (await sync_to_async(_authenticate)(key, ticket)
+               if key or ticket else None)
+    if user_id is None:
+        return await _respond(send, 401, ERROR_STREAM_INVALID_TOKEN)
+
+    client = StreamClient(
+        user_id, await sync_to_async(_get_author_ids)(user_id))
+    # Клиент регистрируется до чтения пропущенных событий, чтобы не
+    # потерять события, зафиксированные во время этого чтения.
+    hub.add(client)
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await _send_body(send, f'retry: {SSE_RETRY_MS}\n\n'.encode())
+
+        replayed = set()
+        if last_event is not None and client.author_ids:
+            for event_id, data in await sync_to_async(_get_missed_events)(
+                    last_event, client.author_ids):
+                replayed.add(event_id)
+                await _send_body(send, format_event(event_id, data))
+
+        closed = asyncio.ensure_future(client.closed.wait())
+        try:
+            while True:
+                message = asyncio.ensure_future(client.queue.get())
+                done, _ = await asyncio.wait(
+                    (message, disconnected, closed),
+                    timeout=SSE_HEARTBEAT_INTERVAL,
+                    return_when=asyncio.FIRST_COMPLETED)
+                if message not in done:
+                    message.cancel()
+                if disconnected in done or closed in done:
+                    break
+                if not done:
+                    await _send_body(send, HEARTBEAT)
+                    continue
+                message = message.result()
+                event_id = format_event_id(message['xid'], message['id'])
+                if event_id in replayed:
+                    continue
+                await _send_body(send, format_event(event_id, {
+                    'id': message['recipe_id'],
+                    'name': message['name'],
+                    'author': message['author_id'],
+                }))
+        finally:
+            closed.cancel()
+        if not disconnected.done():
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnected.cancel()
+        hub.remove(client)
+
+
+async def _send_body(send, body):
+    await send({'type': 'http.response.body', 'body': body,
+                'more_body': True})
+
+
+async def _wait_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
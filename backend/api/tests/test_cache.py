@@ -0,0 +1,110 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase
+
+from api.models import CacheCounter
+from common.cache import (CacheNamespace, Metrics, get_tag_versions,
+                          invalidate_tags)
+from common.constants import CACHE_SHARED_ALIAS
+from common.db import increment
+from events.invalidation import flush_all
+
+
+class IncrementTest(TestCase):
+
+    def check_increment(self):
+        self.assertEqual(increment(CacheCounter, 'counter', 5), 5)
+        self.assertEqual(increment(CacheCounter, 'counter', 2), 7)
+        self.assertEqual(increment(CacheCounter, 'counter', 0), 7)
+        self.assertEqual(
+            increment(CacheCounter, 'other', 0, initial=100), 100)
+        self.assertEqual(
+            dict(CacheCounter.objects.values_list('key', 'value')),
+            {'counter': 7, 'other': 100})
+
+    def test_increment(self):
+        self.check_increment()
+
+    def test_orm_fallback(self):
+        with mock.patch('common.db.RETURNING_VENDORS', ()):
+            self.check_increment()
+
+
+@mock.patch('common.cache.CACHE_METRICS_FLUSH_INTERVAL', 3600)
+class CacheCountersTest(TestCase):
+
+    def setUp(self):
+        flush_all()
+
+    def test_metrics_flushes_accumulate(self):
+        metrics = Metrics('test')
+        metrics._flush({'misses': 2, 'builds': 1})
+        metrics._flush({'misses': 3})
+        Metrics('test')._flush({'misses': 1})
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['misses'], 6)
+        self.assertEqual(snapshot['builds'], 1)
+        self.assertEqual(snapshot['local_hits'], 0)
+
+        metrics.reset()
+        self.assertEqual(metrics.snapshot()['misses'], 0)
+
+    def test_tag_versions_survive_shared_cache_clear(self):
+        version = get_tag_versions(['tag'])['tag']
+        invalidate_tags('tag')
+        invalidate_tags('tag')
+
+        caches[CACHE_SHARED_ALIAS].clear()
+        flush_all()
+
+        self.assertEqual(get_tag_versions(['tag'])['tag'], version + 2)
+
+    def test_invalidation_makes_entries_stale(self):
+        namespace = CacheNamespace(
+            'test', timeout=60, local_timeout=60, local_max_entries=10)
+        namespace.set('key', 'value', tags=['tag'])
+        self.assertEqual(namespace.get('key'), 'value')
+
+        invalidate_tags('tag')
+
+        self.assertIsNone(namespace.get('key'))
+
+    def test_get_or_set_counts_one_miss(self):
+        namespace = CacheNamespace(
+            'test', timeout=60, local_timeout=60, local_max_entries=10)
+
+        self.assertEqual(namespace.get_or_set('key', lambda: 1), 1)
+        self.assertEqual(namespace.get_or_set('key', lambda: 2), 1)
+
+        self.assertEqual(dict(namespace.metrics.counts), {
+            'misses': 1, 'builds': 1, 'sets': 1, 'local_hits': 1})
+
+    def test_coalesced_call_counts_one_miss(self):
+        namespace = CacheNamespace(
+            'test', timeout=60, local_timeout=60, local_max_entries=10,
+            shared=False)
+        # Версия тега читается заранее, чтобы потоки не обращались к базе.
+        get_tag_versions(['test'])
+        building = threading.Event()
+
+        def builder():
+            building.set()
+            time.sleep(0.2)
+            return 'value'
+
+        results = []
+        leader = threading.Thread(
+            target=lambda: results.append(
+                namespace.get_or_set('key', builder)))
+        leader.start()
+        building.wait()
+        results.append(namespace.get_or_set('key', builder))
+        leader.join()
+
+        self.assertEqual(results, ['value', 'value'])
+        self.assertEqual(dict(namespace.metrics.counts), {
+            'misses': 2, 'builds': 1, 'coalesced': 1, 'sets': 1})
@@ -0,0 +1,144 @@
+import gzip
+from unittest import mock, skipIf
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+
+from common import compression
+from common.compression import (CompressionMiddleware, choose_encoding,
+                                parse_accept_encoding)
+from common.constants import COMPRESSION_MIN_SIZE, NDJSON_CONTENT_TYPE
+from events.invalidation import flush_all
+
+JSON = 'application/json'
+BODY = b'{"name": "' + b'a' * COMPRESSION_MIN_SIZE + b'"}'
+
+
+class AcceptEncodingTest(SimpleTestCase):
+
+    def choose(self, header):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=header)
+        return choose_encoding(request)
+
+    def test_parse_skips_zero_weight(self):
+        self.assertEqual(
+            parse_accept_encoding('gzip;q=0, br; q=0.5, deflate;q=x, '),
+            {'br'})
+
+    @mock.patch('common.compression.brotli', object())
+    def test_prefers_brotli(self):
+        cases = [
+            ('gzip, deflate, br', compression.BROTLI),
+            ('br;q=0, gzip', compression.GZIP),
+            ('gzip;q=0.0, br;q=0', None),
+            ('*', compression.BROTLI),
+            ('identity', None),
+            ('', None),
+        ]
+        for header, expected in cases:
+            with self.subTest(header=header):
+                self.assertEqual(self.choose(header), expected)
+
+    @mock.patch('common.compression.brotli', None)
+    def test_gzip_without_brotli(self):
+        self.assertEqual(self.choose('br, gzip'), compression.GZIP)
+        self.assertIsNone(self.choose('br'))
+
+
+@mock.patch('common.compression.brotli', None)
+class CompressionMiddlewareTest(TestCase):
+
+    def setUp(self):
+        flush_all()
+
+    def process(self, response, encoding='gzip, br', **extra):
+        request = RequestFactory().get(
+            '/api/recipes/', HTTP_ACCEPT_ENCODING=encoding, **extra)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def assert_not_compressed(self, response, body):
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, body)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_compresses_json(self):
+        response = self.process(HttpResponse(BODY, content_type=JSON))
+
+        self.assertEqual(response['Content-Encoding'], compression.GZIP)
+        self.assertEqual(gzip.decompress(response.content), BODY)
+        self.assertEqual(
+            response['Content-Length'], str(len(response.content)))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_small_response_is_not_compressed(self):
+        body = b'{"a": 1}'
+        self.assert_not_compressed(
+            self.process(HttpResponse(body, content_type=JSON)), body)
+
+    def test_html_is_not_compressed(self):
+        body = b'<html>' + b'a' * COMPRESSION_MIN_SIZE + b'</html>'
+        self.assert_not_compressed(
+            self.process(HttpResponse(body, content_type='text/html')),
+            body)
+
+    def test_client_without_compression(self):
+        for header in ('', 'identity', 'gzip;q=0'):
+            with self.subTest(header=header):
+                self.assert_not_compressed(
+                    self.process(
+                        HttpResponse(BODY, content_type=JSON), header),
+                    BODY)
+
+    def test_streaming_ndjson(self):
+        lines = [b'{"id": %d}\n' % index for index in range(1000)]
+        response = self.process(StreamingHttpResponse(
+            iter(lines), content_type=NDJSON_CONTENT_TYPE))
+
+        self.assertEqual(response['Content-Encoding'], compression.GZIP)
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)),
+            b''.join(lines))
+
+    def test_strong_etag_becomes_weak(self):
+        for etag, expected in (('"abc"', 'W/"abc"'), ('W/"abc"', 'W/"abc"')):
+            with self.subTest(etag=etag):
+                response = HttpResponse(BODY, content_type=JSON)
+                response['ETag'] = etag
+                self.assertEqual(self.process(response)['ETag'], expected)
+
+    def test_uncompressed_response_keeps_strong_etag(self):
+        response = HttpResponse(BODY, content_type=JSON)
+        response['ETag'] = '"abc"'
+
+        response = self.process(response, encoding='')
+
+        self.assertEqual(response['ETag'], '"abc"')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_shared_response_is_compressed_once(self):
+        with mock.patch(
+                'common.compression.compress',
+                wraps=compression.compress) as compress:
+            for _ in range(2):
+                response = self.process(HttpResponse(BODY, content_type=JSON))
+                self.assertEqual(gzip.decompress(response.content), BODY)
+            self.process(
+                HttpResponse(BODY, content_type=JSON),
+                HTTP_AUTHORIZATION='Token abc')
+
+        self.assertEqual(compress.call_count, 2)
+
+
+@skipIf(compression.brotli is None, 'brotli не установлен.')
+class BrotliCompressionTest(TestCase):
+
+    def test_compresses_with_brotli(self):
+        request = RequestFactory().get(
+            '/api/recipes/', HTTP_ACCEPT_ENCODING='gzip, br')
+        response = CompressionMiddleware(
+            lambda request: HttpResponse(BODY, content_type=JSON))(request)
+
+        self.assertEqual(response['Content-Encoding'], compression.BROTLI)
+        self.assertEqual(
+            compression.brotli.decompress(response.content), BODY)
@@ -0,0 +1,228 @@
+import os
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, tag
+
+from api.filters import RecipeFilter
+from events.invalidation import flush_all
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from recipes.tests.utils import (create_catalog, create_recipe, create_user,
+                                 token_client)
+
+User = get_user_model()
+
+# Размер набора данных для замеров; для проверки на миллионе рецептов
+# задайте BENCHMARK_RECIPES=1000000.
+BENCHMARK_RECIPES = int(os.getenv('BENCHMARK_RECIPES', 20000))
+BENCHMARK_INGREDIENTS = 500
+BENCHMARK_RECIPE_INGREDIENTS = 8
+BENCHMARK_BATCH_SIZE = 5000
+BENCHMARK_MAX_SECONDS = 0.1
+
+
+def get_ids(response):
+    return [item['id'] for item in response.data['results']]
+
+
+class RecipeFilterTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        _, cls.ingredients = create_catalog(tags=0, ingredients=4)
+        milk, eggs, flour, nuts = cls.ingredients
+        cls.omelette = create_recipe(
+            cls.author, [milk, eggs], name='Омлет', cooking_time=10)
+        cls.pancakes = create_recipe(
+            cls.author, [milk, eggs, flour], name='Блины', cooking_time=30)
+        cls.cookies = create_recipe(
+            cls.author, [flour, nuts], name='Печенье', cooking_time=60)
+
+    def setUp(self):
+        flush_all()
+
+    def get(self, **params):
+        response = token_client().get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return set(get_ids(response))
+
+    def ids(self, *ingredients):
+        return ','.join(str(ingredient.pk) for ingredient in ingredients)
+
+    def test_ingredient_filters(self):
+        milk, eggs, flour, nuts = self.ingredients
+        cases = [
+            ({'ingredients_all': self.ids(milk, flour)}, {self.pancakes}),
+            ({'ingredients_any': self.ids(eggs, nuts)},
+             {self.omelette, self.pancakes, self.cookies}),
+            ({'ingredients_none': self.ids(nuts)},
+             {self.omelette, self.pancakes}),
+            ({'ingredients_any': self.ids(flour),
+              'ingredients_none': self.ids(milk)}, {self.cookies}),
+        ]
+        for params, expected in cases:
+            with self.subTest(params=params):
+                self.assertEqual(
+                    self.get(**params), {recipe.pk for recipe in expected})
+
+    def test_cooking_time_range(self):
+        self.assertEqual(
+            self.get(cooking_time_min=10, cooking_time_max=30),
+            {self.omelette.pk, self.pancakes.pk})
+
+    def test_have_ingredients_orders_by_coverage(self):
+        milk, eggs, _, _ = self.ingredients
+        response = token_client().get(
+            '/api/recipes/', {'have_ingredients': self.ids(milk, eggs)})
+
+        self.assertEqual(
+            get_ids(response), [self.omelette.pk, self.pancakes.pk])
+
+    def test_have_ingredients_ranks_after_other_filters(self):
+        milk, eggs, _, _ = self.ingredients
+        other = create_recipe(create_user('other'), [milk], name='Молоко')
+        params = {'have_ingredients': self.ids(milk, eggs)}
+
+        self.assertEqual(
+            get_ids(token_client().get('/api/recipes/', params)),
+            [other.pk, self.omelette.pk, self.pancakes.pk])
+        self.assertEqual(
+            get_ids(token_client().get(
+                '/api/recipes/',
+                {**params, 'author': self.author.pk, 'limit': 1})),
+            [self.omelette.pk])
+        self.assertEqual(
+            get_ids(token_client().get(
+                '/api/recipes/', {**params, 'cooking_time_min': 20})),
+            [self.pancakes.pk])
+
+    def test_have_ingredients_with_max_missing(self):
+        milk, eggs, flour, _ = self.ingredients
+        cases = [
+            ({'have_ingredients': self.ids(milk, eggs), 'max_missing': 0},
+             [self.omelette.pk]),
+            ({'have_ingredients': self.ids(milk, eggs), 'max_missing': 1},
+             [self.omelette.pk, self.pancakes.pk]),
+            ({'have_ingredients': self.ids(flour), 'max_missing': 1},
+             [self.cookies.pk]),
+        ]
+        for params, expected in cases:
+            with self.subTest(params=params):
+                response = token_client().get('/api/recipes/', params)
+                self.assertEqual(get_ids(response), expected)
+
+    def test_have_ingredients_is_not_limited(self):
+        milk = self.ingredients[0]
+        recipes = [
+            create_recipe(self.author, [milk], name=f'Рецепт {index}')
+            for index in range(20)]
+        response = token_client().get(
+            '/api/recipes/',
+            {'have_ingredients': self.ids(milk), 'limit': 100})
+
+        self.assertEqual(response.data['count'], 22)
+        self.assertEqual(
+            get_ids(response)[:20],
+            sorted((recipe.pk for recipe in recipes), reverse=True))
+
+    def test_recipe_missing_from_index_is_listed_last(self):
+        milk = self.ingredients[0]
+        self.get(have_ingredients=self.ids(milk))
+        # Рецепт создан в обход API и ещё не попал в индекс процесса.
+        late = create_recipe(self.author, [milk], name='Поздний')
+
+        response = token_client().get(
+            '/api/recipes/', {'have_ingredients': self.ids(milk)})
+
+        self.assertEqual(get_ids(response)[-1], late.pk)
+        self.assertEqual(response.data['count'], 3)
+
+
+@tag('benchmark')
+class RecipeFilterBenchmark(TestCase):
+    """
+    Замеры фильтров по ингредиентам и времени приготовления на наборе из
+    BENCHMARK_RECIPES рецептов. Каждый запрос страницы API должен
+    укладываться в BENCHMARK_MAX_SECONDS. Время зависит от машины,
+    поэтому в CI тесты исключены через --exclude-tag benchmark.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(0)
+        author = create_user('author')
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {index}', measurement_unit='г')
+            for index in range(BENCHMARK_INGREDIENTS))
+        ingredient_ids = list(
+            Ingredient.objects.values_list('pk', flat=True))
+        for start in range(0, BENCHMARK_RECIPES, BENCHMARK_BATCH_SIZE):
+            count = min(BENCHMARK_BATCH_SIZE, BENCHMARK_RECIPES - start)
+            Recipe.objects.bulk_create(
+                Recipe(author=author, name=f'Рецепт {start + index}',
+                       short_code=f'{start + index:x}', text='Описание',
+                       image='recipe_images/test.png',
+                       cooking_time=rng.randint(5, 180))
+                for index in range(count))
+        recipe_ids = Recipe.objects.values_list('pk', flat=True).iterator(
+            chunk_size=BENCHMARK_BATCH_SIZE)
+        batch = []
+        for recipe_id in recipe_ids:
+            batch.extend(
+                RecipeIngredient(recipe_id=recipe_id, ingredient_id=pk,
+                                 amount=1)
+                for pk in rng.sample(
+                    ingredient_ids, BENCHMARK_RECIPE_INGREDIENTS))
+            if len(batch) >= BENCHMARK_BATCH_SIZE:
+                RecipeIngredient.objects.bulk_create(batch)
+                batch = []
+        RecipeIngredient.objects.bulk_create(batch)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        cls.ingredient_ids = ingredient_ids
+
+    def setUp(self):
+        flush_all()
+
+    def assert_fast(self, params):
+        client = token_client()
+        timings = []
+        for _ in range(5):
+            started = time.perf_counter()
+            response = client.get('/api/recipes/', params)
+            timings.append(time.perf_counter() - started)
+            self.assertEqual(response.status_code, 200, response.data)
+        self.assertLess(
+            min(timings), BENCHMARK_MAX_SECONDS,
+            f'{params}: {min(timings) * 1000:.1f} мс '
+            f'на {BENCHMARK_RECIPES} рецептах')
+
+    def test_ingredients_none_with_cooking_time(self):
+        self.assert_fast({
+            'ingredients_none': ','.join(map(str, self.ingredient_ids[:5])),
+            'cooking_time_max': 30})
+
+    def test_ingredients_all(self):
+        self.assert_fast({
+            'ingredients_all': ','.join(map(str, self.ingredient_ids[:2]))})
+
+    def test_cooking_time_range(self):
+        self.assert_fast({'cooking_time_min': 20, 'cooking_time_max': 25})
+
+    def test_have_ingredients_with_common_ingredient(self):
+        self.assert_fast({
+            'have_ingredients': ','.join(map(str, self.ingredient_ids[:3])),
+            'cooking_time_max': 30})
+
+    def test_ingredients_none_is_anti_join(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('План запроса проверяется на PostgreSQL.')
+        queryset = RecipeFilter(
+            {'ingredients_none': str(self.ingredient_ids[0])},
+            queryset=Recipe.objects.all()).qs
+
+        self.assertIn('Anti Join', queryset.explain())
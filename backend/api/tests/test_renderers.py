@@ -0,0 +1,108 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+import json
+import timeit
+from unittest import skipIf
+import uuid
+
+from django.test import SimpleTestCase, tag
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from api.renderers import FastJSONRenderer, orjson
+
+
+def render(renderer_class, data):
+    return renderer_class().render(data, 'application/json', {})
+
+
+def recipe_list(count):
+    """Данные, похожие на страницу списка рецептов."""
+    return ReturnDict({
+        'count': count,
+        'next': None,
+        'previous': None,
+        'results': ReturnList([{
+            'id': index,
+            'tags': [{'id': 1, 'name': 'Завтрак', 'slug': 'breakfast'}],
+            'author': {
+                'id': index, 'username': f'user{index}',
+                'first_name': 'Имя', 'last_name': 'Фамилия',
+                'email': f'user{index}@example.com',
+                'is_subscribed': False, 'avatar': None,
+            },
+            'ingredients': [
+                {'id': number, 'name': f'Ингредиент {number}',
+                 'measurement_unit': 'г', 'amount': number}
+                for number in range(10)],
+            'is_favorited': False,
+            'is_in_shopping_cart': True,
+            'name': f'Рецепт {index}',
+            'image': f'http://testserver/media/images/{index:064x}.png',
+            'text': 'Описание рецепта\nв несколько строк ' * 10,
+            'cooking_time': 30,
+        } for index in range(count)], serializer=None),
+    }, serializer=None)
+
+
+@skipIf(orjson is None, 'orjson не установлен.')
+class FastJSONRendererTest(SimpleTestCase):
+
+    def assert_same(self, data):
+        self.assertEqual(
+            render(FastJSONRenderer, data), render(JSONRenderer, data))
+
+    def test_matches_drf_renderer(self):
+        cases = [
+            recipe_list(3),
+            {'date': date(2024, 1, 2), 'time': time(3, 4, 5, 600000),
+             'datetime': timezone.now(), 'naive': datetime(2024, 1, 2, 3),
+             'duration': timedelta(hours=1, seconds=5)},
+            {'decimal': Decimal('1.50'), 'uuid': uuid.uuid4(),
+             'lazy': gettext_lazy('Рецепт'), 'tuple': (1, 2)},
+            {'text': 'строка "в кавычках" \\ \n \u2028 \u2029'},
+            {'float': 0.1, 'big': 10 ** 30, 'negative': -2 ** 70,
+             'nested': [[{'a': [None]}]]},
+            {1: 'числовой ключ'},
+            [], {}, 'строка', 0,
+        ]
+        for data in cases:
+            with self.subTest(data=data):
+                self.assert_same(data)
+
+    def test_float_values_match_drf_renderer(self):
+        data = {'floats': [
+            0.1, 1e16, 1e-7, 2.5e-5, 1.5e300, -0.0, 123456789.123]}
+
+        self.assertEqual(
+            json.loads(render(FastJSONRenderer, data)),
+            json.loads(render(JSONRenderer, data)))
+
+    def test_none_renders_empty_body(self):
+        self.assertEqual(render(FastJSONRenderer, None), b'')
+
+    def test_non_finite_float_is_rendered_as_null(self):
+        for value in (float('nan'), float('inf'), float('-inf')):
+            with self.subTest(value=value):
+                self.assertEqual(
+                    render(FastJSONRenderer, {'score': value}),
+                    b'{"score":null}')
+
+
+@tag('benchmark')
+@skipIf(orjson is None, 'orjson не установлен.')
+class FastJSONRendererBenchmark(SimpleTestCase):
+
+    def test_faster_than_drf_renderer(self):
+        data = recipe_list(100)
+        timings = {
+            renderer_class: min(timeit.repeat(
+                lambda: render(renderer_class, data), number=10, repeat=5))
+            for renderer_class in (JSONRenderer, FastJSONRenderer)}
+        self.assertLess(
+            timings[FastJSONRenderer], timings[JSONRenderer] / 2,
+            f'JSONRenderer: {timings[JSONRenderer] * 100:.2f} мс, '
+            f'FastJSONRenderer: {timings[FastJSONRenderer] * 100:.2f} мс '
+            f'на страницу из 100 рецептов')
@@ -0,0 +1,88 @@
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from api.representations import serialize_recipes
+from api.serializers import RecipeReadSerializer
+from events.invalidation import flush_all
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.tests.utils import (create_catalog, create_recipe, create_user,
+                                 token_client)
+from users.models import Subscription
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+class SerializeRecipesParityTest(TestCase):
+    """
+    Быстрое представление списков должно совпадать с
+    RecipeReadSerializer байт в байт.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags, ingredients = create_catalog(tags=3, ingredients=5)
+        cls.ingredients = [ingredients[3], ingredients[0], ingredients[4]]
+        cls.author = create_user(
+            'author', avatar='profile_pictures/avatar.png')
+        cls.other_author = create_user('other_author')
+        cls.reader = create_user('reader')
+        # Ингредиенты и теги добавляются не по возрастанию id, чтобы
+        # проверить явную сортировку.
+        cls.recipe = create_recipe(
+            cls.author, ingredients=cls.ingredients,
+            tags=[cls.tags[2], cls.tags[0]], name='Первый')
+        cls.other_recipe = create_recipe(
+            cls.other_author, ingredients=[ingredients[1]],
+            tags=[cls.tags[1]], name='Второй')
+        Subscription.objects.create(user=cls.reader, subscribed_to=cls.author)
+        Favorite.objects.create(user=cls.reader, recipe=cls.recipe)
+        ShoppingCart.objects.create(
+            user=cls.reader, recipe=cls.other_recipe)
+
+    def setUp(self):
+        flush_all()
+
+    def clients(self):
+        return {
+            'anonymous': token_client(),
+            'authenticated': token_client(self.reader),
+        }
+
+    def test_list_matches_serializer(self):
+        for name, client in self.clients().items():
+            with self.subTest(user=name):
+                response = client.get('/api/recipes/')
+                self.assertEqual(response.status_code, 200)
+                results = response.data['results']
+                recipes = [
+                    Recipe.objects.get(pk=item['id']) for item in results]
+                expected = RecipeReadSerializer(
+                    recipes, many=True,
+                    context={'request': response.wsgi_request}).data
+
+                self.assertEqual(len(results), 2)
+                self.assertEqual(render(results), render(expected))
+
+    def test_detail_matches_fast_representation(self):
+        for name, client in self.clients().items():
+            for recipe in (self.recipe, self.other_recipe):
+                with self.subTest(user=name, recipe=recipe.name):
+                    response = client.get(f'/api/recipes/{recipe.pk}/')
+                    self.assertEqual(response.status_code, 200)
+                    expected = serialize_recipes(
+                        [recipe.pk], response.wsgi_request)
+
+                    self.assertEqual(
+                        render(response.data), render(expected[0]))
+
+    def test_ingredients_keep_order_and_tags_are_sorted(self):
+        response = token_client().get(f'/api/recipes/{self.recipe.pk}/')
+
+        self.assertEqual(
+            [item['id'] for item in response.data['ingredients']],
+            [ingredient.pk for ingredient in self.ingredients])
+        self.assertEqual(
+            [item['id'] for item in response.data['tags']],
+            [self.tags[0].pk, self.tags[2].pk])
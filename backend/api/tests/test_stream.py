@@ -0,0 +1,243 @@
+import asyncio
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+
+from api.stream import format_event_id, hub, issue_ticket, recipe_stream
+from common.constants import (EVENT_RECIPE_CREATED, NOTIFY_RECIPE,
+                              NOTIFY_SUBSCRIPTION, SSE_PATH)
+from events.models import OutboxEvent
+from recipes.tests.utils import create_recipe, create_user, token_client
+from users.models import Subscription
+
+TICKET_URL = '/api/recipes/stream-ticket/'
+TIMEOUT = 5
+
+
+def parse_event(body):
+    fields = dict(
+        line.split(': ', 1) for line in body.decode().splitlines() if line)
+    return fields['id'], json.loads(fields['data'])
+
+
+class Connection:
+    """Подключение к ASGI-приложению потока, запущенному в тесте."""
+
+    def __init__(self, sent):
+        self.sent = sent
+
+    async def read(self):
+        return await asyncio.wait_for(self.sent.get(), TIMEOUT)
+
+    async def read_event(self):
+        return parse_event((await self.read())['body'])
+
+
+@mock.patch('api.stream.close_old_connections', lambda: None)
+class RecipeStreamTest(TestCase):
+
+    def setUp(self):
+        self.reader = create_user('reader')
+        self.author = create_user('author')
+
+    def run_stream(self, scenario, headers=(), query='', method='GET'):
+        """
+        Выполняет scenario(connection) над открытым потоком и отключает
+        клиента. Возвращает ответ, если приложение завершилось само.
+        """
+        scope = {
+            'type': 'http', 'method': method, 'path': SSE_PATH,
+            'headers': [(name.encode(), value.encode())
+                        for name, value in headers],
+            'query_string': query.encode(),
+        }
+
+        async def main():
+            sent = asyncio.Queue()
+            disconnected = asyncio.Event()
+
+            async def receive():
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            task = asyncio.ensure_future(
+                recipe_stream(scope, receive, sent.put))
+            try:
+                return await scenario(Connection(sent))
+            finally:
+                disconnected.set()
+                await asyncio.wait_for(task, TIMEOUT)
+
+        return async_to_sync(main)()
+
+    def respond(self, **kwargs):
+        async def scenario(connection):
+            start = await connection.read()
+            body = await connection.read()
+            return start['status'], body['body']
+        return self.run_stream(scenario, **kwargs)
+
+    def authorization(self):
+        token, _ = Token.objects.get_or_create(user=self.reader)
+        return [('authorization', f'Token {token.key}')]
+
+    def event(self, recipe, xid=0):
+        return OutboxEvent.objects.create(
+            topic=EVENT_RECIPE_CREATED, xid=xid,
+            payload={'recipe_id': recipe.pk, 'author_id': recipe.author_id})
+
+    def notification(self, event, recipe):
+        return {'type': NOTIFY_RECIPE, 'id': event.pk, 'xid': event.xid,
+                'recipe_id': recipe.pk, 'author_id': recipe.author_id,
+                'name': recipe.name}
+
+
+class StreamAuthenticationTest(RecipeStreamTest):
+
+    def test_token_header(self):
+        status, body = self.respond(headers=self.authorization())
+
+        self.assertEqual(status, 200)
+        self.assertTrue(body.startswith(b'retry: '))
+
+    def test_ticket(self):
+        response = token_client(self.reader).post(TICKET_URL)
+        self.assertEqual(response.status_code, 200)
+
+        status, _ = self.respond(query=f'ticket={response.data["ticket"]}')
+
+        self.assertEqual(status, 200)
+
+    def test_token_in_query_is_rejected(self):
+        key = self.authorization()[0][1].split(' ', 1)[1]
+
+        self.assertEqual(self.respond(query=f'token={key}')[0], 401)
+
+    def test_invalid_credentials(self):
+        cases = {
+            'без учётных данных': {},
+            'неверный токен': {
+                'headers': [('authorization', 'Token invalid')]},
+            'поддельный билет': {'query': f'ticket={self.reader.pk}:bad'},
+        }
+        for name, kwargs in cases.items():
+            with self.subTest(name):
+                self.assertEqual(self.respond(**kwargs)[0], 401)
+
+    @mock.patch('api.stream.SSE_TICKET_MAX_AGE', -1)
+    def test_expired_ticket(self):
+        ticket = issue_ticket(self.reader.pk)
+
+        self.assertEqual(self.respond(query=f'ticket={ticket}')[0], 401)
+
+    def test_inactive_user(self):
+        ticket = issue_ticket(self.reader.pk)
+        headers = self.authorization()
+        self.reader.is_active = False
+        self.reader.save()
+
+        self.assertEqual(self.respond(query=f'ticket={ticket}')[0], 401)
+        self.assertEqual(self.respond(headers=headers)[0], 401)
+
+    def test_ticket_requires_authentication(self):
+        response = token_client().post(TICKET_URL)
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_method_not_allowed(self):
+        self.assertEqual(
+            self.respond(headers=self.authorization(), method='POST')[0], 405)
+
+
+class StreamDeliveryTest(RecipeStreamTest):
+
+    def setUp(self):
+        super().setUp()
+        Subscription.objects.create(
+            user=self.reader, subscribed_to=self.author)
+        self.recipes = [
+            create_recipe(self.author, name=f'Рецепт {index}')
+            for index in range(3)]
+
+    def test_replay_follows_transaction_order(self):
+        # Транзакция с меньшим номером зафиксировалась позже и записала
+        # событие с большим id.
+        first = self.event(self.recipes[0], xid=10)
+        late = self.event(self.recipes[1], xid=5)
+        last = self.event(self.recipes[2], xid=10)
+        last_event_id = format_event_id(late.xid, late.pk)
+
+        async def scenario(connection):
+            await connection.read()
+            await connection.read()
+            return [await connection.read_event() for _ in range(2)]
+
+        events = self.run_stream(
+            scenario, headers=self.authorization()
+            + [('last-event-id', last_event_id)])
+
+        self.assertEqual(events, [
+            (format_event_id(10, first.pk), {
+                'id': self.recipes[0].pk, 'name': 'Рецепт 0',
+                'author': self.author.pk}),
+            (format_event_id(10, last.pk), {
+                'id': self.recipes[2].pk, 'name': 'Рецепт 2',
+                'author': self.author.pk}),
+        ])
+
+    def test_replayed_events_are_not_sent_again(self):
+        replayed = [self.event(recipe) for recipe in self.recipes[:2]]
+        new_recipe = create_recipe(self.author, name='Новый')
+
+        async def scenario(connection):
+            await connection.read()
+            await connection.read()
+            event_ids = [(await connection.read_event())[0]]
+            # Уведомление о событии, уже отправленном из outbox.
+            hub.dispatch(self.notification(replayed[1], self.recipes[1]))
+            new_event = await sync_to_async(self.event)(new_recipe)
+            hub.dispatch(self.notification(new_event, new_recipe))
+            event_ids.append((await connection.read_event())[0])
+            return event_ids, new_event
+
+        event_ids, new_event = self.run_stream(
+            scenario, headers=self.authorization(),
+            query='last_event_id=' + format_event_id(0, replayed[0].pk))
+
+        self.assertEqual(event_ids, [
+            format_event_id(0, replayed[1].pk),
+            format_event_id(0, new_event.pk)])
+
+    def test_subscription_updates(self):
+        other = create_user('other')
+        other_recipe = create_recipe(other, name='Чужой')
+        recipe = self.recipes[0]
+        events = [self.event(other_recipe) for _ in range(3)]
+        events.append(self.event(recipe))
+
+        def subscription(active):
+            return {'type': NOTIFY_SUBSCRIPTION, 'user_id': self.reader.pk,
+                    'author_id': other.pk, 'active': active}
+
+        async def scenario(connection):
+            await connection.read()
+            await connection.read()
+            received = []
+            hub.dispatch(self.notification(events[0], other_recipe))
+            hub.dispatch(subscription(True))
+            hub.dispatch(self.notification(events[1], other_recipe))
+            received.append(await connection.read_event())
+            hub.dispatch(subscription(False))
+            hub.dispatch(self.notification(events[2], other_recipe))
+            hub.dispatch(self.notification(events[3], recipe))
+            received.append(await connection.read_event())
+            return [data['name'] for _, data in received]
+
+        self.assertEqual(
+            self.run_stream(scenario, headers=self.authorization()),
+            ['Чужой', recipe.name])
+        self.assertEqual(hub.clients_by_user, {})
+        self.assertEqual(hub.clients_by_author, {})
@@ -0,0 +1,93 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import skipUnless
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from api.models import ThrottleState
+from api.throttling import TokenBucketThrottle
+
+REST_FRAMEWORK = {'DEFAULT_THROTTLE_RATES': {'read': '3/min'}}
+INTERVAL = 20
+
+
+def make_request(address='10.0.0.1'):
+    return SimpleNamespace(
+        method='GET', user=AnonymousUser(),
+        META={'REMOTE_ADDR': address})
+
+
+def make_throttle(now):
+    throttle = TokenBucketThrottle()
+    throttle.timer = lambda: now
+    return throttle
+
+
+@override_settings(REST_FRAMEWORK=REST_FRAMEWORK)
+class TokenBucketThrottleTest(TestCase):
+
+    def allow(self, now, address='10.0.0.1'):
+        throttle = make_throttle(now)
+        return (
+            throttle.allow_request(make_request(address), view=None),
+            throttle.wait())
+
+    def test_burst_then_deny(self):
+        results = [self.allow(1000)[0] for _ in range(4)]
+
+        self.assertEqual(results, [True, True, True, False])
+        self.assertEqual(self.allow(1000), (False, INTERVAL))
+
+    def test_denied_requests_do_not_delay_next_token(self):
+        for _ in range(10):
+            self.allow(1000)
+
+        self.assertEqual(self.allow(1000 + INTERVAL), (True, 0))
+        self.assertEqual(self.allow(1000 + INTERVAL)[0], False)
+
+    def test_clients_are_limited_separately(self):
+        for _ in range(3):
+            self.allow(1000)
+
+        self.assertFalse(self.allow(1000)[0])
+        self.assertTrue(self.allow(1000, address='10.0.0.2')[0])
+
+    def test_prune_removes_expired_state(self):
+        self.allow(1000)
+        self.allow(2000, address='10.0.0.2')
+
+        TokenBucketThrottle.prune(connection, now=1500)
+
+        self.assertEqual(
+            list(ThrottleState.objects.values_list('key', flat=True)),
+            ['read:ip:10.0.0.2'])
+
+    def test_locked_fallback_matches_upsert(self):
+        results = [
+            TokenBucketThrottle.update_state_locked(
+                connection, 'fallback', 1000, INTERVAL, 1000 + 60 - INTERVAL)
+            for _ in range(4)]
+
+        self.assertEqual(results, [
+            (1020, True), (1040, True), (1060, True), (1060, False)])
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'Одновременные запросы проверяются на PostgreSQL.')
+@override_settings(REST_FRAMEWORK=REST_FRAMEWORK)
+class TokenBucketThrottleConcurrencyTest(TransactionTestCase):
+
+    def test_concurrent_requests_do_not_exceed_limit(self):
+        def allow(_):
+            try:
+                return make_throttle(1000).allow_request(
+                    make_request(), view=None)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(allow, range(40)))
+
+        self.assertEqual(results.count(True), 3)
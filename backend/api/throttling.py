@@ -0,0 +1,137 @@
+import random
+import time
+
+from django.db import connections, router, transaction
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from common.constants import (THROTTLE_KEY, THROTTLE_PRUNE_FREQUENCY,
+                              THROTTLE_SCOPE_READ, THROTTLE_SCOPE_WRITE)
+from common.db import RETURNING_VENDORS
+from .models import ThrottleState
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Ограничение частоты запросов по алгоритму token bucket (в форме GCRA).
+
+    Для каждой пары «область — пользователь» в таблице ThrottleState
+    хранится только теоретическое время следующего запроса. Лимит
+    "N/период" означает N запросов за период с возможностью израсходовать
+    их подряд.
+
+    Решение принимается одним запросом INSERT ... ON CONFLICT DO UPDATE
+    ... RETURNING: проверка и сдвиг времени выполняются атомарно под
+    блокировкой строки, поэтому одновременные запросы всех процессов не
+    превышают лимит. Для баз данных без ON CONFLICT используется
+    SELECT ... FOR UPDATE.
+
+    Область берётся из словаря throttle_scopes представления по имени
+    действия, затем из атрибута throttle_scope, а иначе определяется
+    по методу запроса: чтение или запись. Лимиты задаются в
+    REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].
+    """
+
+    timer = time.time
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+
+        capacity, period = self.parse_rate(rate)
+        interval = period / capacity
+        key = THROTTLE_KEY.format(
+            scope=scope, ident=self.get_cache_ident(request))
+
+        now = self.timer()
+        connection = connections[router.db_for_write(ThrottleState)]
+        # Запрос разрешён, если после него теоретическое время следующего
+        # запроса опередит текущее не больше чем на период.
+        limit = now + period - interval
+        if connection.vendor in RETURNING_VENDORS:
+            tat, allowed = self.update_state(
+                connection, key, now, interval, limit)
+        else:
+            tat, allowed = self.update_state_locked(
+                connection, key, now, interval, limit)
+        if random.randrange(THROTTLE_PRUNE_FREQUENCY) == 0:
+            self.prune(connection, now)
+        self.wait_time = 0 if allowed else tat - limit
+        return allowed
+
+    def wait(self):
+        return self.wait_time
+
+    @staticmethod
+    def update_state(connection, key, now, interval, limit):
+        """
+        Атомарно проверяет лимит и при успехе сдвигает теоретическое
+        время. Обе части SET вычисляются по старому значению tat.
+        Возвращает новое значение tat и решение.
+        """
+        quote_name = connection.ops.quote_name
+        table = quote_name(ThrottleState._meta.db_table)
+        greatest = 'GREATEST' if connection.vendor == 'postgresql' else 'MAX'
+        sql = (
+            f'INSERT INTO {table} ({quote_name("key")}, tat, allowed) '
+            f'VALUES (%s, %s, %s) '
+            f'ON CONFLICT ({quote_name("key")}) DO UPDATE SET '
+            f'tat = CASE WHEN {table}.tat <= %s '
+            f'THEN {greatest}({table}.tat, %s) + %s ELSE {table}.tat END, '
+            f'allowed = {table}.tat <= %s '
+            f'RETURNING tat, allowed')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                sql, [key, now + interval, True, limit, now, interval, limit])
+            tat, allowed = cursor.fetchone()
+        return tat, bool(allowed)
+
+    @staticmethod
+    def update_state_locked(connection, key, now, interval, limit):
+        """То же, что update_state, с блокировкой строки через ORM."""
+        with transaction.atomic(using=connection.alias):
+            state, created = (
+                ThrottleState.objects.using(connection.alias)
+                .select_for_update()
+                .get_or_create(key=key, defaults={'tat': now}))
+            state.allowed = state.tat <= limit
+            if state.allowed:
+                state.tat = max(state.tat, now) + interval
+            state.save(using=connection.alias)
+        return state.tat, state.allowed
+
+    @staticmethod
+    def prune(connection, now):
+        """
+        Удаляет строки, теоретическое время которых уже прошло: такое
+        состояние не отличается от отсутствующего.
+        """
+        ThrottleState.objects.using(connection.alias).filter(
+            tat__lt=now).delete()
+
+    def get_scope(self, request, view):
+        scopes = getattr(view, 'throttle_scopes', {})
+        scope = scopes.get(getattr(view, 'action', None))
+        if scope is None:
+            scope = getattr(view, 'throttle_scope', None)
+        if scope is None:
+            scope = (
+                THROTTLE_SCOPE_READ if request.method in SAFE_METHODS
+                else THROTTLE_SCOPE_WRITE)
+        return scope
+
+    def get_cache_ident(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+    @staticmethod
+    def parse_rate(rate):
+        """Разбирает лимит вида "N/период" в пару (N, секунды)."""
+        count, period = rate.split('/')
+        return int(count), PERIODS[period[0]]
@@ -1,7 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientViewset, RecipeViewset, TagViewset, UserViewSet
+from .views import (CatalogView, IngredientViewset, RecipeViewset, TagViewset,
+                    UserViewSet)
 
 router = DefaultRouter()
 
@@ -13,5 +14,6 @@ router.register('users', UserViewSet, basename='user')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('catalog/', CatalogView.as_view(), name='catalog'),
     path('auth/', include('djoser.urls.authtoken')),
 ]
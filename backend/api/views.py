@@ -1,38 +1,72 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.db.models import Exists, OuterRef, Sum
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
 from django_filters.rest_framework import DjangoFilterBackend
+from django_filters.utils import translate_validation
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from common.constants import (ERROR_ALREADY_SUBSCRIBED,
+from common.constants import (CATALOG_ETAG, ERROR_ALREADY_SUBSCRIBED,
                               ERROR_CANNOT_SUBSCRIBE_TO_SELF, ERROR_CART_EMPTY,
+                              ERROR_INVALID_CATALOG_VERSION,
                               ERROR_RECIPE_ALREADY_ADDED,
                               ERROR_RECIPE_NOT_FOUND,
-                              ERROR_SUBSCRIPTION_NOT_FOUND, RECIPES_URL_PATH,
+                              ERROR_SUBSCRIPTION_NOT_FOUND,
+                              EVENT_FAVORITE_ADDED, EVENT_FAVORITE_REMOVED,
+                              EVENT_RECIPE_CREATED, EVENT_RECIPE_DELETED,
+                              EVENT_RECIPE_UPDATED, EVENT_SHOPPING_CART_ADDED,
+                              EVENT_SHOPPING_CART_REMOVED,
+                              EVENT_SUBSCRIPTION_ADDED,
+                              EVENT_SUBSCRIPTION_REMOVED, NDJSON_CONTENT_TYPE,
+                              NOTIFY_RECIPE, NOTIFY_SUBSCRIPTION,
+                              RECIPES_EXPORT_FILENAME, RECIPES_URL_PATH,
                               SHOPPING_CART_FILENAME, SHORT_URL_PATH,
-                              URL_AVATAR_PATH, URL_CURRENT_USER_PATH,
-                              URL_DOWNLOAD_SHOPPING_CART_PATH,
-                              URL_FAVORITES_PATH, URL_GET_LINK_PATH,
-                              URL_SHOPPING_CART_PATH, URL_SUBSCRIBE_PATH,
-                              URL_SUBSCRIPTIONS_PATH)
-from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+                              SIMILAR_RECIPES_LIMIT, THROTTLE_SCOPE_EXPORT,
+                              THROTTLE_SCOPE_UPLOAD, URL_AVATAR_PATH,
+                              URL_CURRENT_USER_PATH,
+                              URL_DOWNLOAD_SHOPPING_CART_PATH, URL_EXPORT_PATH,
+                              URL_FAVORITES_PATH, URL_FEED_PATH,
+                              URL_GET_LINK_PATH, URL_SHOPPING_CART_PATH,
+                              URL_SIMILAR_PATH, URL_STREAM_TICKET_PATH,
+                              URL_SUBSCRIBE_PATH, URL_SUBSCRIPTIONS_PATH,
+                              URL_TRENDING_PATH)
+from common.db import delete_returning, insert_ignore
+from common.storage import release_file
+from events.notify import notify
+from events.outbox import publish
+from recipes.catalog import get_catalog_version, get_changes, get_snapshot
+from recipes.feed import (backfill_subscription, get_feed_positions,
+                          remove_subscription)
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            SimilarRecipe, Tag)
+from recipes.ndjson import export_recipes
+from recipes.trending import get_trending, record_engagement
 from users.models import Subscription
 from .decorators import relationship_action_decorator
 from .filters import IngredientFilter, RecipeFilter
-from .pagination import CommonPagination
+from .pagination import CommonPagination, FeedPagination
 from .permissions import IsAuthenticated, IsAuthenticatedOrOwnerOrReadOnly
+from .representations import serialize_recipes
 from .serializers import (IngredientSerializer, RecipeCreateUpdateSerializer,
                           RecipeReadSerializer, RecipeShortSerializer,
                           SubscriptionUserSerializer, TagSerializer,
                           UserAvatarSerializer, UserSerializer)
+from .stream import issue_ticket
 
 User = get_user_model()
 
+RELATION_EVENTS = {
+    Favorite: (EVENT_FAVORITE_ADDED, EVENT_FAVORITE_REMOVED),
+    ShoppingCart: (EVENT_SHOPPING_CART_ADDED, EVENT_SHOPPING_CART_REMOVED),
+}
+
 
 class IngredientViewset(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all().order_by('name')
@@ -46,6 +80,31 @@ class TagViewset(viewsets.ReadOnlyModelViewSet):
     serializer_class = TagSerializer
 
 
+class CatalogView(APIView):
+    """
+    Справочник тегов и ингредиентов для хранения на клиенте. Без
+    параметров возвращает полный снимок с номером версии (и отвечает
+    304, если версия из If-None-Match не изменилась), с параметром
+    "since" — только изменения после указанной версии.
+    """
+
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        version = get_catalog_version()
+        since = request.query_params.get('since')
+        if since is not None:
+            if not since.isdigit():
+                raise ValidationError({'since': ERROR_INVALID_CATALOG_VERSION})
+            return Response(get_changes(int(since), version))
+
+        etag = CATALOG_ETAG.format(version=version)
+        if etag in request.headers.get('If-None-Match', ''):
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers={'ETag': etag})
+        return Response(get_snapshot(version), headers={'ETag': etag})
+
+
 class RecipeViewset(viewsets.ModelViewSet):
     """
     Вьюсет для управления рецептами. Включает действия по добавлению/удалению
@@ -58,6 +117,13 @@ class RecipeViewset(viewsets.ModelViewSet):
     pagination_class = CommonPagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
+    throttle_scopes = {
+        'create': THROTTLE_SCOPE_UPLOAD,
+        'update': THROTTLE_SCOPE_UPLOAD,
+        'partial_update': THROTTLE_SCOPE_UPLOAD,
+        'download_shopping_cart': THROTTLE_SCOPE_EXPORT,
+        'export': THROTTLE_SCOPE_EXPORT,
+    }
 
     def get_queryset(self):
         user = self.request.user
@@ -78,12 +144,50 @@ class RecipeViewset(viewsets.ModelViewSet):
             return RecipeReadSerializer
         return RecipeCreateUpdateSerializer
 
+    def list(self, request, *args, **kwargs):
+        """
+        Возвращает страницу рецептов, собирая представление напрямую
+        из строк базы данных без сериализатора на каждый рецепт.
+        """
+        filterset = DjangoFilterBackend().get_filterset(
+            request, Recipe.objects.all(), self)
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+        page = self.paginate_queryset(filterset.get_recipe_ids())
+        return self.get_paginated_response(serialize_recipes(page, request))
+
     def perform_create(self, serializer):
-        """Назначает текущего пользователя автором рецепта при создании."""
-        serializer.save(author=self.request.user)
+        """
+        Назначает текущего пользователя автором рецепта при создании
+        и публикует событие о новом рецепте, по которому он рассылается
+        в ленты подписчиков автора, а подписчики, открывшие поток
+        уведомлений, узнают о нём сразу после фиксации транзакции.
+        """
+        with transaction.atomic():
+            recipe = serializer.save(author=self.request.user)
+            event = publish(EVENT_RECIPE_CREATED,
+                            recipe_id=recipe.pk, author_id=recipe.author_id)
+            event.refresh_from_db(fields=['xid'])
+            notify(NOTIFY_RECIPE, id=event.pk, xid=event.xid,
+                   recipe_id=recipe.pk,
+                   author_id=recipe.author_id, name=recipe.name)
 
     def perform_update(self, serializer):
-        serializer.save(author=self.request.user)
+        with transaction.atomic():
+            recipe = serializer.save(author=self.request.user)
+            if serializer.changes:
+                publish(EVENT_RECIPE_UPDATED,
+                        recipe_id=recipe.pk, author_id=recipe.author_id,
+                        changes=sorted(serializer.changes))
+
+    def perform_destroy(self, instance):
+        recipe_id = instance.pk
+        with transaction.atomic():
+            instance.delete()
+            publish(EVENT_RECIPE_DELETED,
+                    recipe_id=recipe_id, author_id=instance.author_id)
+        ingredient_index.remove_recipe(recipe_id)
+        release_file(instance.image.name)
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(
@@ -91,11 +195,8 @@ class RecipeViewset(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
 
-        recipe = serializer.instance
-        read_serializer = RecipeReadSerializer(
-            recipe, context={'request': request})
-
-        return Response(read_serializer.data, status=status.HTTP_201_CREATED)
+        return self._read_response(
+            serializer.instance, status.HTTP_201_CREATED)
 
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -105,11 +206,21 @@ class RecipeViewset(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
 
-        updated_recipe = serializer.instance
-        read_serializer = RecipeReadSerializer(
-            updated_recipe, context={'request': request})
+        return self._read_response(serializer.instance, status.HTTP_200_OK)
 
-        return Response(read_serializer.data, status=status.HTTP_200_OK)
+    def _read_response(self, recipe, response_status):
+        """
+        Возвращает сохранённый рецепт в формате RecipeReadSerializer,
+        загружая автора, теги и ингредиенты фиксированным числом запросов.
+        """
+        recipe = (
+            Recipe.objects
+            .select_related('author')
+            .prefetch_related('tags', 'recipe_ingredients__ingredient')
+            .get(pk=recipe.pk))
+        read_serializer = RecipeReadSerializer(
+            recipe, context={'request': self.request})
+        return Response(read_serializer.data, status=response_status)
 
     @relationship_action_decorator(url_path=URL_FAVORITES_PATH)
     def favorite(self, request, pk=None):
@@ -136,6 +247,38 @@ class RecipeViewset(viewsets.ModelViewSet):
         short_link = f'{base_url}/{SHORT_URL_PATH}/{recipe.short_code}'
         return Response({'short-link': short_link})
 
+    @action(detail=False, methods=['get'], url_path=URL_TRENDING_PATH,
+            permission_classes=[permissions.AllowAny])
+    def trending(self, request):
+        """
+        Возвращает самые популярные сейчас рецепты, при необходимости
+        только с тегами из параметра "tags".
+        """
+        recipe_ids = get_trending(request.query_params.getlist('tags'))
+        recipes = Recipe.objects.in_bulk(recipe_ids)
+        serializer = RecipeShortSerializer(
+            [recipes[pk] for pk in recipe_ids if pk in recipes],
+            many=True, context={'request': request})
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get'], url_path=URL_SIMILAR_PATH,
+            permission_classes=[permissions.AllowAny])
+    def similar(self, request, pk=None):
+        """
+        Возвращает рецепты с похожим набором ингредиентов из заранее
+        построенного индекса.
+        """
+        recipe = self.get_object()
+        similar_recipes = [
+            similar_recipe.similar
+            for similar_recipe in SimilarRecipe.objects
+            .filter(recipe=recipe)
+            .select_related('similar')
+            .order_by('-score')[:SIMILAR_RECIPES_LIMIT]]
+        serializer = RecipeShortSerializer(
+            similar_recipes, many=True, context={'request': request})
+        return Response(serializer.data)
+
     @action(detail=False, methods=['get'],
             permission_classes=[IsAuthenticated],
             url_path=URL_DOWNLOAD_SHOPPING_CART_PATH)
@@ -179,15 +322,65 @@ class RecipeViewset(viewsets.ModelViewSet):
 
         return response
 
+    @action(detail=False, methods=['get'],
+            permission_classes=[IsAuthenticated],
+            url_path=URL_FEED_PATH)
+    def feed(self, request):
+        """
+        Возвращает ленту рецептов от авторов, на которых подписан
+        пользователь, с keyset-пагинацией от новых к старым.
+        """
+        paginator = FeedPagination()
+        positions = paginator.paginate_positions(
+            lambda after, limit: get_feed_positions(
+                request.user, after, limit),
+            request)
+
+        return paginator.get_paginated_response(serialize_recipes(
+            [recipe_id for _, recipe_id in positions], request))
+
+    @action(detail=False, methods=['get'],
+            permission_classes=[IsAuthenticated],
+            url_path=URL_EXPORT_PATH)
+    def export(self, request):
+        """
+        Потоково выгружает рецепты в формате NDJSON. Поддерживает
+        те же фильтры, что и список рецептов, в том числе по автору и тегам.
+        """
+        queryset = self.filter_queryset(Recipe.objects.all()).distinct()
+
+        response = StreamingHttpResponse(
+            export_recipes(queryset), content_type=NDJSON_CONTENT_TYPE)
+        response['Content-Disposition'] = (
+            f'attachment; filename="{RECIPES_EXPORT_FILENAME}"')
+        return response
+
+    @action(detail=False, methods=['post'],
+            permission_classes=[IsAuthenticated],
+            url_path=URL_STREAM_TICKET_PATH)
+    def stream_ticket(self, request):
+        """
+        Выдаёт короткоживущий билет для подключения к потоку уведомлений
+        из браузера: EventSource не передаёт заголовки, а токен в адресе
+        попал бы в журналы запросов.
+        """
+        return Response({'ticket': issue_ticket(request.user.pk)})
+
     def _toggle_recipe_relation(self, model, request, recipe):
         """
         Вспомогательный метод для добавления или удаления связи рецепта,
         например, добавление/удаление рецепта из избранного или корзины.
+        Связь записывается и удаляется одним запросом, поэтому повторные
+        одновременные запросы не приводят к ошибке уникальности.
         """
         user = request.user
+        added_topic, removed_topic = RELATION_EVENTS[model]
         if request.method == 'POST':
-            _, created = model.objects.get_or_create(
-                user=user, recipe=recipe)
+            with transaction.atomic():
+                created = insert_ignore(model, user=user, recipe=recipe)
+                if created:
+                    record_engagement(recipe, model, added=True)
+                    publish(added_topic, user_id=user.pk, recipe_id=recipe.pk)
             if created:
                 serializer = RecipeShortSerializer(
                     recipe)
@@ -196,8 +389,14 @@ class RecipeViewset(viewsets.ModelViewSet):
             raise ValidationError({'detail': ERROR_RECIPE_ALREADY_ADDED})
 
         elif request.method == 'DELETE':
-            deleted, _ = model.objects.filter(
-                user=user, recipe=recipe).delete()
+            with transaction.atomic():
+                deleted = delete_returning(
+                    model, returning=['created_at'], user=user, recipe=recipe)
+                if deleted:
+                    record_engagement(recipe, model, added=False,
+                                      engaged_at=deleted[0][0])
+                    publish(removed_topic,
+                            user_id=user.pk, recipe_id=recipe.pk)
             if deleted:
                 return Response(status=status.HTTP_204_NO_CONTENT)
             raise ValidationError({'detail': ERROR_RECIPE_NOT_FOUND})
@@ -207,6 +406,7 @@ class UserViewSet(DjoserUserViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     pagination_class = CommonPagination
+    throttle_scopes = {'update_avatar': THROTTLE_SCOPE_UPLOAD}
 
     @action(detail=False, methods=['get'], url_path=URL_CURRENT_USER_PATH,
             permission_classes=[IsAuthenticated])
@@ -232,9 +432,10 @@ class UserViewSet(DjoserUserViewSet):
 
         elif request.method == 'DELETE':
             if user.avatar:
-                user.avatar.delete(save=False)
+                old_avatar = user.avatar.name
                 user.avatar = None
                 user.save()
+                release_file(old_avatar)
             return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=['post', 'delete'],
@@ -249,9 +450,15 @@ class UserViewSet(DjoserUserViewSet):
         user_to_subscribe = get_object_or_404(User, id=id)
 
         if request.method == 'POST':
-            _, created = Subscription.objects.get_or_create(
-                user=user, subscribed_to=user_to_subscribe
-            )
+            with transaction.atomic():
+                created = insert_ignore(
+                    Subscription, user=user, subscribed_to=user_to_subscribe)
+                if created:
+                    backfill_subscription(user, user_to_subscribe)
+                    publish(EVENT_SUBSCRIPTION_ADDED, user_id=user.pk,
+                            author_id=user_to_subscribe.pk)
+                    notify(NOTIFY_SUBSCRIPTION, user_id=user.pk,
+                           author_id=user_to_subscribe.pk, active=True)
             if created:
                 serializer = SubscriptionUserSerializer(
                     user_to_subscribe, context={'request': request})
@@ -262,9 +469,15 @@ class UserViewSet(DjoserUserViewSet):
                 status=status.HTTP_400_BAD_REQUEST)
 
         elif request.method == 'DELETE':
-            deleted, _ = Subscription.objects.filter(
-                user=user, subscribed_to=user_to_subscribe
-            ).delete()
+            with transaction.atomic():
+                deleted = delete_returning(
+                    Subscription, user=user, subscribed_to=user_to_subscribe)
+                if deleted:
+                    remove_subscription(user, user_to_subscribe)
+                    publish(EVENT_SUBSCRIPTION_REMOVED, user_id=user.pk,
+                            author_id=user_to_subscribe.pk)
+                    notify(NOTIFY_SUBSCRIPTION, user_id=user.pk,
+                           author_id=user_to_subscribe.pk, active=False)
             if deleted:
                 return Response(status=status.HTTP_204_NO_CONTENT)
             return Response({'detail': ERROR_SUBSCRIPTION_NOT_FOUND},
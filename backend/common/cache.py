@@ -0,0 +1,341 @@
+"""
+Двухуровневый кэш проекта.
+
+Первый уровень (L1) — ограниченный по размеру LRU-словарь со сроком
+жизни записей в памяти процесса, второй (L2) — общий для всех процессов
+кэш Django CACHE_SHARED_ALIAS (по умолчанию таблица в базе данных, в
+settings можно указать memcached). Все кэширование в проекте выполняется
+через пространства имён CacheNamespace, параметры которых описаны в
+CACHE_NAMESPACES.
+
+Ключ записи включает имя и версию пространства имён, поэтому смена
+формата данных не требует очистки кэша. Каждая запись помнит версии
+своих тегов на момент сохранения; invalidate_tags увеличивает версии
+тегов, и все записи с этими тегами становятся недействительными в
+обоих уровнях. Каждое пространство имён автоматически помечено тегом
+со своим именем. Версии тегов и общие счётчики метрик хранятся не в L2,
+а в таблице api.CacheCounter и увеличиваются атомарно
+(common.db.increment): у них нет срока жизни, и одновременные
+увеличения из разных процессов не теряются. Процесс держит версии
+тегов в памяти до CACHE_TAG_LOCAL_TIMEOUT секунд, а об их изменении
+другими процессами узнаёт сразу через шину events.invalidation.
+
+get_or_set вычисляет отсутствующее значение один раз: другие потоки
+процесса ждут результата, а другие процессы — снятия блокировки в L2.
+
+Значения в L1 возвращаются без копирования, поэтому их нельзя изменять.
+"""
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+import threading
+import time
+
+from django.core.cache import caches
+
+from api.models import CacheCounter
+from common.constants import (CACHE_LOCK_KEY, CACHE_LOCK_POLL_INTERVAL,
+                              CACHE_LOCK_TIMEOUT, CACHE_METRICS,
+                              CACHE_METRICS_FLUSH_INTERVAL, CACHE_METRICS_KEY,
+                              CACHE_NAMESPACES, CACHE_SHARED_ALIAS,
+                              CACHE_TAG_KEY, CACHE_TAG_LOCAL_TIMEOUT,
+                              INVALIDATE_CACHE_TAGS)
+from common.db import increment
+from events.invalidation import publish, register
+
+MISSING = object()
+
+
+class LocalCache:
+    """Потокобезопасный LRU-словарь со сроком жизни записей."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return MISSING
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._data[key] = (time.monotonic() + timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class Metrics:
+    """
+    Счётчики обращений к пространству имён. Накапливаются в процессе и
+    раз в CACHE_METRICS_FLUSH_INTERVAL секунд добавляются к общим
+    счётчикам в таблице CacheCounter, которые выводит команда cache_stats.
+    """
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self.counts = defaultdict(int)
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+    def incr(self, name):
+        with self._lock:
+            self.counts[name] += 1
+            if (time.monotonic() - self._flushed_at
+                    < CACHE_METRICS_FLUSH_INTERVAL):
+                return
+            counts, self.counts = self.counts, defaultdict(int)
+            self._flushed_at = time.monotonic()
+        self._flush(counts)
+
+    def key(self, name):
+        return CACHE_METRICS_KEY.format(namespace=self.namespace, name=name)
+
+    def _flush(self, counts):
+        for name, value in counts.items():
+            increment(CacheCounter, self.key(name), value)
+
+    def snapshot(self):
+        """Общие счётчики всех процессов."""
+        keys = {self.key(name): name for name in CACHE_METRICS}
+        values = dict(CacheCounter.objects.filter(
+            key__in=list(keys)).values_list('key', 'value'))
+        return {keys[key]: values.get(key, 0) for key in keys}
+
+    def reset(self):
+        CacheCounter.objects.filter(
+            key__in=[self.key(name) for name in CACHE_METRICS]).delete()
+
+
+_tag_versions = LocalCache(max_entries=10000)
+
+
+def get_tag_versions(tags):
+    """
+    Текущие версии тегов. Версии кэшируются в процессе на
+    CACHE_TAG_LOCAL_TIMEOUT секунд. Отсутствующая версия создаётся из
+    текущего времени, чтобы после очистки таблицы счётчиков записи L2
+    со старыми версиями не стали снова действительными.
+    """
+    versions = {}
+    missing = []
+    for tag in tags:
+        version = _tag_versions.get(tag)
+        if version is MISSING:
+            missing.append(tag)
+        else:
+            versions[tag] = version
+    if missing:
+        keys = {CACHE_TAG_KEY.format(tag=tag): tag for tag in missing}
+        found = dict(CacheCounter.objects.filter(
+            key__in=list(keys)).values_list('key', 'value'))
+        for key, tag in keys.items():
+            version = found.get(key)
+            if version is None:
+                # Прибавление нуля создаёт версию или возвращает версию,
+                # созданную одновременно другим процессом.
+                version = increment(
+                    CacheCounter, key, 0, initial=time.time_ns())
+            versions[tag] = version
+            _tag_versions.set(tag, version, CACHE_TAG_LOCAL_TIMEOUT)
+    return versions
+
+
+def invalidate_tags(*tags):
+    """Делает недействительными все записи с любым из тегов."""
+    for tag in tags:
+        increment(
+            CacheCounter, CACHE_TAG_KEY.format(tag=tag), 1,
+            initial=time.time_ns())
+        _tag_versions.delete(tag)
+    publish(INVALIDATE_CACHE_TAGS, tags)
+
+
+class CacheNamespace:
+    """
+    Пространство имён кэша с параметрами из CACHE_NAMESPACES:
+    timeout — срок жизни записи в L2, local_timeout — в L1,
+    local_max_entries — размер L1, version — версия формата значений,
+    shared — использовать ли L2.
+    """
+
+    def __init__(self, name, timeout, local_timeout, local_max_entries,
+                 version=1, shared=True):
+        self.name = name
+        self.prefix = f'{name}:{version}:'
+        self.timeout = timeout
+        self.local_timeout = local_timeout
+        self.shared = shared
+        self.local = LocalCache(local_max_entries)
+        self.metrics = Metrics(name)
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+
+    def get(self, key, default=None):
+        value = self._get(self.prefix + key)
+        return default if value is MISSING else value
+
+    def set(self, key, value, tags=(), timeout=None):
+        """Сохраняет значение с тегами в оба уровня."""
+        full_key = self.prefix + key
+        entry = (value, get_tag_versions((self.name, *tags)))
+        self.local.set(full_key, entry, self.local_timeout)
+        if self.shared:
+            caches[CACHE_SHARED_ALIAS].set(
+                full_key, entry,
+                self.timeout if timeout is None else timeout)
+        self.metrics.incr('sets')
+
+    def delete(self, key):
+        full_key = self.prefix + key
+        self.local.delete(full_key)
+        if self.shared:
+            caches[CACHE_SHARED_ALIAS].delete(full_key)
+
+    def clear(self):
+        """Делает недействительными все записи пространства имён."""
+        self.local.clear()
+        invalidate_tags(self.name)
+        self.metrics.incr('invalidations')
+
+    def get_or_set(self, key, builder, tags=(), timeout=None):
+        """
+        Возвращает значение по ключу, а при его отсутствии вычисляет
+        builder() и сохраняет результат. Одновременные промахи по одному
+        ключу вычисляют значение один раз. Каждый вызов учитывается в
+        метриках одним обращением: попаданием, промахом или устаревшей
+        записью, а два последних — ещё и вычислением (builds) или
+        значением, вычисленным другим обращением (coalesced).
+        """
+        full_key = self.prefix + key
+        value = self._get(full_key)
+        if value is not MISSING:
+            return value
+
+        with self._single_flight(full_key) as leader:
+            if not leader:
+                value = self._get(full_key, count=False)
+                if value is not MISSING:
+                    self.metrics.incr('coalesced')
+                    return value
+            with self._shared_lock(full_key) as acquired:
+                if not acquired:
+                    value = self._wait_for(full_key)
+                    if value is not MISSING:
+                        self.metrics.incr('coalesced')
+                        return value
+                value = builder()
+                self.metrics.incr('builds')
+                self.set(key, value, tags, timeout)
+                return value
+
+    def _get(self, full_key, count=True):
+        """
+        Значение из L1 или L2 либо MISSING. count = False — повторная
+        проверка внутри одного обращения, не учитываемая в метриках.
+        """
+        entry = self.local.get(full_key)
+        level = 'local_hits'
+        if entry is MISSING and self.shared:
+            entry = caches[CACHE_SHARED_ALIAS].get(full_key, MISSING)
+            level = 'shared_hits'
+        if entry is MISSING:
+            if count:
+                self.metrics.incr('misses')
+            return MISSING
+
+        value, versions = entry
+        if get_tag_versions(versions) != versions:
+            self.local.delete(full_key)
+            if count:
+                self.metrics.incr('stale')
+            return MISSING
+        if level == 'shared_hits':
+            self.local.set(full_key, entry, self.local_timeout)
+        if count:
+            self.metrics.incr(level)
+        return value
+
+    @contextmanager
+    def _single_flight(self, full_key):
+        """
+        Пропускает к вычислению один поток процесса на ключ; остальные
+        ждут его завершения и получают leader = False.
+        """
+        with self._flights_lock:
+            event = self._flights.get(full_key)
+            leader = event is None
+            if leader:
+                event = self._flights[full_key] = threading.Event()
+        if not leader:
+            event.wait(CACHE_LOCK_TIMEOUT)
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            with self._flights_lock:
+                del self._flights[full_key]
+            event.set()
+
+    @contextmanager
+    def _shared_lock(self, full_key):
+        """Блокировка вычисления ключа между процессами через L2."""
+        if not self.shared:
+            yield True
+            return
+        shared = caches[CACHE_SHARED_ALIAS]
+        lock_key = CACHE_LOCK_KEY.format(key=full_key)
+        acquired = shared.add(lock_key, 1, CACHE_LOCK_TIMEOUT)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                shared.delete(lock_key)
+
+    def _wait_for(self, full_key):
+        """Ждёт, пока значение вычислит другой процесс."""
+        deadline = time.monotonic() + CACHE_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(CACHE_LOCK_POLL_INTERVAL)
+            entry = caches[CACHE_SHARED_ALIAS].get(full_key, MISSING)
+            if entry is not MISSING:
+                value = self._get(full_key, count=False)
+                if value is not MISSING:
+                    return value
+        return MISSING
+
+
+namespaces = {
+    name: CacheNamespace(name, **options)
+    for name, options in CACHE_NAMESPACES.items()}
+
+
+def apply_invalidation(tags):
+    """Применяет инвалидацию тегов, выполненную другим процессом."""
+    if tags is None:
+        _tag_versions.clear()
+        for namespace in namespaces.values():
+            namespace.local.clear()
+        return
+    for tag in tags:
+        _tag_versions.delete(tag)
+
+
+register(INVALIDATE_CACHE_TAGS, apply_invalidation)
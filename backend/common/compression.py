@@ -0,0 +1,144 @@
+"""
+Сжатие ответов gzip и brotli.
+
+Сжимаются только ответы API (JSON, NDJSON, текст и CSV) размером от
+COMPRESSION_MIN_SIZE байт. HTML-страницы админки и браузерного API
+не сжимаются: в них есть CSRF-токен, и сжатие сделало бы возможной
+атаку BREACH. Потоковые ответы сжимаются по мере отдачи.
+
+Для ответов, которые одинаковы для разных клиентов (анонимные запросы и
+ответы с ETag), сжатые байты запоминаются в кэше процесса по хешу
+содержимого, поэтому повторная отдача того же содержимого не тратит
+процессор на сжатие.
+"""
+import hashlib
+import zlib
+
+from django.utils.cache import patch_vary_headers
+
+from common.cache import namespaces
+from common.constants import (CACHE_COMPRESSION, COMPRESSION_BROTLI_QUALITY,
+                              COMPRESSION_CACHE_KEY, COMPRESSION_CONTENT_TYPES,
+                              COMPRESSION_GZIP_LEVEL,
+                              COMPRESSION_MEMO_MAX_SIZE, COMPRESSION_MIN_SIZE)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP = 'gzip'
+BROTLI = 'br'
+
+
+def parse_accept_encoding(header):
+    """Множество кодировок из Accept-Encoding с ненулевым весом."""
+    accepted = set()
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        params = params.strip().replace(' ', '')
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding)
+    return accepted
+
+
+def choose_encoding(request):
+    accepted = parse_accept_encoding(
+        request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if brotli is not None and (BROTLI in accepted or '*' in accepted):
+        return BROTLI
+    if GZIP in accepted or '*' in accepted:
+        return GZIP
+    return None
+
+
+def get_compressor(encoding):
+    """Объект с методами compress() и flush() для потокового сжатия."""
+    if encoding == BROTLI:
+        return brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+    # wbits=31: формат gzip с нулевым временем в заголовке, поэтому
+    # одинаковое содержимое всегда даёт одинаковые байты.
+    return zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+
+def compress(content, encoding):
+    compressor = get_compressor(encoding)
+    return compressor.compress(content) + compressor.flush()
+
+
+def compress_stream(chunks, encoding):
+    compressor = get_compressor(encoding)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class CompressionMiddleware:
+    """
+    Сжимает ответ в лучшую из поддерживаемых клиентом кодировок:
+    brotli, если установлен пакет brotli, иначе gzip.
+    """
+
+    cache = namespaces[CACHE_COMPRESSION]
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if (response.has_header('Content-Encoding')
+                or response.get('Content-Type', '').split(';')[0]
+                not in COMPRESSION_CONTENT_TYPES):
+            return response
+        encoding = choose_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding)
+            del response['Content-Length']
+        else:
+            if len(response.content) < COMPRESSION_MIN_SIZE:
+                return response
+            if self.is_shared(request, response):
+                content = self.compress_memoized(response.content, encoding)
+            else:
+                content = compress(response.content, encoding)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+
+        # Сжатое тело отличается от исходного побайтно, поэтому сильный
+        # ETag становится слабым, как в GZipMiddleware.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    def is_shared(self, request, response):
+        """Ответ, который, скорее всего, повторится для других клиентов."""
+        return (
+            request.method == 'GET'
+            and len(response.content) <= COMPRESSION_MEMO_MAX_SIZE
+            and (response.has_header('ETag')
+                 or 'HTTP_AUTHORIZATION' not in request.META))
+
+    def compress_memoized(self, content, encoding):
+        key = COMPRESSION_CACHE_KEY.format(
+            encoding=encoding,
+            digest=hashlib.blake2b(content, digest_size=16).hexdigest())
+        return self.cache.get_or_set(
+            key, lambda: compress(content, encoding))
@@ -1,6 +1,13 @@
 # Папки для загрузки изображений
 AVATAR_UPLOAD_FOLDER = 'profile_pictures/'
 RECIPE_IMAGE_UPLOAD_FOLDER = 'recipe_images/'
+CONTENT_STORAGE_NAME = 'images/{prefix}/{digest}{ext}'
+# Первый ключ рекомендательных блокировок файлов хранилища и время, в
+# течение которого использованный файл не удаляется сразу
+CONTENT_STORAGE_LOCK_ID = 7301
+CONTENT_STORAGE_RELEASE_GRACE = 600
+MEDIA_GC_GRACE_HOURS = 24
+MEDIA_GC_BATCH_SIZE = 1000
 
 # Регулярные выражения и максимальные длины полей
 REGEX = r'^[\w.@+-]+$'
@@ -11,6 +18,190 @@ SHORT_CODE_MAX_LENGTH = 5
 DEFAULT_MAX_LENGTH = 75
 ABOVE_ZERO_VALUE = 1
 
+# Экспорт и импорт рецептов в формате NDJSON
+RECIPES_EXPORT_CHUNK_SIZE = 2000
+RECIPES_IMPORT_BATCH_SIZE = 1000
+RECIPES_EXPORT_FILENAME = 'recipes.ndjson'
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+# Выгрузка данных о вовлечённости для аналитики: размер пачки, форматы
+# файлов, виды отметок инкрементальной выгрузки и отставание отметки
+# времени от текущего момента, за которое успевают зафиксироваться
+# транзакции, начатые раньше
+ANALYTICS_BATCH_SIZE = 10000
+ANALYTICS_FORMAT_PARQUET = 'parquet'
+ANALYTICS_FORMAT_CSV = 'csv'
+ANALYTICS_PARQUET_COMPRESSION = 'zstd'
+ANALYTICS_WATERMARK_ID = 'id'
+ANALYTICS_WATERMARK_TIME = 'time'
+ANALYTICS_WATERMARK_FILE = 'watermarks.json'
+ANALYTICS_WATERMARK_LAG = 60
+
+# Лента рецептов от авторов, на которых подписан пользователь.
+# Рецепты авторов, у которых подписчиков больше порога, не рассылаются
+# по лентам, а подтягиваются при чтении.
+FEED_FANOUT_MAX_SUBSCRIBERS = 10000
+FEED_FANOUT_BATCH_SIZE = 1000
+FEED_BACKFILL_LIMIT = 50
+FEED_PAGE_SIZE = 6
+
+# Похожие рецепты по MinHash-сигнатурам наборов ингредиентов.
+# Сигнатура из SIMILARITY_NUM_PERMUTATIONS хешей делится на
+# SIMILARITY_BANDS полос для LSH.
+SIMILARITY_NUM_PERMUTATIONS = 64
+SIMILARITY_BANDS = 16
+SIMILARITY_SEED = 42
+SIMILARITY_BATCH_SIZE = 5000
+SIMILARITY_MAX_BUCKET_SIZE = 500
+SIMILARITY_MIN_SCORE = 0.2
+# Число пачек на процесс, одновременно находящихся в пуле при --workers
+SIMILARITY_POOL_PREFETCH = 2
+SIMILAR_RECIPES_LIMIT = 6
+
+# Поиск рецептов по имеющимся ингредиентам через инвертированный индекс.
+# Индекс в памяти процесса полностью перестраивается в фоновом потоке
+# раз в INGREDIENT_INDEX_TTL секунд, а изменения рецептов применяются к
+# нему сразу в своём процессе и через шину инвалидации в остальных.
+INGREDIENT_INDEX_TTL = 3600
+INGREDIENT_INDEX_CHUNK_SIZE = 10000
+
+# Популярные рецепты: вес добавления в избранное и корзину, период
+# полураспада оценки и параметры выдачи.
+TRENDING_WEIGHTS = {
+    'favorite': 1.0,
+    'shoppingcart': 0.5,
+}
+TRENDING_HALF_LIFE_HOURS = 24
+TRENDING_MIN_SCORE = 0.01
+TRENDING_LIMIT = 20
+TRENDING_CACHE_TIMEOUT = 60
+
+# Проекция карточек рецептов: размер пачки при пересборке
+RECIPE_CARD_BATCH_SIZE = 500
+
+# Битовая маска тегов рецепта: тег с id N соответствует биту N - 1
+TAG_MASK_MAX_ID = 63
+TAG_MASK_BATCH_SIZE = 5000
+TAG_MASK_INDEX_NAME = 'recipe_tag_{tag_id}_idx'
+
+# Журнал изменений справочника тегов и ингредиентов для дельта-синхронизации
+CATALOG_TAGS = 'tags'
+CATALOG_INGREDIENTS = 'ingredients'
+CATALOG_KIND_MAX_LENGTH = 16
+CATALOG_ETAG = '"catalog-{version}"'
+
+# Транзакционный outbox доменных событий
+EVENT_TOPIC_MAX_LENGTH = 64
+EVENT_CONSUMER_MAX_LENGTH = 64
+EVENT_RECIPE_CREATED = 'recipe.created'
+EVENT_RECIPE_UPDATED = 'recipe.updated'
+EVENT_RECIPE_DELETED = 'recipe.deleted'
+EVENT_FAVORITE_ADDED = 'favorite.added'
+EVENT_FAVORITE_REMOVED = 'favorite.removed'
+EVENT_SHOPPING_CART_ADDED = 'shopping_cart.added'
+EVENT_SHOPPING_CART_REMOVED = 'shopping_cart.removed'
+EVENT_SUBSCRIPTION_ADDED = 'subscription.added'
+EVENT_SUBSCRIPTION_REMOVED = 'subscription.removed'
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_POLL_INTERVAL = 1
+OUTBOX_RETENTION_HOURS = 24
+
+# Уведомления через PostgreSQL NOTIFY и поток Server-Sent Events о новых
+# рецептах авторов, на которых подписан пользователь
+NOTIFY_CHANNEL = 'foodgram_events'
+NOTIFY_RECIPE = 'recipe'
+NOTIFY_SUBSCRIPTION = 'subscription'
+NOTIFY_RECONNECT_DELAY = 5
+SSE_PATH = '/api/recipes/stream/'
+SSE_HEARTBEAT_INTERVAL = 15
+SSE_RETRY_MS = 5000
+SSE_REPLAY_LIMIT = 100
+SSE_QUEUE_SIZE = 100
+SSE_EVENT_NEW_RECIPE = 'new_recipe'
+SSE_TICKET_MAX_AGE = 60
+SSE_TICKET_SALT = 'api.stream.ticket'
+
+# Шина инвалидации локальных кэшей процессов через PostgreSQL NOTIFY:
+# канал, последовательность номеров сообщений, время ожидания
+# пропущенного номера до полного сброса и виды сообщений
+INVALIDATION_CHANNEL = 'foodgram_invalidation'
+INVALIDATION_SEQUENCE = 'events_invalidation_seq'
+INVALIDATION_GAP_TIMEOUT = 2
+INVALIDATION_MAX_GAP = 1000
+INVALIDATION_MAX_PAYLOAD = 7000
+INVALIDATE_CACHE_TAGS = 'cache_tags'
+INVALIDATE_INGREDIENT_INDEX = 'ingredient_index'
+
+# Ограничение частоты запросов: области с отдельными лимитами
+THROTTLE_SCOPE_READ = 'read'
+THROTTLE_SCOPE_WRITE = 'write'
+THROTTLE_SCOPE_UPLOAD = 'upload'
+THROTTLE_SCOPE_EXPORT = 'export'
+THROTTLE_KEY = '{scope}:{ident}'
+THROTTLE_KEY_MAX_LENGTH = 128
+# Строки с истёкшим состоянием удаляются в среднем раз в
+# THROTTLE_PRUNE_FREQUENCY запросов
+THROTTLE_PRUNE_FREQUENCY = 1000
+
+# Сжатие ответов: минимальный размер, степень сжатия и запоминание
+# сжатых байтов одинаковых ответов в пространстве имён кэша
+# CACHE_COMPRESSION
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+COMPRESSION_MEMO_MAX_SIZE = 1024 * 1024
+COMPRESSION_CACHE_KEY = '{encoding}:{digest}'
+COMPRESSION_CONTENT_TYPES = frozenset((
+    'application/json',
+    NDJSON_CONTENT_TYPE,
+    'text/plain',
+    'text/csv',
+))
+
+# Двухуровневый кэш: общий кэш Django (L2), служебные ключи в нём,
+# блокировка вычисления значения и счётчики обращений
+CACHE_SHARED_ALIAS = 'default'
+CACHE_TAG_KEY = 'cache:tag:{tag}'
+CACHE_LOCK_KEY = 'cache:lock:{key}'
+CACHE_METRICS_KEY = 'cache:metrics:{namespace}:{name}'
+CACHE_COUNTER_KEY_MAX_LENGTH = 255
+CACHE_TAG_LOCAL_TIMEOUT = 30
+CACHE_LOCK_TIMEOUT = 10
+CACHE_LOCK_POLL_INTERVAL = 0.05
+CACHE_METRICS_FLUSH_INTERVAL = 10
+CACHE_METRICS = (
+    'local_hits', 'shared_hits', 'misses', 'stale', 'builds', 'coalesced',
+    'sets', 'invalidations')
+
+# Пространства имён кэша и их параметры (см. common.cache.CacheNamespace)
+CACHE_TRENDING = 'trending'
+CACHE_COMPRESSION = 'compression'
+CACHE_NAMESPACES = {
+    CACHE_TRENDING: {
+        'timeout': TRENDING_CACHE_TIMEOUT,
+        'local_timeout': 5,
+        'local_max_entries': 256,
+    },
+    # Сжатые байты зависят только от хеша содержимого, поэтому хранятся
+    # только в памяти процесса: передавать их через L2 дороже сжатия.
+    CACHE_COMPRESSION: {
+        'timeout': 600,
+        'local_timeout': 600,
+        'local_max_entries': 256,
+        'shared': False,
+    },
+}
+
+# Профилирование запросов сотрудников
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_QUERY_PARAM = '_profile'
+PROFILE_RESPONSE_HEADER = 'X-Profile-Id'
+PROFILE_NAME_MAX_LENGTH = 64
+PROFILE_METHOD_MAX_LENGTH = 10
+PROFILE_PATH_MAX_LENGTH = 2048
+PROFILE_MAX_COUNT = 200
+PROFILE_STATS_LIMIT = 60
+
 # Сообщения об ошибках
 ERROR_INVALID_USERNAME = (
     'Имя пользователя должно содержать только буквы, цифры и .@+-')
@@ -30,6 +221,18 @@ ERROR_NOT_AUTHENTICATED = 'Вы должны быть авторизованы,
 ERROR_RECIPE_ALREADY_ADDED = 'Рецепт уже добавлен.'
 ERROR_RECIPE_NOT_FOUND = 'Рецепт не найден в списке.'
 ERROR_CART_EMPTY = 'Ваша корзина пуста.'
+ERROR_INVALID_CURSOR = 'Некорректный курсор.'
+ERROR_INVALID_CATALOG_VERSION = 'Некорректная версия справочника.'
+ERROR_STREAM_INVALID_TOKEN = 'Недопустимый токен или билет.'
+ERROR_ANALYTICS_NO_PYARROW = 'Для формата parquet нужен пакет pyarrow.'
+
+ERROR_IMPORT_INVALID_JSON = 'Строка не является корректным JSON-объектом.'
+ERROR_IMPORT_MISSING_FIELD = 'Отсутствует обязательное поле "{field}".'
+ERROR_IMPORT_INVALID_VALUE = 'Некорректное значение поля "{field}".'
+ERROR_IMPORT_UNKNOWN_AUTHOR = 'Автор "{username}" не найден.'
+ERROR_IMPORT_UNKNOWN_TAG = 'Тег "{slug}" не найден.'
+ERROR_IMPORT_UNKNOWN_INGREDIENT = (
+    'Ингредиент "{name}" ({measurement_unit}) не найден.')
 
 # URL пути
 URL_SUBSCRIBE_PATH = 'subscribe'
@@ -43,5 +246,10 @@ URL_FAVORITES_PATH = 'favorite'
 URL_SHOPPING_CART_PATH = 'shopping_cart'
 URL_DOWNLOAD_SHOPPING_CART_PATH = 'download_shopping_cart'
 URL_GET_LINK_PATH = 'get-link'
+URL_EXPORT_PATH = 'export'
+URL_FEED_PATH = 'feed'
+URL_SIMILAR_PATH = 'similar'
+URL_TRENDING_PATH = 'trending'
+URL_STREAM_TICKET_PATH = 'stream-ticket'
 
 SHOPPING_CART_FILENAME = 'shopping_cart.txt'
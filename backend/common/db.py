@@ -0,0 +1,186 @@
+"""
+Запись связей «пользователь — объект» одним запросом.
+
+insert_ignore и delete_returning выполняют INSERT ... ON CONFLICT DO
+NOTHING RETURNING и DELETE ... RETURNING, поэтому добавление и удаление
+связи занимает одно обращение к базе и не приводит к IntegrityError при
+одновременных одинаковых запросах: из нескольких параллельных вставок
+строку создаёт ровно одна, а остальные узнают, что строка уже есть.
+
+Запросы выполняются в обход ORM: метод save(), сигналы и каскадное
+удаление не вызываются, поэтому функции предназначены для простых
+таблиц связей без зависимых объектов. Для баз данных без ON CONFLICT и
+RETURNING используется эквивалент на ORM.
+
+increment атомарно увеличивает счётчик в строке таблицы запросом
+INSERT ... ON CONFLICT DO UPDATE SET value = value + delta: прибавления
+из разных процессов не теряются, а у строки нет срока жизни.
+
+CurrentTransactionId и get_transaction_horizon позволяют читать журналы
+(outbox) без пропусков: строка с меньшим id может быть зафиксирована
+позже строки с большим, но строки всех транзакций с номером меньше
+горизонта уже видны и новых среди них не появится.
+"""
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import BigIntegerField, Func, Value
+
+RETURNING_VENDORS = ('postgresql', 'sqlite')
+
+
+def _get_connection(model):
+    return connections[router.db_for_write(model)]
+
+
+def insert_ignore(model, **values):
+    """
+    Создаёт строку model с полями values, если она не нарушает
+    ограничений уникальности. Возвращает первичный ключ новой строки
+    или None, если такая строка уже есть.
+    """
+    connection = _get_connection(model)
+    instance = model(**values)
+    if connection.vendor not in RETURNING_VENDORS:
+        try:
+            with transaction.atomic(using=connection.alias):
+                instance.save(force_insert=True, using=connection.alias)
+        except IntegrityError:
+            return None
+        return instance.pk
+
+    meta = model._meta
+    fields = [
+        field for field in meta.concrete_fields
+        if not (field.primary_key and field.attname not in values)]
+    quote_name = connection.ops.quote_name
+    sql = (
+        f'INSERT INTO {quote_name(meta.db_table)} '
+        f'({", ".join(quote_name(field.column) for field in fields)}) '
+        f'VALUES ({", ".join(["%s"] * len(fields))}) '
+        f'ON CONFLICT DO NOTHING '
+        f'RETURNING {quote_name(meta.pk.column)}')
+    params = [
+        field.get_db_prep_save(
+            field.pre_save(instance, add=True), connection=connection)
+        for field in fields]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def delete_returning(model, returning=None, **values):
+    """
+    Удаляет строки model, у которых поля values равны заданным.
+    Возвращает список первичных ключей удалённых строк, а если указан
+    список полей returning — список кортежей значений этих полей.
+    """
+    connection = _get_connection(model)
+    names = returning or ['pk']
+    if connection.vendor not in RETURNING_VENDORS:
+        with transaction.atomic(using=connection.alias):
+            queryset = model._default_manager.using(
+                connection.alias).filter(**values)
+            rows = list(queryset.select_for_update().values_list(
+                'pk', *names))
+            queryset.filter(pk__in=[row[0] for row in rows]).delete()
+        return [row[1:] if returning else row[1] for row in rows]
+
+    meta = model._meta
+    instance = model(**values)
+    fields = [meta.get_field(name) for name in values]
+    returned = [
+        meta.pk if name == 'pk' else meta.get_field(name) for name in names]
+    quote_name = connection.ops.quote_name
+    sql = (
+        f'DELETE FROM {quote_name(meta.db_table)} WHERE '
+        + ' AND '.join(
+            f'{quote_name(field.column)} = %s' for field in fields)
+        + ' RETURNING '
+        + ', '.join(quote_name(field.column) for field in returned))
+    params = [
+        field.get_db_prep_value(getattr(instance, field.attname), connection)
+        for field in fields]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = [
+            tuple(
+                _convert(connection, field, value)
+                for field, value in zip(returned, row))
+            for row in cursor.fetchall()]
+    return rows if returning else [row[0] for row in rows]
+
+
+def increment(model, pk, delta, initial=None, field='value'):
+    """
+    Атомарно прибавляет delta к полю field строки model с первичным
+    ключом pk. Отсутствующая строка создаётся со значением initial (по
+    умолчанию delta). Возвращает новое значение счётчика; при delta = 0
+    это существующее значение или созданное из initial.
+    """
+    connection = _get_connection(model)
+    initial = delta if initial is None else initial
+    if connection.vendor not in RETURNING_VENDORS:
+        with transaction.atomic(using=connection.alias):
+            instance, created = (
+                model._default_manager.using(connection.alias)
+                .select_for_update()
+                .get_or_create(pk=pk, defaults={field: initial}))
+            if not created and delta:
+                setattr(instance, field, getattr(instance, field) + delta)
+                instance.save(update_fields=[field], using=connection.alias)
+        return getattr(instance, field)
+
+    meta = model._meta
+    quote_name = connection.ops.quote_name
+    table = quote_name(meta.db_table)
+    pk_column = quote_name(meta.pk.column)
+    column = quote_name(meta.get_field(field).column)
+    sql = (
+        f'INSERT INTO {table} ({pk_column}, {column}) VALUES (%s, %s) '
+        f'ON CONFLICT ({pk_column}) DO UPDATE SET '
+        f'{column} = {table}.{column} + %s '
+        f'RETURNING {column}')
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [pk, initial, delta])
+        return cursor.fetchone()[0]
+
+
+def _convert(connection, field, value):
+    """Приводит значение из курсора к типу Python, как это делает ORM."""
+    expression = field.get_col(field.model._meta.db_table)
+    for converter in (connection.ops.get_db_converters(expression)
+                      + expression.get_db_converters(connection)):
+        value = converter(value, expression, connection)
+    return value
+
+
+class CurrentTransactionId(Func):
+    """
+    Номер текущей транзакции PostgreSQL для записи в поле модели.
+    64-битный номер pg_current_xact_id() не переполняется.
+    """
+
+    template = 'pg_current_xact_id()::text::bigint'
+    output_field = BigIntegerField()
+
+
+def current_transaction_id(model):
+    """Значение поля с номером транзакции; вне PostgreSQL — 0."""
+    if _get_connection(model).vendor != 'postgresql':
+        return Value(0)
+    return CurrentTransactionId()
+
+
+def get_transaction_horizon(connection):
+    """
+    Номер самой старой незавершённой транзакции PostgreSQL: все
+    транзакции с меньшими номерами уже зафиксированы или отменены. Для
+    других баз данных возвращает None: SQLite выполняет пишущие
+    транзакции по одной, и строки становятся видны в порядке id.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint')
+        return cursor.fetchone()[0]
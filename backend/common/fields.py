@@ -1,26 +1,123 @@
 import base64
-import uuid
+import hashlib
 
+from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 
 
 class Base64ImageField(serializers.ImageField):
     """
     Кастомное поле для работы с изображениями в формате base64.
     При получении строки base64, которая представляет изображение,
-    данное поле декодирует строку, сохраняет изображение как файл
-    с уникальным именем и передает его в стандартное поле изображения
-    Django REST framework.
+    данное поле декодирует строку и передает изображение в стандартное
+    поле изображения Django REST framework. Окончательное имя файла
+    формирует хранилище по хешу содержимого.
     """
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
+            format, _, imgstr = data.partition(';base64,')
+            ext = format.rpartition('/')[-1]
 
-            filename = f'{uuid.uuid4()}.{ext}'
-
-            data = ContentFile(base64.b64decode(imgstr), name=filename)
+            data = ContentFile(
+                base64.b64decode(imgstr), name=f'image.{ext}')
 
         return super().to_internal_value(data)
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Поле первичного ключа, которое при many=True разрешает все переданные
+    значения одним запросом id__in вместо отдельного запроса на каждое.
+    Сообщения об ошибках совпадают с PrimaryKeyRelatedField.
+
+    С параметром deferred=True поле только проверяет тип значения и
+    возвращает первичный ключ, а объекты загружаются позже через fetch,
+    например сразу для всех элементов вложенного списка.
+    """
+
+    def __init__(self, **kwargs):
+        self.deferred = kwargs.pop('deferred', False)
+        super().__init__(**kwargs)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def to_internal_value(self, data):
+        pk = self.to_pk(data)
+        if self.deferred:
+            return pk
+        return self.resolve([pk], [data])[0]
+
+    def to_pk(self, data):
+        """Проверяет тип значения и приводит его к типу первичного ключа."""
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        try:
+            if isinstance(data, bool):
+                raise TypeError
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except (TypeError, ValueError, ValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+    def fetch(self, pks):
+        """Возвращает словарь объектов по первичным ключам одним запросом."""
+        return self.get_queryset().in_bulk(set(pks))
+
+    def resolve(self, pks, raw_values):
+        """
+        Возвращает объекты для списка первичных ключей в том же порядке.
+        Для первого отсутствующего ключа возбуждает ошибку does_not_exist.
+        """
+        objects = self.fetch(pks)
+        for pk, raw_value in zip(pks, raw_values):
+            if pk not in objects:
+                self.fail('does_not_exist', pk_value=raw_value)
+        return [objects[pk] for pk in pks]
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Список связанных объектов, разрешаемых одним запросом."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        data = list(data)
+        pks = [self.child_relation.to_pk(item) for item in data]
+        return self.child_relation.resolve(pks, data)
+
+
+def file_digest(file):
+    """Вычисляет SHA-256 содержимого файла, читая его по частям."""
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_same_file(field_file, new_file):
+    """
+    Проверяет, совпадает ли содержимое загружаемого файла с уже сохранённым.
+    Хеши сравниваются только при совпадении размеров, чтобы не читать
+    сохранённый файл без необходимости.
+    """
+    if not field_file:
+        return False
+    try:
+        if field_file.size != new_file.size:
+            return False
+        with field_file.open('rb'):
+            stored_digest = file_digest(field_file)
+    except OSError:
+        return False
+    return stored_digest == file_digest(new_file)
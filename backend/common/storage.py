@@ -0,0 +1,115 @@
+"""
+Хранилище медиафайлов с адресацией по содержимому.
+
+Имя файла вычисляется из SHA-256 его содержимого, поэтому одинаковые
+изображения рецептов и аватаров хранятся в одном экземпляре, а файл
+по однажды выданному адресу никогда не меняется. Файл удаляется только
+тогда, когда на него не ссылается ни одно файловое поле моделей.
+
+Запись ссылки на уже существующий файл и удаление файла без ссылок не
+должны пересекаться, иначе новая запись может сослаться на удалённый
+файл. Поэтому сохранение берёт разделяемую, а удаление — исключительную
+рекомендательную блокировку PostgreSQL по имени файла до конца
+транзакции, а сохранение существующего файла обновляет время его
+изменения. release_file не удаляет файлы, использованные за последние
+CONTENT_STORAGE_RELEASE_GRACE секунд: ссылка на них может быть записана
+в ещё не зафиксированной транзакции. Такие файлы удаляет команда
+collect_media_garbage.
+"""
+from contextlib import contextmanager
+from functools import lru_cache
+import os
+import time
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import connection, models, transaction
+
+from common.constants import (CONTENT_STORAGE_LOCK_ID, CONTENT_STORAGE_NAME,
+                              CONTENT_STORAGE_RELEASE_GRACE)
+from common.fields import file_digest
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файловое хранилище, сохраняющее файлы под именем вида
+    images/ab/<sha256>.<расширение>. Каталог из upload_to не учитывается,
+    чтобы одинаковые файлы разных моделей совпадали. Если файл с таким
+    содержимым уже есть, повторная запись не выполняется, а обновляется
+    только время его изменения.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        digest = file_digest(content)
+        name = CONTENT_STORAGE_NAME.format(
+            prefix=digest[:2], digest=digest,
+            ext=os.path.splitext(name)[1].lower())
+        with file_lock(name, shared=True):
+            if self.exists(name):
+                os.utime(self.path(name))
+                return name
+            return self._save(name, content)
+
+
+@contextmanager
+def file_lock(name, shared=False):
+    """
+    Рекомендательная блокировка имени файла. Внутри внешней транзакции
+    держится до её завершения, иначе — до выхода из блока. В других
+    базах данных блокировка не берётся.
+    """
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            function = (
+                'pg_advisory_xact_lock_shared' if shared
+                else 'pg_advisory_xact_lock')
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT {function}(%s, hashtext(%s))',
+                    [CONTENT_STORAGE_LOCK_ID, name])
+        yield
+
+
+@lru_cache(maxsize=None)
+def get_file_fields():
+    """Возвращает пары (модель, поле) для всех файловых полей проекта."""
+    return tuple(
+        (model, field)
+        for model in apps.get_models()
+        for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField))
+
+
+def is_referenced(name):
+    """Проверяет, ссылается ли на файл хотя бы одна запись в базе."""
+    return any(
+        model._default_manager.filter(**{field.name: name}).exists()
+        for model, field in get_file_fields())
+
+
+def release_file(name):
+    """
+    После фиксации транзакции удаляет файл из хранилища, если на него
+    больше не ссылается ни одна запись и его давно не сохраняли.
+    """
+    if not name:
+        return
+
+    def delete_unreferenced():
+        with file_lock(name):
+            if is_referenced(name):
+                return
+            try:
+                modified_at = os.path.getmtime(default_storage.path(name))
+            except FileNotFoundError:
+                return
+            if time.time() - modified_at >= CONTENT_STORAGE_RELEASE_GRACE:
+                default_storage.delete(name)
+
+    transaction.on_commit(delete_unreferenced)
@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+from .models import ConsumerOffset, OutboxEvent
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'topic', 'xid', 'created_at',)
+    list_filter = ('topic',)
+
+
+@admin.register(ConsumerOffset)
+class ConsumerOffsetAdmin(admin.ModelAdmin):
+    list_display = ('consumer', 'xid', 'position', 'updated_at',)
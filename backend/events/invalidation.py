@@ -0,0 +1,177 @@
+"""
+Шина инвалидации данных, которые процессы держат в памяти.
+
+Процесс, изменивший данные, сам обновляет свои локальные кэши и вызывает
+publish: после фиксации транзакции в канал PostgreSQL
+INVALIDATION_CHANNEL уходит короткое сообщение с видом данных и
+ключами. В каждом процессе приложения поток-слушатель получает
+сообщения от других процессов (в том числе на других серверах) и
+передаёт ключи обработчику, зарегистрированному для этого вида через
+register. Обработчик без ключей (None) должен сбросить все свои данные.
+
+Сообщения нумеруются последовательностью PostgreSQL. Уведомления разных
+транзакций могут прийти не по порядку, поэтому пропущенный номер
+ожидается INVALIDATION_GAP_TIMEOUT секунд; если он так и не пришёл, а
+также после переподключения слушателя сбрасываются все локальные
+данные. Для других баз данных сообщения не отправляются, и локальные
+данные устаревают по своим срокам жизни.
+"""
+from contextlib import closing
+import json
+import logging
+import os
+import select
+import threading
+import time
+import uuid
+
+from django.core.signals import request_started
+from django.db import connection, transaction
+from django.dispatch import receiver
+import psycopg2
+
+from common.constants import (INVALIDATION_CHANNEL, INVALIDATION_GAP_TIMEOUT,
+                              INVALIDATION_MAX_GAP, INVALIDATION_MAX_PAYLOAD,
+                              INVALIDATION_SEQUENCE, NOTIFY_RECONNECT_DELAY)
+
+logger = logging.getLogger(__name__)
+
+NODE = uuid.uuid4().hex[:12]
+
+handlers = {}
+
+
+def get_origin():
+    """Идентификатор процесса, уникальный и после fork."""
+    return f'{NODE}:{os.getpid()}'
+
+
+def register(kind, handler):
+    """Регистрирует обработчик сообщений вида kind."""
+    handlers[kind] = handler
+
+
+def publish(kind, keys=None):
+    """
+    После фиксации текущей транзакции сообщает другим процессам, что
+    данные вида kind с ключами keys изменились. keys=None означает, что
+    изменились все данные этого вида.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    keys = None if keys is None else sorted(set(keys))
+    transaction.on_commit(lambda: _send(kind, keys))
+
+
+def _send(kind, keys):
+    body = json.dumps(
+        {'o': get_origin(), 'k': kind, 'i': keys}, separators=(',', ':'))
+    if len(body) > INVALIDATION_MAX_PAYLOAD:
+        body = json.dumps(
+            {'o': get_origin(), 'k': kind, 'i': None}, separators=(',', ':'))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_notify(%s, nextval(%s) || ' ' || %s)",
+            [INVALIDATION_CHANNEL, INVALIDATION_SEQUENCE, body])
+
+
+def apply(kind, keys):
+    handler = handlers.get(kind)
+    if handler is None:
+        return
+    try:
+        handler(keys)
+    except Exception:
+        logger.exception('Не удалось применить инвалидацию %s.', kind)
+
+
+def flush_all():
+    for kind in list(handlers):
+        apply(kind, None)
+
+
+class InvalidationListener:
+    """Поток, применяющий сообщения шины в своём процессе."""
+
+    def __init__(self):
+        self.pid = None
+        self.lock = threading.Lock()
+        self.expected = None
+        self.gaps = {}
+
+    def ensure_started(self):
+        """Запускает поток в текущем процессе, если он ещё не запущен."""
+        if self.pid == os.getpid() or connection.vendor != 'postgresql':
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            threading.Thread(
+                target=self.run, args=(connection.get_connection_params(),),
+                name='invalidation-listener', daemon=True).start()
+
+    def run(self, params):
+        while True:
+            try:
+                self.listen(params)
+            except (psycopg2.Error, OSError):
+                logger.exception('Соединение шины инвалидации потеряно.')
+            time.sleep(NOTIFY_RECONNECT_DELAY)
+
+    def listen(self, params):
+        with closing(psycopg2.connect(**params)) as listener:
+            listener.set_isolation_level(
+                psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with listener.cursor() as cursor:
+                cursor.execute(f'LISTEN {INVALIDATION_CHANNEL}')
+            # Пока слушателя не было, сообщения могли быть пропущены.
+            self.expected = None
+            self.gaps.clear()
+            flush_all()
+            while True:
+                if select.select(
+                        [listener], [], [], INVALIDATION_GAP_TIMEOUT)[0]:
+                    listener.poll()
+                    while listener.notifies:
+                        self.receive(listener.notifies.pop(0).payload)
+                self.check_gaps()
+
+    def receive(self, payload):
+        sequence, _, body = payload.partition(' ')
+        self.track(int(sequence))
+        message = json.loads(body)
+        if message['o'] != get_origin():
+            apply(message['k'], message['i'])
+
+    def track(self, sequence):
+        """Отмечает полученный номер и запоминает пропущенные перед ним."""
+        if self.expected is not None and sequence < self.expected:
+            self.gaps.pop(sequence, None)
+            return
+        if self.expected is not None:
+            if sequence - self.expected > INVALIDATION_MAX_GAP:
+                self.flush('слишком много пропущенных сообщений')
+            else:
+                deadline = time.monotonic() + INVALIDATION_GAP_TIMEOUT
+                for missing in range(self.expected, sequence):
+                    self.gaps[missing] = deadline
+        self.expected = sequence + 1
+
+    def check_gaps(self):
+        now = time.monotonic()
+        if any(deadline < now for deadline in self.gaps.values()):
+            self.flush('пропущено сообщение')
+
+    def flush(self, reason):
+        logger.warning('Сброс локальных кэшей: %s.', reason)
+        self.gaps.clear()
+        flush_all()
+
+
+listener = InvalidationListener()
+
+
+@receiver(request_started)
+def start_listener(sender, **kwargs):
+    listener.ensure_started()
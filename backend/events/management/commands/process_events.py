@@ -0,0 +1,63 @@
+from datetime import timedelta
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from common.constants import (OUTBOX_BATCH_SIZE, OUTBOX_POLL_INTERVAL,
+                              OUTBOX_RETENTION_HOURS)
+from events.outbox import consumers, process_batch, prune_events
+
+
+class Command(BaseCommand):
+    help = (
+        'Передаёт события из outbox зарегистрированным потребителям. '
+        'По умолчанию работает непрерывно, опрашивая таблицу событий.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать накопившиеся события и завершиться.',
+        )
+        parser.add_argument(
+            '--consumer',
+            action='append',
+            help='Обрабатывать только указанных потребителей.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=OUTBOX_BATCH_SIZE,
+            help='Количество событий, передаваемых потребителю за раз.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=OUTBOX_POLL_INTERVAL,
+            help='Пауза в секундах, если новых событий нет.',
+        )
+
+    def handle(self, *args, **kwargs):
+        names = kwargs['consumer'] or sorted(consumers)
+        unknown = set(names) - set(consumers)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные потребители: {", ".join(sorted(unknown))}.')
+
+        retention = timedelta(hours=OUTBOX_RETENTION_HOURS)
+        processed = 0
+        while True:
+            batch_processed = sum(
+                process_batch(name, kwargs['batch_size']) for name in names)
+            processed += batch_processed
+            if batch_processed:
+                continue
+
+            pruned = prune_events(retention)
+            if kwargs['once']:
+                break
+            if not pruned:
+                time.sleep(kwargs['interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано событий: {processed}.'))
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.3 on 2026-10-19 11:20
+
+from django.db import migrations
+
+INVALIDATION_SEQUENCE = 'events_invalidation_seq'
+
+
+def create_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE SEQUENCE IF NOT EXISTS {INVALIDATION_SEQUENCE}')
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'DROP SEQUENCE IF EXISTS {INVALIDATION_SEQUENCE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_sequence, drop_sequence),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.3 on 2026-10-19 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0002_invalidation_sequence'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='outboxevent',
+            options={'ordering': ['xid', 'id'], 'verbose_name': 'Событие', 'verbose_name_plural': 'События'},
+        ),
+        migrations.AddField(
+            model_name='consumeroffset',
+            name='xid',
+            field=models.BigIntegerField(default=0, verbose_name='Номер транзакции последнего обработанного события'),
+        ),
+        migrations.AddField(
+            model_name='outboxevent',
+            name='xid',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Номер транзакции'),
+        ),
+        migrations.AddIndex(
+            model_name='outboxevent',
+            index=models.Index(fields=['xid', 'id'], name='outbox_event_order_idx'),
+        ),
+    ]
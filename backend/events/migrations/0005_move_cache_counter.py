@@ -0,0 +1,28 @@
+# Generated by Django 3.2.3 on 2026-10-19 14:05
+
+from django.db import migrations
+
+
+# Модель CacheCounter перенесена в приложение api: таблица со счётчиками
+# переименовывается, а не создаётся заново.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0004_cache_counter'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.AlterModelTable(
+                    name='CacheCounter',
+                    table='api_cachecounter',
+                ),
+            ],
+            state_operations=[
+                migrations.DeleteModel(
+                    name='CacheCounter',
+                ),
+            ],
+        ),
+    ]
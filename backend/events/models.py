@@ -0,0 +1,63 @@
+from django.db import models
+
+from common.constants import EVENT_CONSUMER_MAX_LENGTH, EVENT_TOPIC_MAX_LENGTH
+
+
+class OutboxEvent(models.Model):
+    """
+    Доменное событие, записанное в той же транзакции, что и изменение
+    данных. Порядок событий задаётся парой (номер транзакции, id):
+    транзакции с меньшим номером начали запись раньше.
+    """
+
+    topic = models.CharField(
+        max_length=EVENT_TOPIC_MAX_LENGTH,
+        verbose_name='Тема')
+    payload = models.JSONField(
+        default=dict,
+        verbose_name='Данные')
+    created_at = models.DateTimeField(
+        auto_now_add=True, db_index=True,
+        verbose_name='Время создания')
+    xid = models.BigIntegerField(
+        default=0, editable=False,
+        verbose_name='Номер транзакции')
+
+    class Meta:
+        verbose_name = 'Событие'
+        verbose_name_plural = 'События'
+        ordering = ['xid', 'id']
+        indexes = [
+            models.Index(fields=['xid', 'id'], name='outbox_event_order_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.pk}: {self.topic}'
+
+
+class ConsumerOffset(models.Model):
+    """
+    Последнее обработанное потребителем событие: номер его транзакции
+    и id.
+    """
+
+    consumer = models.CharField(
+        max_length=EVENT_CONSUMER_MAX_LENGTH,
+        primary_key=True,
+        verbose_name='Потребитель')
+    xid = models.BigIntegerField(
+        default=0,
+        verbose_name='Номер транзакции последнего обработанного события')
+    position = models.BigIntegerField(
+        default=0,
+        verbose_name='Последнее обработанное событие')
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Время обновления')
+
+    class Meta:
+        verbose_name = 'Позиция потребителя'
+        verbose_name_plural = 'Позиции потребителей'
+
+    def __str__(self):
+        return f'{self.consumer}: {self.position}'
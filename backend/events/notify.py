@@ -0,0 +1,22 @@
+"""
+Мгновенные уведомления через PostgreSQL LISTEN/NOTIFY.
+
+notify вызывается в транзакции изменения: PostgreSQL доставляет
+уведомление слушателям только после фиксации транзакции и не доставляет
+его при откате. Для других баз данных уведомления не отправляются.
+"""
+import json
+
+from django.db import connection
+
+from common.constants import NOTIFY_CHANNEL
+
+
+def notify(kind, **payload):
+    """Отправляет уведомление вида kind в канал NOTIFY_CHANNEL."""
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_notify(%s, %s)',
+            [NOTIFY_CHANNEL, json.dumps({'type': kind, **payload})])
@@ -0,0 +1,117 @@
+"""
+Транзакционный outbox доменных событий.
+
+publish записывает событие в таблицу OutboxEvent в текущей транзакции,
+поэтому событие сохраняется тогда и только тогда, когда сохраняется само
+изменение. Команда process_events читает события пачками и передаёт их
+зарегистрированным потребителям, запоминая для каждого позицию последнего
+обработанного события. Доставка выполняется не менее одного раза:
+обработчики должны быть идемпотентными.
+
+События читаются в порядке (номер транзакции, id) и только из
+транзакций старше горизонта get_transaction_horizon: транзакция с
+меньшим id может зафиксироваться позже, и при чтении по id её событие
+оказалось бы пропущено. Поэтому долгая незавершённая транзакция в базе
+задерживает обработку всех более новых событий.
+
+Потребители объявляются в модулях consumers.py приложений через
+декоратор consumer и подключаются при запуске Django.
+"""
+from functools import reduce
+import operator
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from common.db import current_transaction_id, get_transaction_horizon
+from .models import ConsumerOffset, OutboxEvent
+
+consumers = {}
+
+
+def publish(topic, **payload):
+    """
+    Записывает событие в outbox. Вызывается внутри транзакции,
+    в которой выполняется изменение данных.
+    """
+    event = OutboxEvent.objects.create(
+        topic=topic, payload=payload,
+        xid=current_transaction_id(OutboxEvent))
+    # Поле содержит выражение; номер транзакции нужен только при чтении.
+    del event.xid
+    return event
+
+
+def consumer(name, topics):
+    """
+    Регистрирует обработчик пачки событий с указанными темами.
+    Обработчик получает список объектов OutboxEvent в порядке записи.
+    """
+    def decorator(handler):
+        consumers[name] = (frozenset(topics), handler)
+        return handler
+    return decorator
+
+
+def process_batch(name, batch_size):
+    """
+    Передаёт потребителю следующую пачку событий и сдвигает его позицию.
+
+    Обработка и сдвиг позиции выполняются в одной транзакции, а строка
+    позиции блокируется, поэтому несколько запущенных обработчиков не
+    получат одну и ту же пачку.
+
+    Возвращает количество просмотренных событий.
+    """
+    topics, handler = consumers[name]
+    with transaction.atomic():
+        ConsumerOffset.objects.get_or_create(consumer=name)
+        offset = ConsumerOffset.objects.select_for_update().get(
+            consumer=name)
+        events = OutboxEvent.objects.filter(after_offset(offset))
+        horizon = get_transaction_horizon(connection)
+        if horizon is not None:
+            events = events.filter(xid__lt=horizon)
+        events = list(events.order_by('xid', 'pk')[:batch_size])
+        if not events:
+            return 0
+
+        matching = [event for event in events if event.topic in topics]
+        if matching:
+            handler(matching)
+
+        offset.xid, offset.position = events[-1].xid, events[-1].pk
+        offset.save(update_fields=['xid', 'position', 'updated_at'])
+    return len(events)
+
+
+def after_offset(offset):
+    """Условие на события, следующие за позицией потребителя."""
+    return after_position(offset.xid, offset.position)
+
+
+def after_position(xid, position):
+    """
+    Условие на события, следующие за событием с номером транзакции xid
+    и id position.
+    """
+    return Q(xid__gt=xid) | Q(xid=xid, pk__gt=position)
+
+
+def prune_events(retention):
+    """
+    Удаляет события, которые обработаны всеми потребителями и старше
+    retention. Возвращает количество удалённых событий.
+    """
+    offsets = [
+        ConsumerOffset.objects.filter(consumer=name).first()
+        or ConsumerOffset(consumer=name)
+        for name in consumers]
+    if not offsets:
+        return 0
+    processed = reduce(
+        operator.and_, (~after_offset(offset) for offset in offsets))
+    deleted, _ = OutboxEvent.objects.filter(
+        processed, created_at__lt=timezone.now() - retention).delete()
+    return deleted
@@ -0,0 +1,93 @@
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from common.constants import INVALIDATION_MAX_GAP
+from events.invalidation import InvalidationListener, get_origin
+
+KIND = 'test'
+
+
+def message(sequence, keys, origin='other:1'):
+    body = json.dumps({'o': origin, 'k': KIND, 'i': keys})
+    return f'{sequence} {body}'
+
+
+class InvalidationListenerTest(SimpleTestCase):
+
+    def setUp(self):
+        self.applied = []
+        patcher = mock.patch.dict(
+            'events.invalidation.handlers', {KIND: self.applied.append},
+            clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.listener = InvalidationListener()
+
+    def track(self, *sequences):
+        for sequence in sequences:
+            self.listener.track(sequence)
+
+    def test_in_order_delivery(self):
+        self.track(1, 2, 3)
+        self.listener.check_gaps()
+
+        self.assertEqual(self.listener.expected, 4)
+        self.assertEqual(self.listener.gaps, {})
+        self.assertEqual(self.applied, [])
+
+    def test_late_message_fills_gap(self):
+        self.track(1, 4)
+        self.assertEqual(set(self.listener.gaps), {2, 3})
+
+        self.track(3, 2)
+        self.listener.check_gaps()
+
+        self.assertEqual(self.listener.gaps, {})
+        self.assertEqual(self.listener.expected, 5)
+        self.assertEqual(self.applied, [])
+
+    @mock.patch('events.invalidation.INVALIDATION_GAP_TIMEOUT', -1)
+    def test_gap_timeout_flushes(self):
+        self.track(1, 3)
+        self.listener.check_gaps()
+
+        self.assertEqual(self.applied, [None])
+        self.assertEqual(self.listener.gaps, {})
+        self.track(2)
+        self.assertEqual(self.applied, [None])
+
+    def test_too_large_gap_flushes_at_once(self):
+        self.track(1, INVALIDATION_MAX_GAP + 3)
+
+        self.assertEqual(self.applied, [None])
+        self.assertEqual(self.listener.gaps, {})
+        self.assertEqual(self.listener.expected, INVALIDATION_MAX_GAP + 4)
+
+    def test_largest_allowed_gap_waits(self):
+        self.track(1, INVALIDATION_MAX_GAP + 2)
+
+        self.assertEqual(self.applied, [])
+        self.assertEqual(len(self.listener.gaps), INVALIDATION_MAX_GAP)
+
+    def test_receive_skips_own_messages(self):
+        self.listener.receive(message(1, [5], origin=get_origin()))
+        self.listener.receive(message(2, [6, 7]))
+        self.listener.receive(message(3, None))
+
+        self.assertEqual(self.applied, [[6, 7], None])
+        self.assertEqual(self.listener.expected, 4)
+
+    @mock.patch('events.invalidation.select.select', side_effect=OSError)
+    @mock.patch('events.invalidation.psycopg2.connect')
+    def test_reconnect_flushes(self, connect, select):
+        self.track(1, 3)
+
+        with self.assertRaises(OSError):
+            self.listener.listen({})
+
+        self.assertEqual(self.applied, [None])
+        self.assertIsNone(self.listener.expected)
+        self.assertEqual(self.listener.gaps, {})
+        connect.return_value.close.assert_called_once()
@@ -0,0 +1,81 @@
+from datetime import timedelta
+import threading
+from unittest import mock, skipUnless
+
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
+
+from events.models import ConsumerOffset, OutboxEvent
+from events.outbox import process_batch, prune_events, publish
+
+TOPIC = 'test.topic'
+
+
+class OutboxMixin:
+
+    def setUp(self):
+        self.received = []
+        patcher = mock.patch.dict(
+            'events.outbox.consumers',
+            {'test': (frozenset([TOPIC]), self.received.extend)}, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def received_ids(self):
+        return [event.payload['n'] for event in self.received]
+
+
+class ProcessBatchTest(OutboxMixin, TestCase):
+
+    def test_delivers_events_once_in_order(self):
+        for n in range(3):
+            publish(TOPIC, n=n)
+        publish('other.topic', n=99)
+
+        self.assertEqual(process_batch('test', batch_size=2), 2)
+        self.assertEqual(process_batch('test', batch_size=2), 2)
+        self.assertEqual(process_batch('test', batch_size=2), 0)
+        self.assertEqual(self.received_ids(), [0, 1, 2])
+
+    def test_prune_keeps_unprocessed_events(self):
+        publish(TOPIC, n=0)
+        process_batch('test', batch_size=10)
+        publish(TOPIC, n=1)
+
+        deleted = prune_events(retention=timedelta(seconds=-1))
+
+        self.assertEqual(deleted, 1)
+        self.assertEqual(
+            [event.payload['n'] for event in OutboxEvent.objects.all()], [1])
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'Номера транзакций есть только в PostgreSQL.')
+class ProcessBatchVisibilityTest(OutboxMixin, TransactionTestCase):
+
+    def test_event_committed_late_is_not_skipped(self):
+        published = threading.Event()
+        release = threading.Event()
+
+        def slow_transaction():
+            try:
+                with transaction.atomic():
+                    publish(TOPIC, n=0)
+                    published.set()
+                    release.wait(10)
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=slow_transaction)
+        thread.start()
+        published.wait(10)
+        publish(TOPIC, n=1)
+
+        self.assertEqual(process_batch('test', batch_size=10), 0)
+
+        release.set()
+        thread.join()
+        self.assertEqual(process_batch('test', batch_size=10), 2)
+        self.assertEqual(self.received_ids(), [0, 1])
+        offset = ConsumerOffset.objects.get(consumer='test')
+        self.assertGreater(offset.xid, 0)
@@ -13,4 +13,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Импорт после настройки Django: модулю нужны модели.
+from api.stream import recipe_stream  # noqa: E402
+from common.constants import SSE_PATH  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """
+    Поток уведомлений о новых рецептах обслуживается напрямую, остальные
+    запросы передаются Django.
+    """
+    if scope['type'] == 'http' and scope['path'] == SSE_PATH:
+        return await recipe_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
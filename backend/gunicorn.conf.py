@@ -0,0 +1,14 @@
+"""
+Настройки gunicorn. Файл gunicorn.conf.py читается из рабочего каталога
+автоматически.
+"""
+
+
+def post_worker_init(worker):
+    """
+    Строит индекс поиска по ингредиентам до того, как рабочий процесс
+    начнёт принимать запросы, и запускает его фоновое перестроение.
+    """
+    from recipes.ingredient_index import ingredient_index
+
+    ingredient_index.start()
@@ -0,0 +1,79 @@
+import os
+
+from django.contrib import admin
+from django.http import FileResponse, Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from .models import RequestProfile
+from .profiler import (PROFILE_EXTENSION, SQL_LOG_EXTENSION,
+                       delete_profile_files, format_stats, get_profile_path)
+
+DOWNLOAD_EXTENSIONS = {
+    'prof': PROFILE_EXTENSION,
+    'sql': SQL_LOG_EXTENSION,
+}
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'method', 'path', 'status_code',
+                    'duration', 'query_count', 'query_duration', 'user',
+                    'get_links',)
+    list_filter = ('method', 'status_code',)
+    search_fields = ('path', 'name',)
+    readonly_fields = ('name', 'user', 'method', 'path', 'status_code',
+                       'duration', 'query_count', 'query_duration',
+                       'created_at', 'get_links',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/<str:kind>/',
+                 self.admin_site.admin_view(self.download),
+                 name='profiling_requestprofile_download'),
+        ] + super().get_urls()
+
+    def download(self, request, pk, kind):
+        if not self.has_view_permission(request):
+            raise Http404
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        if kind == 'stats':
+            try:
+                return HttpResponse(
+                    format_stats(profile.name),
+                    content_type='text/plain; charset=utf-8')
+            except FileNotFoundError:
+                raise Http404
+        if kind not in DOWNLOAD_EXTENSIONS:
+            raise Http404
+        filename = profile.name + DOWNLOAD_EXTENSIONS[kind]
+        file_path = get_profile_path(profile.name, DOWNLOAD_EXTENSIONS[kind])
+        if not os.path.exists(file_path):
+            raise Http404
+        return FileResponse(
+            open(file_path, 'rb'), as_attachment=True, filename=filename)
+
+    def get_links(self, obj):
+        return format_html(
+            '<a href="{}">сводка</a> | <a href="{}">.prof</a> | '
+            '<a href="{}">SQL</a>',
+            *(reverse('admin:profiling_requestprofile_download',
+                      args=(obj.pk, kind))
+              for kind in ('stats', 'prof', 'sql')))
+    get_links.short_description = 'Файлы'
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        delete_profile_files([obj.name])
+
+    def delete_queryset(self, request, queryset):
+        names = list(queryset.values_list('name', flat=True))
+        super().delete_queryset(request, queryset)
+        delete_profile_files(names)
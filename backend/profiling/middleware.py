@@ -0,0 +1,103 @@
+import cProfile
+from contextlib import ExitStack
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from common.constants import (PROFILE_HEADER, PROFILE_MAX_COUNT,
+                              PROFILE_PATH_MAX_LENGTH, PROFILE_QUERY_PARAM,
+                              PROFILE_RESPONSE_HEADER)
+from .models import RequestProfile
+from .profiler import (PROFILE_EXTENSION, SQL_LOG_EXTENSION, QueryLog,
+                       delete_profile_files, get_profile_path)
+
+
+def get_staff_user(request):
+    """
+    Возвращает сотрудника, выполняющего запрос, или None. Токен API
+    проверяется здесь же, так как DRF аутентифицирует запрос уже
+    внутри представления.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        return user
+    try:
+        result = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    if result is not None and result[0].is_staff:
+        return result[0]
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует запрос сотрудника, если он передал заголовок X-Profile
+    или параметр ?_profile. Запрос выполняется под cProfile (в профиль
+    попадают кадры ORM и сериализаторов), все SQL-запросы записываются
+    в журнал, а результат сохраняется в PROFILE_ROOT и доступен в
+    админке. Имя профиля возвращается в заголовке X-Profile-Id.
+
+    Для остальных запросов проверяется только наличие флага, поэтому
+    накладные расходы практически нулевые. Тело потоковых ответов
+    формируется после выхода из middleware и в профиль не попадает.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (PROFILE_HEADER not in request.META
+                and PROFILE_QUERY_PARAM not in request.GET):
+            return self.get_response(request)
+        user = get_staff_user(request)
+        if user is None:
+            return self.get_response(request)
+        return self.profile(request, user)
+
+    def profile(self, request, user):
+        query_log = QueryLog()
+        profiler = cProfile.Profile()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(query_log))
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            duration = (time.perf_counter() - start) * 1000
+
+        name = f'{timezone.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}'
+        os.makedirs(settings.PROFILE_ROOT, exist_ok=True)
+        profiler.dump_stats(get_profile_path(name, PROFILE_EXTENSION))
+        query_log.write(get_profile_path(name, SQL_LOG_EXTENSION))
+        RequestProfile.objects.create(
+            name=name,
+            user=user,
+            method=request.method,
+            path=request.get_full_path()[:PROFILE_PATH_MAX_LENGTH],
+            status_code=response.status_code,
+            duration=duration,
+            query_count=len(query_log.queries),
+            query_duration=query_log.duration,
+        )
+        self.prune()
+        response[PROFILE_RESPONSE_HEADER] = name
+        return response
+
+    def prune(self):
+        """Оставляет только PROFILE_MAX_COUNT последних профилей."""
+        stale = RequestProfile.objects.order_by('-created_at', '-pk')[
+            PROFILE_MAX_COUNT:]
+        names = list(stale.values_list('name', flat=True))
+        if names:
+            RequestProfile.objects.filter(name__in=names).delete()
+            delete_profile_files(names)
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.db import models
+
+from common.constants import (PROFILE_METHOD_MAX_LENGTH,
+                              PROFILE_NAME_MAX_LENGTH, PROFILE_PATH_MAX_LENGTH)
+
+
+class RequestProfile(models.Model):
+    """
+    Профиль одного запроса. Сами данные cProfile и журнал SQL-запросов
+    хранятся в файлах в каталоге PROFILE_ROOT под именем name.
+    """
+
+    name = models.CharField(
+        max_length=PROFILE_NAME_MAX_LENGTH,
+        unique=True,
+        verbose_name='Имя файлов')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='request_profiles',
+        verbose_name='Пользователь')
+    method = models.CharField(
+        max_length=PROFILE_METHOD_MAX_LENGTH,
+        verbose_name='Метод')
+    path = models.CharField(
+        max_length=PROFILE_PATH_MAX_LENGTH,
+        verbose_name='Адрес')
+    status_code = models.PositiveSmallIntegerField(
+        verbose_name='Код ответа')
+    duration = models.FloatField(
+        verbose_name='Длительность, мс')
+    query_count = models.PositiveIntegerField(
+        verbose_name='Количество SQL-запросов')
+    query_duration = models.FloatField(
+        verbose_name='Время SQL-запросов, мс')
+    created_at = models.DateTimeField(
+        auto_now_add=True, db_index=True,
+        verbose_name='Время создания')
+
+    class Meta:
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.method} {self.path}'
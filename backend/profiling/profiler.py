@@ -0,0 +1,68 @@
+import io
+import os
+import pstats
+import time
+
+from django.conf import settings
+
+from common.constants import PROFILE_STATS_LIMIT
+
+PROFILE_EXTENSION = '.prof'
+SQL_LOG_EXTENSION = '.sql'
+
+
+def get_profile_path(name, extension):
+    """Путь к файлу профиля в каталоге PROFILE_ROOT."""
+    return os.path.join(settings.PROFILE_ROOT, name + extension)
+
+
+class QueryLog:
+    """
+    Обёртка выполнения SQL-запросов (connection.execute_wrapper),
+    которая запоминает текст и время каждого запроса. В отличие от
+    connection.queries работает и при DEBUG = False.
+
+    Параметры запросов не сохраняются: среди них токен API, по которому
+    DRF находит пользователя, и хеши паролей, а журнал может скачать
+    любой сотрудник.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                (sql, (time.perf_counter() - start) * 1000))
+
+    @property
+    def duration(self):
+        return sum(duration for _, duration in self.queries)
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            for number, (sql, duration) in enumerate(self.queries, start=1):
+                file.write(f'-- #{number}: {duration:.2f} мс\n')
+                file.write(f'{sql};\n\n')
+
+
+def format_stats(name):
+    """Текстовая сводка профиля: самые затратные функции по общему времени."""
+    stream = io.StringIO()
+    stats = pstats.Stats(
+        get_profile_path(name, PROFILE_EXTENSION), stream=stream)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(
+        PROFILE_STATS_LIMIT)
+    return stream.getvalue()
+
+
+def delete_profile_files(names):
+    for name in names:
+        for extension in (PROFILE_EXTENSION, SQL_LOG_EXTENSION):
+            try:
+                os.remove(get_profile_path(name, extension))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,65 @@
+import os
+import tempfile
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from common.constants import PROFILE_RESPONSE_HEADER
+from profiling.models import RequestProfile
+from profiling.profiler import SQL_LOG_EXTENSION, QueryLog, get_profile_path
+from recipes.tests.utils import create_user, token_client
+
+
+class ProfilingTest(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(PROFILE_ROOT=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.directory = directory.name
+
+    def read_log(self, name):
+        with open(get_profile_path(name, SQL_LOG_EXTENSION),
+                  encoding='utf-8') as file:
+            return file.read()
+
+    def test_staff_request_is_profiled_without_query_parameters(self):
+        staff = create_user('staff', is_staff=True)
+        client = token_client(staff)
+        token = Token.objects.get(user=staff).key
+
+        response = client.get('/api/recipes/', {'_profile': 1})
+
+        self.assertEqual(response.status_code, 200)
+        name = response[PROFILE_RESPONSE_HEADER]
+        profile = RequestProfile.objects.get(name=name)
+        self.assertEqual(profile.user, staff)
+        self.assertGreater(profile.query_count, 0)
+        log = self.read_log(name)
+        self.assertIn('authtoken_token', log)
+        self.assertNotIn(token, log)
+
+    def test_regular_user_is_not_profiled(self):
+        response = token_client(create_user('user')).get(
+            '/api/recipes/', {'_profile': 1})
+
+        self.assertNotIn(PROFILE_RESPONSE_HEADER, response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_password_hash_is_not_logged(self):
+        user = create_user('user')
+        query_log = QueryLog()
+        with connection.execute_wrapper(query_log):
+            user.set_password('new-password')
+            user.save()
+        path = os.path.join(self.directory, 'log.sql')
+
+        query_log.write(path)
+
+        with open(path, encoding='utf-8') as file:
+            log = file.read()
+        self.assertIn('UPDATE', log)
+        self.assertNotIn(user.password, log)
@@ -1,9 +1,15 @@
 from django import forms
 from django.contrib import admin
 from django.core.exceptions import ValidationError
+from django.db import transaction
 
 from common.constants import ERROR_EMPTY_INGREDIENTS
+from common.storage import release_file
+from .cards import refresh_recipe_cards
+from .ingredient_index import ingredient_index
 from .models import Favorite, Ingredient, Recipe, RecipeIngredient, Tag
+from .similarity import mark_stale
+from .tag_mask import refresh_tags_masks
 
 
 class RecipeIngredientInlineFormSet(forms.BaseInlineFormSet):
@@ -41,6 +47,30 @@ class RecipeAdmin(admin.ModelAdmin):
     search_fields = ('name', 'author__username',)
     list_filter = ('tags',)
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'image' in form.changed_data:
+            release_file(form.initial['image'].name)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        refresh_tags_masks([form.instance.pk])
+        refresh_recipe_cards([form.instance.pk])
+        if change:
+            mark_stale(form.instance)
+        recipe_id = form.instance.pk
+        ingredient_ids = list(form.instance.recipe_ingredients.values_list(
+            'ingredient_id', flat=True))
+        transaction.on_commit(
+            lambda: ingredient_index.update_recipe(recipe_id, ingredient_ids))
+
+    def delete_model(self, request, obj):
+        recipe_id = obj.pk
+        super().delete_model(request, obj)
+        transaction.on_commit(
+            lambda: ingredient_index.remove_recipe(recipe_id))
+        release_file(obj.image.name)
+
     def get_ingredients(self, obj):
         return ', '.join(
             [f'{ri.name}' for ri in obj.ingredients.all()]
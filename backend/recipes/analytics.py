@@ -0,0 +1,250 @@
+"""
+Выгрузка данных о вовлечённости пользователей для аналитики.
+
+Таблицы избранного, корзин, подписок и ингредиентов рецептов читаются
+через серверный курсор пачками по batch_size строк и записываются в
+сжатые файлы Parquet (если установлен пакет pyarrow) или CSV в gzip,
+поэтому потребление памяти не зависит от размера таблицы.
+
+Выгрузка может быть инкрементальной: для каждой таблицы в файле
+ANALYTICS_WATERMARK_FILE каталога выгрузки хранится отметка — наибольший
+выгруженный id или время, до которого выгружены строки, — и следующая
+выгрузка берёт только более новые строки. Удаления (например, из
+избранного) и изменения количества ингредиентов инкрементальная
+выгрузка не отражает, а строки, созданные до появления поля
+created_at, выгружаются только по id.
+
+Строка с меньшим id может быть зафиксирована позже строки с большим,
+поэтому строки, добавленные за последние ANALYTICS_WATERMARK_LAG
+секунд, не выгружаются по id и не сдвигают отметку id: они войдут в
+следующую выгрузку. После полной выгрузки или выгрузки по времени
+такие строки могут попасть и в следующую выгрузку по id.
+"""
+import csv
+from datetime import timedelta
+import gzip
+import json
+import os
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from common.constants import (ANALYTICS_BATCH_SIZE, ANALYTICS_FORMAT_PARQUET,
+                              ANALYTICS_PARQUET_COMPRESSION,
+                              ANALYTICS_WATERMARK_FILE, ANALYTICS_WATERMARK_ID,
+                              ANALYTICS_WATERMARK_LAG,
+                              ANALYTICS_WATERMARK_TIME)
+from users.models import Subscription
+from .models import Favorite, RecipeIngredient, ShoppingCart
+from .ndjson import chunked
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+INT32 = 'int32'
+INT64 = 'int64'
+STRING = 'string'
+TIMESTAMP = 'timestamp'
+
+
+class AnalyticsTable:
+    """
+    Выгружаемая таблица: модель, столбцы в виде кортежей (имя в файле,
+    поле для values_list, тип) и поле времени для отметки по времени.
+    """
+
+    def __init__(self, model, columns, time_field):
+        self.model = model
+        self.columns = columns
+        self.time_field = time_field
+
+    @property
+    def names(self):
+        return [name for name, _, _ in self.columns]
+
+    @property
+    def lookups(self):
+        return [lookup for _, lookup, _ in self.columns]
+
+
+TABLES = {
+    'favorites': AnalyticsTable(Favorite, (
+        ('id', 'id', INT64),
+        ('user_id', 'user_id', INT64),
+        ('recipe_id', 'recipe_id', INT64),
+        ('created_at', 'created_at', TIMESTAMP),
+    ), 'created_at'),
+    'shopping_cart': AnalyticsTable(ShoppingCart, (
+        ('id', 'id', INT64),
+        ('user_id', 'user_id', INT64),
+        ('recipe_id', 'recipe_id', INT64),
+        ('created_at', 'created_at', TIMESTAMP),
+    ), 'created_at'),
+    'subscriptions': AnalyticsTable(Subscription, (
+        ('id', 'id', INT64),
+        ('user_id', 'user_id', INT64),
+        ('author_id', 'subscribed_to_id', INT64),
+        ('created_at', 'created_at', TIMESTAMP),
+    ), 'created_at'),
+    'recipe_ingredients': AnalyticsTable(RecipeIngredient, (
+        ('id', 'id', INT64),
+        ('recipe_id', 'recipe_id', INT64),
+        ('ingredient_id', 'ingredient_id', INT64),
+        ('ingredient_name', 'ingredient__name', STRING),
+        ('measurement_unit', 'ingredient__measurement_unit', STRING),
+        ('amount', 'amount', INT32),
+        ('recipe_pub_date', 'recipe__pub_date', TIMESTAMP),
+        ('created_at', 'created_at', TIMESTAMP),
+    ), 'created_at'),
+}
+
+
+class CsvWriter:
+    """Запись пачек строк в CSV, сжатый gzip."""
+
+    extension = '.csv.gz'
+
+    def __init__(self, path, table):
+        self.file = gzip.open(path, 'wt', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(table.names)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """Запись пачек строк в файл Parquet: каждая пачка — группа строк."""
+
+    extension = '.parquet'
+
+    def __init__(self, path, table):
+        arrow_types = {
+            INT32: pyarrow.int32(),
+            INT64: pyarrow.int64(),
+            STRING: pyarrow.string(),
+            TIMESTAMP: pyarrow.timestamp('us', tz='UTC'),
+        }
+        self.schema = pyarrow.schema([
+            (name, arrow_types[kind]) for name, _, kind in table.columns])
+        self.writer = pyarrow.parquet.ParquetWriter(
+            path, self.schema, compression=ANALYTICS_PARQUET_COMPRESSION)
+
+    def write(self, rows):
+        columns = zip(*rows)
+        self.writer.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(column, type=field.type)
+             for column, field in zip(columns, self.schema)],
+            schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def load_watermarks(directory):
+    path = os.path.join(directory, ANALYTICS_WATERMARK_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def save_watermarks(directory, watermarks):
+    """Сохраняет отметки атомарно, чтобы сбой не оставил файл пустым."""
+    path = os.path.join(directory, ANALYTICS_WATERMARK_FILE)
+    with open(path + '.part', 'w', encoding='utf-8') as file:
+        json.dump(watermarks, file, ensure_ascii=False, indent=2)
+    os.replace(path + '.part', path)
+
+
+def get_settled_id(queryset, time_field, until):
+    """
+    Наибольший id строки, добавленной не позже until (или до появления
+    поля времени). Строки с меньшими id уже зафиксированы, кроме строк
+    транзакций, которые длятся дольше ANALYTICS_WATERMARK_LAG. Индекс
+    первичного ключа просматривается с конца, поэтому читаются только
+    недавние строки.
+    """
+    return (
+        queryset.filter(
+            Q(**{f'{time_field}__lte': until})
+            | Q(**{f'{time_field}__isnull': True}))
+        .order_by('-pk')
+        .values_list('pk', flat=True)
+        .first())
+
+
+def export_table(name, directory, file_format, watermarks=None,
+                 incremental=None, batch_size=ANALYTICS_BATCH_SIZE,
+                 using='default'):
+    """
+    Выгружает таблицу name в новый файл каталога directory.
+
+    incremental — вид отметки (ANALYTICS_WATERMARK_ID или
+    ANALYTICS_WATERMARK_TIME), начиная с которой выгружаются строки;
+    None означает полную выгрузку. watermarks — отметки таблицы, они
+    обновляются по результатам выгрузки. Возвращает путь к файлу (None,
+    если новых строк нет) и количество строк.
+    """
+    table = TABLES[name]
+    watermarks = {} if watermarks is None else watermarks
+    queryset = table.model._default_manager.using(using).order_by('pk')
+    # Строки за последние секунды могут ещё появиться от транзакций,
+    # начатых раньше, поэтому они войдут в следующую выгрузку.
+    until = timezone.now() - timedelta(seconds=ANALYTICS_WATERMARK_LAG)
+    settled_id = get_settled_id(queryset, table.time_field, until)
+    if incremental == ANALYTICS_WATERMARK_ID:
+        if settled_id is None:
+            queryset = queryset.none()
+        else:
+            queryset = queryset.filter(pk__lte=settled_id)
+        if ANALYTICS_WATERMARK_ID in watermarks:
+            queryset = queryset.filter(
+                pk__gt=watermarks[ANALYTICS_WATERMARK_ID])
+    elif incremental == ANALYTICS_WATERMARK_TIME:
+        queryset = queryset.filter(**{f'{table.time_field}__lte': until})
+        if ANALYTICS_WATERMARK_TIME in watermarks:
+            queryset = queryset.filter(**{
+                f'{table.time_field}__gt':
+                parse_datetime(watermarks[ANALYTICS_WATERMARK_TIME])})
+    rows = queryset.values_list(*table.lookups).iterator(
+        chunk_size=batch_size)
+
+    writer_class = (
+        ParquetWriter if file_format == ANALYTICS_FORMAT_PARQUET
+        else CsvWriter)
+    path = os.path.join(
+        directory,
+        f'{name}-{timezone.now():%Y%m%dT%H%M%S_%f}{writer_class.extension}')
+    exported = 0
+    last_id = None
+    writer = writer_class(path + '.part', table)
+    try:
+        for batch in chunked(rows, batch_size):
+            writer.write(batch)
+            exported += len(batch)
+            last_id = batch[-1][0]
+    except BaseException:
+        writer.close()
+        os.remove(path + '.part')
+        raise
+    writer.close()
+
+    if last_id is not None and settled_id is not None:
+        last_id = min(last_id, settled_id)
+        watermarks[ANALYTICS_WATERMARK_ID] = max(
+            last_id, watermarks.get(ANALYTICS_WATERMARK_ID, last_id))
+    if incremental == ANALYTICS_WATERMARK_TIME:
+        watermarks[ANALYTICS_WATERMARK_TIME] = until.isoformat()
+    if not exported:
+        os.remove(path + '.part')
+        return None, 0
+    os.replace(path + '.part', path)
+    return path, exported
@@ -0,0 +1,208 @@
+"""
+Проекция «карточка рецепта»: общая для всех пользователей часть
+представления рецепта в списках (поля рецепта, автор, теги и ингредиенты
+с единицами измерения), заранее собранная из пяти таблиц и сохранённая
+в RecipeCard.
+
+Карточка пересобирается сразу при создании и изменении рецепта через
+API и админку, а для рецептов без карточки (например, после импорта)
+собирается при первом чтении. При изменении тега, ингредиента или
+профиля автора карточки затронутых рецептов удаляются в той же
+транзакции и пересобираются после её фиксации: чтение, начавшееся до
+фиксации, могло собрать карточку из старых строк и сохранить её уже
+после удаления, и пересборка её заменяет. Расхождения, возникшие из-за
+изменений в обход приложения, находит и исправляет команда
+check_recipe_cards.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from common.constants import RECIPE_CARD_BATCH_SIZE
+from .models import Ingredient, Recipe, RecipeCard, RecipeIngredient, Tag
+
+User = get_user_model()
+
+CARD_AUTHOR_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name', 'avatar')
+
+
+def build_recipe_cards(recipe_ids):
+    """
+    Возвращает словарь карточек рецептов по их id, собранных из базы.
+    Изображения хранятся именами файлов: абсолютные URL зависят от
+    запроса и добавляются в api.representations.serialize_recipes.
+    Ингредиенты и теги упорядочены так же, как в RecipeReadSerializer:
+    по Meta.ordering моделей RecipeIngredient и Tag.
+    """
+    recipes = {
+        row['id']: row
+        for row in Recipe.objects.filter(pk__in=recipe_ids).values(
+            'id', 'name', 'image', 'text', 'cooking_time', 'author_id')}
+
+    ingredients = {recipe_id: [] for recipe_id in recipes}
+    for row in (
+            RecipeIngredient.objects
+            .filter(recipe_id__in=recipes)
+            .order_by('pk')
+            .values('recipe_id', 'ingredient_id', 'ingredient__name',
+                    'ingredient__measurement_unit', 'amount')):
+        ingredients[row['recipe_id']].append({
+            'id': row['ingredient_id'],
+            'name': row['ingredient__name'],
+            'measurement_unit': row['ingredient__measurement_unit'],
+            'amount': row['amount'],
+        })
+
+    tags = {recipe_id: [] for recipe_id in recipes}
+    for row in (
+            Recipe.tags.through.objects
+            .filter(recipe_id__in=recipes)
+            .order_by('tag_id')
+            .values('recipe_id', 'tag_id', 'tag__name', 'tag__slug')):
+        tags[row['recipe_id']].append({
+            'id': row['tag_id'],
+            'name': row['tag__name'],
+            'slug': row['tag__slug'],
+        })
+
+    authors = {
+        row['id']: row
+        for row in User.objects.filter(
+            pk__in={recipe['author_id'] for recipe in recipes.values()}
+        ).values(*CARD_AUTHOR_FIELDS)}
+
+    return {
+        recipe_id: {
+            'id': recipe_id,
+            'name': recipe['name'],
+            'image': recipe['image'],
+            'text': recipe['text'],
+            'cooking_time': recipe['cooking_time'],
+            'ingredients': ingredients[recipe_id],
+            'tags': tags[recipe_id],
+            'author': authors[recipe['author_id']],
+        }
+        for recipe_id, recipe in recipes.items()}
+
+
+def refresh_recipe_cards(recipe_ids):
+    """
+    Пересобирает и сохраняет карточки рецептов. Возвращает их словарь.
+
+    Строки рецептов блокируются на время сборки, поэтому одновременные
+    пересборки одной карточки выполняются по очереди, и последней
+    сохраняется карточка, собранная после всех зафиксированных изменений.
+    """
+    recipe_ids = sorted(recipe_ids)
+    cards = {}
+    for start in range(0, len(recipe_ids), RECIPE_CARD_BATCH_SIZE):
+        batch = recipe_ids[start:start + RECIPE_CARD_BATCH_SIZE]
+        with transaction.atomic():
+            list(Recipe.objects.filter(pk__in=batch).order_by('pk')
+                 .select_for_update().values_list('pk', flat=True))
+            batch_cards = build_recipe_cards(batch)
+            RecipeCard.objects.filter(recipe_id__in=batch).delete()
+            RecipeCard.objects.bulk_create(
+                (RecipeCard(recipe_id=recipe_id, data=card)
+                 for recipe_id, card in batch_cards.items()),
+                ignore_conflicts=True)
+        cards.update(batch_cards)
+    return cards
+
+
+def get_recipe_cards(recipe_ids):
+    """
+    Возвращает словарь карточек рецептов одним запросом к проекции.
+    Отсутствующие карточки собираются и сохраняются.
+    """
+    cards = dict(
+        RecipeCard.objects
+        .filter(recipe_id__in=recipe_ids)
+        .values_list('recipe_id', 'data'))
+    missing = [
+        recipe_id for recipe_id in recipe_ids if recipe_id not in cards]
+    if missing:
+        built = build_recipe_cards(missing)
+        RecipeCard.objects.bulk_create(
+            (RecipeCard(recipe_id=recipe_id, data=card)
+             for recipe_id, card in built.items()),
+            ignore_conflicts=True)
+        cards.update(built)
+    return cards
+
+
+def invalidate_recipe_cards(recipe_ids):
+    """
+    Удаляет карточки рецептов и пересобирает их после фиксации текущей
+    транзакции. Если пересборка не выполнится, карточки будут собраны
+    при следующем чтении.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    RecipeCard.objects.filter(recipe_id__in=recipe_ids).delete()
+    transaction.on_commit(lambda: refresh_recipe_cards(recipe_ids))
+
+
+@receiver(post_save, sender=Tag)
+def invalidate_tag_cards(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_recipe_cards(
+            Recipe.tags.through.objects
+            .filter(tag_id=instance.pk)
+            .values_list('recipe_id', flat=True))
+
+
+@receiver(post_save, sender=Ingredient)
+def invalidate_ingredient_cards(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_recipe_cards(
+            RecipeIngredient.objects
+            .filter(ingredient_id=instance.pk)
+            .values_list('recipe_id', flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def collect_deleted_catalog_recipes(sender, instance, **kwargs):
+    """
+    Запоминает рецепты с удаляемым тегом или ингредиентом: после
+    удаления их связи уже не найти.
+    """
+    if sender is Tag:
+        queryset = Recipe.tags.through.objects.filter(tag_id=instance.pk)
+    else:
+        queryset = RecipeIngredient.objects.filter(ingredient_id=instance.pk)
+    instance._card_recipe_ids = list(
+        queryset.values_list('recipe_id', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_deleted_catalog_cards(sender, instance, **kwargs):
+    invalidate_recipe_cards(getattr(instance, '_card_recipe_ids', []))
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_cards(sender, instance, created, update_fields,
+                            **kwargs):
+    """
+    Пересобирает карточки рецептов автора, если изменились попадающие в
+    них поля профиля. Для сохранений, которые этих полей не меняют (вход,
+    смена пароля), карточки не трогаются.
+    """
+    if created or (update_fields is not None
+                   and not set(update_fields) & set(CARD_AUTHOR_FIELDS)):
+        return
+    card = RecipeCard.objects.filter(
+        recipe__author_id=instance.pk).values_list('data', flat=True).first()
+    if card is None:
+        return
+    author = User.objects.filter(
+        pk=instance.pk).values(*CARD_AUTHOR_FIELDS).first()
+    if card['author'] != author:
+        invalidate_recipe_cards(
+            Recipe.objects.filter(author_id=instance.pk)
+            .values_list('pk', flat=True))
@@ -0,0 +1,124 @@
+"""
+Версионированный справочник тегов и ингредиентов для дельта-синхронизации.
+
+Каждое создание, изменение и удаление тега или ингредиента добавляет
+запись в журнал CatalogChange (через сигналы моделей, поэтому это
+работает и для админки, и для команд импорта). Клиент один раз получает
+полный снимок с номером версии, а затем запрашивает только изменения
+после своей версии: актуальные строки и идентификаторы удалённых.
+
+Массовые операции QuerySet.update() и bulk_create() сигналов не
+отправляют, поэтому после них нужно вызвать record_changes().
+
+Запись журнала с меньшим id может быть зафиксирована позже записи с
+большим, поэтому в PostgreSQL версия строится по номерам транзакций:
+версия V означает, что клиент получил изменения всех транзакций с
+номером меньше V, и учитываются только уже завершённые транзакции
+(ниже горизонта get_transaction_horizon). В других базах данных
+пишущие транзакции выполняются по одной, и версия — номер последней
+записи журнала.
+"""
+from django.db import connection
+from django.db.models import Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from common.constants import CATALOG_INGREDIENTS, CATALOG_TAGS
+from common.db import current_transaction_id, get_transaction_horizon
+from .models import CatalogChange, Ingredient, Tag
+
+CATALOG_MODELS = {
+    CATALOG_TAGS: (Tag, ('id', 'name', 'slug')),
+    CATALOG_INGREDIENTS: (Ingredient, ('id', 'name', 'measurement_unit')),
+}
+CATALOG_KINDS = {model: kind for kind, (model, _) in CATALOG_MODELS.items()}
+
+
+def record_changes(kind, object_ids, deleted=False):
+    """Записывает в журнал изменение строк справочника kind."""
+    xid = current_transaction_id(CatalogChange)
+    CatalogChange.objects.bulk_create(
+        CatalogChange(kind=kind, object_id=object_id, deleted=deleted, xid=xid)
+        for object_id in object_ids)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def record_save(sender, instance, **kwargs):
+    record_changes(CATALOG_KINDS[sender], [instance.pk])
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def record_delete(sender, instance, **kwargs):
+    record_changes(CATALOG_KINDS[sender], [instance.pk], deleted=True)
+
+
+def get_catalog_version():
+    """
+    Текущая версия справочника. В PostgreSQL — номер, следующий за
+    последней завершённой транзакцией, изменявшей справочник: она не
+    меняется, пока справочник не изменится, и не опережает незавершённые
+    транзакции, изменения которых клиент получит позже.
+    """
+    horizon = get_transaction_horizon(connection)
+    if horizon is None:
+        return CatalogChange.objects.aggregate(
+            version=Max('id'))['version'] or 0
+    latest = CatalogChange.objects.filter(xid__lt=horizon).aggregate(
+        xid=Max('xid'))['xid']
+    return 0 if latest is None else latest + 1
+
+
+def _changes_after(since):
+    """Записи журнала, не вошедшие в версию since."""
+    if connection.vendor == 'postgresql':
+        return CatalogChange.objects.filter(xid__gte=since)
+    return CatalogChange.objects.filter(id__gt=since)
+
+
+def _get_rows(kind, object_ids=None):
+    model, fields = CATALOG_MODELS[kind]
+    queryset = model.objects.order_by('id')
+    if object_ids is not None:
+        queryset = queryset.filter(id__in=object_ids)
+    return [list(row) for row in queryset.values_list(*fields)]
+
+
+def get_snapshot(version):
+    """
+    Полный снимок справочника. Версию нужно получить до чтения строк,
+    тогда снимок содержит как минимум все изменения до неё.
+    """
+    snapshot = {'version': version}
+    for kind in CATALOG_MODELS:
+        snapshot[kind] = _get_rows(kind)
+    return snapshot
+
+
+def get_changes(since, version):
+    """
+    Изменения справочника после версии since: текущие значения
+    добавленных и изменённых строк и идентификаторы удалённых.
+    Изменения новее version тоже возвращаются и придут повторно при
+    следующей синхронизации, что безопасно.
+    """
+    latest = {kind: {} for kind in CATALOG_MODELS}
+    for kind, object_id, deleted in (
+            _changes_after(since)
+            .order_by('xid', 'id')
+            .values_list('kind', 'object_id', 'deleted')):
+        latest[kind][object_id] = deleted
+
+    changes = {'version': version}
+    deleted = {}
+    for kind, states in latest.items():
+        rows = _get_rows(kind, [
+            object_id for object_id, deleted in states.items()
+            if not deleted])
+        present = {row[0] for row in rows}
+        changes[kind] = rows
+        deleted[kind] = sorted(
+            object_id for object_id in states if object_id not in present)
+    changes['deleted'] = deleted
+    return changes
@@ -0,0 +1,20 @@
+from common.constants import EVENT_RECIPE_CREATED
+from events.outbox import consumer
+from .feed import fan_out_recipe
+from .models import Recipe
+
+
+@consumer('feed_fan_out', topics=[EVENT_RECIPE_CREATED])
+def fan_out_new_recipes(events):
+    """
+    Рассылает новые рецепты в ленты подписчиков. До рассылки рецепт
+    попадает в ленты при чтении, как рецепт с fanned_out=False.
+    """
+    recipes = (
+        Recipe.objects
+        .filter(
+            pk__in=[event.payload['recipe_id'] for event in events],
+            fanned_out=False)
+        .only('pk', 'author_id', 'pub_date'))
+    for recipe in recipes:
+        fan_out_recipe(recipe)
@@ -0,0 +1,106 @@
+"""
+Лента рецептов от авторов, на которых подписан пользователь.
+
+Новые рецепты рассылаются в ленты подписчиков после публикации (fan-out on
+write) обработчиком события о новом рецепте. Пока рецепт не разослан, а
+также если у автора очень много подписчиков, рецепт остаётся с
+fanned_out=False и подтягивается при чтении ленты по частичному индексу.
+Обе части ленты читаются keyset-запросами по паре (дата публикации,
+id рецепта) и сливаются в памяти.
+"""
+import heapq
+from operator import itemgetter
+
+from django.db.models import Q
+
+from common.constants import (FEED_BACKFILL_LIMIT, FEED_FANOUT_BATCH_SIZE,
+                              FEED_FANOUT_MAX_SUBSCRIBERS)
+from users.models import Subscription
+from .models import FeedEntry, Recipe
+
+
+def fan_out_recipe(recipe):
+    """
+    Добавляет рецепт в ленты подписчиков автора. Возвращает False, если
+    подписчиков больше порога и рецепт будет подтягиваться при чтении.
+    """
+    subscriber_ids = list(
+        Subscription.objects
+        .filter(subscribed_to_id=recipe.author_id)
+        .values_list('user_id', flat=True)[:FEED_FANOUT_MAX_SUBSCRIBERS + 1])
+    if len(subscriber_ids) > FEED_FANOUT_MAX_SUBSCRIBERS:
+        return False
+
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, recipe_id=recipe.pk,
+                   author_id=recipe.author_id, pub_date=recipe.pub_date)
+         for user_id in subscriber_ids),
+        batch_size=FEED_FANOUT_BATCH_SIZE,
+        ignore_conflicts=True)
+    Recipe.objects.filter(pk=recipe.pk).update(fanned_out=True)
+    recipe.fanned_out = True
+    return True
+
+
+def backfill_subscription(user, author):
+    """Добавляет в ленту нового подписчика последние рецепты автора."""
+    recipes = (
+        Recipe.objects
+        .filter(author=author, fanned_out=True)
+        .order_by('-pub_date', '-id')
+        .values_list('pk', 'pub_date')[:FEED_BACKFILL_LIMIT])
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user=user, recipe_id=recipe_id, author=author,
+                   pub_date=pub_date)
+         for recipe_id, pub_date in recipes),
+        ignore_conflicts=True)
+
+
+def remove_subscription(user, author):
+    """Удаляет из ленты пользователя рецепты автора после отписки."""
+    FeedEntry.objects.filter(user=user, author=author).delete()
+
+
+def get_feed_positions(user, after, limit):
+    """
+    Возвращает до limit позиций ленты пользователя в виде пар
+    (дата публикации, id рецепта), отсортированных по убыванию и
+    расположенных строго после позиции after, если она задана.
+    """
+    timeline = (
+        FeedEntry.objects
+        .filter(user=user)
+        .order_by('-pub_date', '-recipe_id')
+        .values_list('pub_date', 'recipe_id'))
+    pulled = (
+        Recipe.objects
+        .filter(
+            fanned_out=False,
+            author__in=Subscription.objects
+            .filter(user=user)
+            .values('subscribed_to'))
+        .order_by('-pub_date', '-id')
+        .values_list('pub_date', 'id'))
+
+    if after is not None:
+        pub_date, recipe_id = after
+        timeline = timeline.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, recipe_id__lt=recipe_id))
+        pulled = pulled.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=recipe_id))
+
+    merged = heapq.merge(
+        timeline[:limit], pulled[:limit],
+        key=itemgetter(0, 1), reverse=True)
+
+    positions = []
+    seen = set()
+    for position in merged:
+        if position[1] in seen:
+            continue
+        seen.add(position[1])
+        positions.append(position)
+        if len(positions) == limit:
+            break
+    return positions
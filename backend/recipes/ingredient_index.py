@@ -0,0 +1,242 @@
+"""
+Инвертированный индекс «ингредиент → рецепты» в памяти процесса.
+
+Для каждого ингредиента хранится отсортированный массив id рецептов,
+а для каждого рецепта — количество его ингредиентов. Поиск по набору
+имеющихся у пользователя ингредиентов сводится к объединению нескольких
+массивов и подсчёту совпадений без GROUP BY в базе.
+
+Изменения рецептов применяются к индексу сразу в своём процессе, а
+другим процессам передаются через шину events.invalidation: там
+изменённые рецепты перечитываются из базы при следующем поиске.
+
+Рабочий процесс gunicorn строит индекс при запуске, до приёма запросов,
+и затем перестраивает его в фоновом потоке (см. start), поэтому запросы
+не ждут полного построения. Без фонового потока (runserver, тесты)
+индекс строится при первом поиске.
+"""
+from collections import defaultdict
+import logging
+import threading
+import time
+
+from django.db import connection
+import numpy as np
+
+from common.constants import (INGREDIENT_INDEX_CHUNK_SIZE,
+                              INGREDIENT_INDEX_TTL,
+                              INVALIDATE_INGREDIENT_INDEX)
+from events.invalidation import publish, register
+from .models import RecipeIngredient
+
+EMPTY = np.empty(0, dtype=np.int64)
+
+logger = logging.getLogger(__name__)
+
+
+class IngredientIndex:
+    """Инвертированный индекс ингредиентов с подсчётом покрытия рецептов."""
+
+    def __init__(self, ttl=INGREDIENT_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._postings = None
+        self._recipe_ids = EMPTY
+        self._sizes = EMPTY
+        self._built_at = 0
+        self._dirty = set()
+        # Рецепты, изменённые во время чтения индекса из базы.
+        self._changed = None
+        self._refresh = None
+
+    def start(self):
+        """
+        Строит индекс и запускает поток, который перестраивает его раз в
+        ttl секунд и после сброса. Вызывается при запуске рабочего
+        процесса (gunicorn.conf.py).
+        """
+        self.build()
+        self._refresh = threading.Event()
+        threading.Thread(
+            target=self._run, name='ingredient-index', daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._refresh.wait(self.ttl)
+            self._refresh.clear()
+            try:
+                self.build()
+            except Exception:
+                logger.exception('Не удалось перестроить индекс ингредиентов.')
+            finally:
+                connection.close()
+
+    def invalidate(self):
+        """
+        Сбрасывает индекс. При работающем фоновом потоке до окончания
+        перестроения поиск продолжает использовать прежний индекс.
+        """
+        with self._lock:
+            if self._refresh is not None:
+                self._refresh.set()
+            else:
+                self._postings = None
+
+    def search(self, ingredient_ids, max_missing=None, recipe_ids=None):
+        """
+        Возвращает рецепты, содержащие хотя бы один из ингредиентов,
+        в виде кортежей (id рецепта, покрытие, число недостающих).
+        Если передан набор recipe_ids, остаются только рецепты из него.
+
+        Покрытие — доля ингредиентов рецепта, которые уже есть у
+        пользователя. Результат отсортирован по убыванию покрытия,
+        затем по возрастанию числа недостающих ингредиентов.
+        """
+        allowed = None
+        if recipe_ids is not None:
+            allowed = np.fromiter(recipe_ids, dtype=np.int64)
+        with self._lock:
+            self._ensure_built()
+            arrays = [
+                self._postings[ingredient_id]
+                for ingredient_id in set(ingredient_ids)
+                if ingredient_id in self._postings]
+            if not arrays:
+                return []
+            recipe_ids, matched = np.unique(
+                np.concatenate(arrays), return_counts=True)
+            if allowed is not None:
+                keep = np.isin(recipe_ids, allowed, assume_unique=True)
+                recipe_ids = recipe_ids[keep]
+                matched = matched[keep]
+            sizes = self._sizes[
+                np.searchsorted(self._recipe_ids, recipe_ids)]
+
+        missing = sizes - matched
+        coverage = matched / sizes
+        if max_missing is not None:
+            keep = missing <= max_missing
+            recipe_ids = recipe_ids[keep]
+            missing = missing[keep]
+            coverage = coverage[keep]
+
+        order = np.lexsort((-recipe_ids, missing, -coverage))
+        return [
+            (int(recipe_ids[index]), float(coverage[index]),
+             int(missing[index]))
+            for index in order]
+
+    def update_recipe(self, recipe_id, ingredient_ids):
+        """Заменяет набор ингредиентов рецепта в индексе."""
+        with self._lock:
+            if self._postings is not None:
+                self._update(recipe_id, ingredient_ids)
+            if self._changed is not None:
+                self._changed.add(recipe_id)
+        publish(INVALIDATE_INGREDIENT_INDEX, [recipe_id])
+
+    def remove_recipe(self, recipe_id):
+        """Удаляет рецепт из индекса."""
+        with self._lock:
+            if self._postings is not None:
+                self._remove(recipe_id)
+            if self._changed is not None:
+                self._changed.add(recipe_id)
+        publish(INVALIDATE_INGREDIENT_INDEX, [recipe_id])
+
+    def mark_dirty(self, recipe_ids):
+        """
+        Отмечает рецепты, изменённые другим процессом; они будут
+        перечитаны при следующем поиске. None сбрасывает весь индекс.
+        """
+        if recipe_ids is None:
+            self.invalidate()
+            return
+        with self._lock:
+            if self._postings is not None:
+                self._dirty.update(recipe_ids)
+            if self._changed is not None:
+                self._changed.update(recipe_ids)
+
+    def _update(self, recipe_id, ingredient_ids):
+        self._remove(recipe_id)
+        for ingredient_id in set(ingredient_ids):
+            posting = self._postings.get(ingredient_id, EMPTY)
+            self._postings[ingredient_id] = np.insert(
+                posting, np.searchsorted(posting, recipe_id), recipe_id)
+        position = np.searchsorted(self._recipe_ids, recipe_id)
+        self._recipe_ids = np.insert(
+            self._recipe_ids, position, recipe_id)
+        self._sizes = np.insert(
+            self._sizes, position, len(set(ingredient_ids)))
+
+    def _remove(self, recipe_id):
+        for ingredient_id, posting in self._postings.items():
+            position = np.searchsorted(posting, recipe_id)
+            if position < len(posting) and posting[position] == recipe_id:
+                self._postings[ingredient_id] = np.delete(posting, position)
+
+        position = np.searchsorted(self._recipe_ids, recipe_id)
+        if (position < len(self._recipe_ids)
+                and self._recipe_ids[position] == recipe_id):
+            self._recipe_ids = np.delete(self._recipe_ids, position)
+            self._sizes = np.delete(self._sizes, position)
+
+    def _reload_dirty(self):
+        dirty, self._dirty = self._dirty, set()
+        ingredients = defaultdict(list)
+        for recipe_id, ingredient_id in (
+                RecipeIngredient.objects
+                .filter(recipe_id__in=dirty)
+                .values_list('recipe_id', 'ingredient_id')):
+            ingredients[recipe_id].append(ingredient_id)
+        for recipe_id in dirty:
+            if recipe_id in ingredients:
+                self._update(recipe_id, ingredients[recipe_id])
+            else:
+                self._remove(recipe_id)
+
+    def _ensure_built(self):
+        expired = time.monotonic() - self._built_at >= self.ttl
+        if self._postings is None or (self._refresh is None and expired):
+            self.build()
+        if self._dirty:
+            self._reload_dirty()
+
+    def build(self):
+        """
+        Читает индекс из базы и подменяет им текущий. Блокировка на время
+        чтения не берётся: рецепты, изменённые за это время, перечитываются
+        при следующем поиске.
+        """
+        with self._lock:
+            self._changed = set()
+        postings, recipe_ids, sizes = self._read()
+
+        with self._lock:
+            self._postings = postings
+            self._recipe_ids, self._sizes = recipe_ids, sizes
+            self._dirty, self._changed = self._changed, None
+            self._built_at = time.monotonic()
+
+    @staticmethod
+    def _read():
+        postings = {}
+        for ingredient_id, recipe_id in (
+                RecipeIngredient.objects
+                .order_by('ingredient_id', 'recipe_id')
+                .values_list('ingredient_id', 'recipe_id')
+                .iterator(chunk_size=INGREDIENT_INDEX_CHUNK_SIZE)):
+            postings.setdefault(ingredient_id, []).append(recipe_id)
+
+        postings = {
+            ingredient_id: np.array(recipe_ids, dtype=np.int64)
+            for ingredient_id, recipe_ids in postings.items()}
+        all_ids = (
+            np.concatenate(list(postings.values())) if postings else EMPTY)
+        recipe_ids, sizes = np.unique(all_ids, return_counts=True)
+        return postings, recipe_ids, sizes
+
+
+ingredient_index = IngredientIndex()
+register(INVALIDATE_INGREDIENT_INDEX, ingredient_index.mark_dirty)
@@ -0,0 +1,181 @@
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import Q
+import numpy as np
+
+from common.constants import (SIMILAR_RECIPES_LIMIT, SIMILARITY_BATCH_SIZE,
+                              SIMILARITY_MAX_BUCKET_SIZE, SIMILARITY_MIN_SCORE,
+                              SIMILARITY_POOL_PREFETCH)
+from recipes.models import (Recipe, RecipeBucket, RecipeIngredient,
+                            RecipeSignature, SimilarRecipe)
+from recipes.ndjson import chunked
+from recipes.similarity import (compute_buckets, compute_signatures,
+                                estimate_similarity, from_bytes, to_bytes)
+
+
+def _compute_chunk(pairs):
+    """Вычисляет сигнатуры и корзины для пачки пар (рецепт, ингредиент)."""
+    recipe_ids, ingredient_ids = pairs
+    recipe_ids, signatures = compute_signatures(recipe_ids, ingredient_ids)
+    return recipe_ids, signatures, compute_buckets(signatures)
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит MinHash-сигнатуры рецептов и списки похожих рецептов. '
+        'По умолчанию обрабатываются только новые и изменённые рецепты.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Перестроить индекс для всех рецептов.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=SIMILARITY_BATCH_SIZE,
+            help='Количество рецептов, обрабатываемых за один раз.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Количество процессов для вычисления сигнатур.',
+        )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs['batch_size']
+
+        if kwargs['full']:
+            SimilarRecipe.objects.all().delete()
+            RecipeBucket.objects.all().delete()
+            RecipeSignature.objects.all().delete()
+
+        stale_ids = list(
+            Recipe.objects
+            .filter(signature__isnull=True)
+            .order_by('pk')
+            .values_list('pk', flat=True))
+        batches = list(chunked(stale_ids, batch_size))
+
+        workers = kwargs['workers']
+        if workers > 1:
+            connections.close_all()
+            # Pool.imap сразу вычитывает весь входной итератор, поэтому
+            # пачки передаются в пул группами ограниченного размера.
+            with Pool(workers) as pool:
+                for group in chunked(
+                        batches, workers * SIMILARITY_POOL_PREFETCH):
+                    results = pool.imap(
+                        _compute_chunk,
+                        [self._load_pairs(batch) for batch in group])
+                    for batch, result in zip(group, results):
+                        self._save_signatures(batch, *result)
+        else:
+            for batch in batches:
+                self._save_signatures(
+                    batch, *_compute_chunk(self._load_pairs(batch)))
+
+        for batch in batches:
+            self._save_neighbours(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано рецептов: {len(stale_ids)}.'))
+
+    def _load_pairs(self, recipe_ids):
+        pairs = np.array(
+            RecipeIngredient.objects
+            .filter(recipe_id__in=recipe_ids)
+            .order_by('recipe_id')
+            .values_list('recipe_id', 'ingredient_id'),
+            dtype=np.int64).reshape(-1, 2)
+        return pairs[:, 0], pairs[:, 1]
+
+    def _save_signatures(self, batch, recipe_ids, signatures, buckets):
+        """
+        Сохраняет сигнатуры и корзины пачки. Рецептам без ингредиентов
+        сохраняется пустая сигнатура, чтобы следующие запуски не
+        обрабатывали их снова.
+        """
+        recipe_ids = recipe_ids.tolist()
+        empty_ids = set(batch) - set(recipe_ids)
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(
+                Q(recipe_id__in=batch) | Q(similar_id__in=batch)
+            ).delete()
+            RecipeBucket.objects.filter(recipe_id__in=batch).delete()
+            RecipeSignature.objects.bulk_create(
+                [RecipeSignature(recipe_id=recipe_id,
+                                 signature=to_bytes(signature))
+                 for recipe_id, signature in zip(recipe_ids, signatures)]
+                + [RecipeSignature(recipe_id=recipe_id, signature=b'')
+                   for recipe_id in empty_ids],
+                ignore_conflicts=True)
+            RecipeBucket.objects.bulk_create(
+                RecipeBucket(recipe_id=recipe_id, bucket=bucket)
+                for recipe_id, recipe_buckets in zip(
+                    recipe_ids, buckets.tolist())
+                for bucket in recipe_buckets)
+
+    def _save_neighbours(self, recipe_ids):
+        """
+        Находит кандидатов через общие корзины LSH и сохраняет лучшие
+        по оценке сходства пары в обе стороны.
+        """
+        recipe_buckets = {}
+        for recipe_id, bucket in RecipeBucket.objects.filter(
+                recipe_id__in=recipe_ids).values_list('recipe_id', 'bucket'):
+            recipe_buckets.setdefault(recipe_id, []).append(bucket)
+
+        bucket_members = {}
+        for bucket, recipe_id in RecipeBucket.objects.filter(
+                bucket__in={
+                    bucket
+                    for buckets in recipe_buckets.values()
+                    for bucket in buckets}
+        ).values_list('bucket', 'recipe_id'):
+            members = bucket_members.setdefault(bucket, [])
+            if len(members) < SIMILARITY_MAX_BUCKET_SIZE:
+                members.append(recipe_id)
+
+        candidates = {
+            recipe_id: {
+                member
+                for bucket in buckets
+                for member in bucket_members.get(bucket, ())
+                if member != recipe_id}
+            for recipe_id, buckets in recipe_buckets.items()}
+
+        signatures = {
+            recipe_id: from_bytes(signature)
+            for recipe_id, signature in RecipeSignature.objects.filter(
+                recipe_id__in={
+                    member
+                    for members in candidates.values()
+                    for member in members} | set(recipe_buckets)
+            ).values_list('recipe_id', 'signature')}
+
+        similar = []
+        for recipe_id, members in candidates.items():
+            members = [member for member in members if member in signatures]
+            if not members:
+                continue
+            scores = estimate_similarity(
+                signatures[recipe_id],
+                np.stack([signatures[member] for member in members]))
+            top = np.argsort(-scores, kind='stable')[:SIMILAR_RECIPES_LIMIT]
+            for index in top:
+                score = float(scores[index])
+                if score < SIMILARITY_MIN_SCORE:
+                    break
+                similar.append(SimilarRecipe(
+                    recipe_id=recipe_id, similar_id=members[index],
+                    score=score))
+                similar.append(SimilarRecipe(
+                    recipe_id=members[index], similar_id=recipe_id,
+                    score=score))
+
+        SimilarRecipe.objects.bulk_create(similar, ignore_conflicts=True)
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from common.constants import RECIPE_CARD_BATCH_SIZE
+from recipes.cards import build_recipe_cards, refresh_recipe_cards
+from recipes.models import Recipe, RecipeCard
+from recipes.ndjson import chunked
+
+REPORTED_IDS_LIMIT = 20
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает сохранённые карточки рецептов с собранными заново '
+        'и сообщает о расхождениях. Рецепты без карточки расхождением не '
+        'считаются: их карточки собираются при первом чтении.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=RECIPE_CARD_BATCH_SIZE,
+            help='Количество рецептов, обрабатываемых за один раз.',
+        )
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Пересобрать устаревшие карточки.',
+        )
+
+    def handle(self, *args, **kwargs):
+        recipe_ids = (
+            RecipeCard.objects
+            .order_by('pk')
+            .values_list('pk', flat=True)
+            .iterator(chunk_size=kwargs['batch_size']))
+        checked = 0
+        stale_ids = []
+        for batch in chunked(recipe_ids, kwargs['batch_size']):
+            stored = dict(
+                RecipeCard.objects
+                .filter(recipe_id__in=batch)
+                .values_list('recipe_id', 'data'))
+            built = build_recipe_cards(batch)
+            stale_ids.extend(
+                recipe_id for recipe_id, card in stored.items()
+                if built.get(recipe_id) != card)
+            checked += len(stored)
+
+        missing = Recipe.objects.filter(card__isnull=True).count()
+        self.stdout.write(
+            f'Проверено карточек: {checked}, устаревших: {len(stale_ids)}, '
+            f'рецептов без карточки: {missing}.')
+        if not stale_ids:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+            return
+
+        if kwargs['fix']:
+            refresh_recipe_cards(stale_ids)
+            self.stdout.write(self.style.SUCCESS(
+                f'Пересобрано карточек: {len(stale_ids)}.'))
+            return
+
+        raise CommandError(
+            'Устаревшие карточки рецептов: '
+            + ', '.join(map(str, stale_ids[:REPORTED_IDS_LIMIT]))
+            + (' и другие' if len(stale_ids) > REPORTED_IDS_LIMIT else ''))
@@ -0,0 +1,170 @@
+from hashlib import blake2b
+from itertools import chain
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+import numpy as np
+
+from common.constants import MEDIA_GC_BATCH_SIZE, MEDIA_GC_GRACE_HOURS
+from common.storage import file_lock, get_file_fields
+from recipes.ndjson import chunked
+
+
+def name_hash(name):
+    """Сводит путь файла к 64-битному числу для компактного хранения."""
+    return int.from_bytes(
+        blake2b(name.encode(), digest_size=8).digest(), 'little')
+
+
+def walk_files(root, exclude):
+    """
+    Обходит дерево каталогов без рекурсии и возвращает пары
+    (путь относительно root, os.DirEntry) для всех файлов.
+    """
+    stack = ['']
+    while stack:
+        relative_dir = stack.pop()
+        with os.scandir(os.path.join(root, relative_dir)) as entries:
+            for entry in entries:
+                relative_path = (
+                    f'{relative_dir}/{entry.name}' if relative_dir
+                    else entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    if os.path.abspath(entry.path) != exclude:
+                        stack.append(relative_path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield relative_path, entry
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из MEDIA_ROOT файлы, на которые не ссылается ни одна '
+        'запись в базе данных и которые старше заданного срока.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours',
+            type=float,
+            default=MEDIA_GC_GRACE_HOURS,
+            help='Не трогать файлы, изменённые за последние N часов.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только вывести найденные файлы, ничего не удаляя.',
+        )
+        parser.add_argument(
+            '--quarantine',
+            help='Перемещать файлы в указанный каталог вместо удаления.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=MEDIA_GC_BATCH_SIZE,
+            help='Количество путей, проверяемых в базе за один запрос.',
+        )
+
+    def handle(self, *args, **kwargs):
+        self.dry_run = kwargs['dry_run']
+        self.quarantine = kwargs['quarantine']
+        quarantine_root = (
+            os.path.abspath(self.quarantine) if self.quarantine else None)
+        batch_size = kwargs['batch_size']
+        deadline = time.time() - kwargs['grace_hours'] * 3600
+
+        referenced = self._load_referenced(batch_size)
+
+        removed = removed_bytes = 0
+        files = walk_files(settings.MEDIA_ROOT, quarantine_root)
+        for batch in chunked(files, batch_size):
+            hashes = np.fromiter(
+                (name_hash(name) for name, _ in batch),
+                dtype=np.uint64, count=len(batch))
+            batch = [
+                (name, entry)
+                for (name, entry), is_referenced in zip(
+                    batch, self._contains(referenced, hashes))
+                if not is_referenced
+                and entry.stat(follow_symlinks=False).st_mtime < deadline]
+            if not batch:
+                continue
+
+            # Файл мог снова получить ссылку после чтения списка из базы:
+            # хранилище не перезаписывает файл с тем же содержимым.
+            still_referenced = self._find_referenced(
+                [name for name, _ in batch])
+            for name, entry in batch:
+                if name in still_referenced:
+                    continue
+                # Сохранение того же файла берёт блокировку и обновляет
+                # время изменения, а ссылку записывает в своей транзакции.
+                with file_lock(name):
+                    try:
+                        stat = os.stat(entry.path, follow_symlinks=False)
+                    except FileNotFoundError:
+                        continue
+                    if stat.st_mtime >= deadline:
+                        continue
+                    removed_bytes += stat.st_size
+                    removed += 1
+                    self._remove(name, entry.path)
+
+        if self.dry_run:
+            action = 'Найдено'
+        elif self.quarantine:
+            action = 'Перемещено в карантин'
+        else:
+            action = 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} неиспользуемых файлов: {removed} '
+            f'({removed_bytes} байт).'))
+
+    def _load_referenced(self, batch_size):
+        """
+        Читает пути всех файлов из базы и возвращает отсортированный
+        массив их 64-битных хешей: 8 байт на ссылку вместо строки.
+        Совпадение хешей приводит лишь к тому, что файл не будет удалён.
+        """
+        names = chain.from_iterable(
+            model._default_manager
+            .exclude(**{f'{field.name}__isnull': True})
+            .exclude(**{field.name: ''})
+            .values_list(field.name, flat=True)
+            .iterator(chunk_size=batch_size)
+            for model, field in get_file_fields())
+        referenced = np.fromiter(
+            (name_hash(name) for name in names), dtype=np.uint64)
+        referenced.sort()
+        return referenced
+
+    @staticmethod
+    def _contains(referenced, hashes):
+        """Проверяет наличие каждого хеша в отсортированном массиве."""
+        if not len(referenced):
+            return np.zeros(len(hashes), dtype=bool)
+        indexes = np.minimum(
+            np.searchsorted(referenced, hashes), len(referenced) - 1)
+        return referenced[indexes] == hashes
+
+    @staticmethod
+    def _find_referenced(names):
+        found = set()
+        for model, field in get_file_fields():
+            found.update(
+                model._default_manager
+                .filter(**{f'{field.name}__in': names})
+                .values_list(field.name, flat=True))
+        return found
+
+    def _remove(self, name, path):
+        if self.dry_run:
+            self.stdout.write(name)
+        elif self.quarantine:
+            target = os.path.join(self.quarantine, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(path, target)
+        else:
+            os.remove(path)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from recipes.trending import decay_scores
+
+
+class Command(BaseCommand):
+    help = (
+        'Применяет затухание к оценкам популярности рецептов. '
+        'Рекомендуется запускать по расписанию, например раз в час.')
+
+    def handle(self, *args, **kwargs):
+        decayed, removed = decay_scores()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено оценок: {decayed}, удалено: {removed}.'))
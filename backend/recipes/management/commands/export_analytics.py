@@ -0,0 +1,85 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from common.constants import (ANALYTICS_BATCH_SIZE, ANALYTICS_FORMAT_CSV,
+                              ANALYTICS_FORMAT_PARQUET, ANALYTICS_WATERMARK_ID,
+                              ANALYTICS_WATERMARK_TIME,
+                              ERROR_ANALYTICS_NO_PYARROW)
+from recipes import analytics
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает избранное, корзины, подписки и ингредиенты рецептов '
+        'в файлы Parquet или CSV для аналитики.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            type=str,
+            required=True,
+            help='Каталог для файлов выгрузки и отметок.',
+        )
+        parser.add_argument(
+            '--tables',
+            type=str,
+            nargs='+',
+            choices=list(analytics.TABLES),
+            default=list(analytics.TABLES),
+            help='Выгружаемые таблицы. По умолчанию — все.',
+        )
+        parser.add_argument(
+            '--format',
+            type=str,
+            choices=(ANALYTICS_FORMAT_PARQUET, ANALYTICS_FORMAT_CSV),
+            default=(
+                ANALYTICS_FORMAT_PARQUET if analytics.pyarrow
+                else ANALYTICS_FORMAT_CSV),
+            help='Формат файлов. По умолчанию parquet, если установлен '
+                 'pyarrow, иначе csv.',
+        )
+        parser.add_argument(
+            '--incremental',
+            type=str,
+            choices=(ANALYTICS_WATERMARK_ID, ANALYTICS_WATERMARK_TIME),
+            help='Выгрузить только строки после отметки предыдущей '
+                 'выгрузки: по id или по времени создания.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=ANALYTICS_BATCH_SIZE,
+            help='Количество строк, читаемых из базы за один раз.',
+        )
+        parser.add_argument(
+            '--database',
+            type=str,
+            default=DEFAULT_DB_ALIAS,
+            help='Псевдоним базы данных, например реплики для чтения.',
+        )
+
+    def handle(self, *args, **kwargs):
+        if (kwargs['format'] == ANALYTICS_FORMAT_PARQUET
+                and analytics.pyarrow is None):
+            raise CommandError(ERROR_ANALYTICS_NO_PYARROW)
+
+        directory = kwargs['output']
+        os.makedirs(directory, exist_ok=True)
+        watermarks = analytics.load_watermarks(directory)
+        for name in kwargs['tables']:
+            path, exported = analytics.export_table(
+                name, directory, kwargs['format'],
+                watermarks=watermarks.setdefault(name, {}),
+                incremental=kwargs['incremental'],
+                batch_size=kwargs['batch_size'],
+                using=kwargs['database'])
+            # Отметки сохраняются после каждой таблицы, чтобы сбой на
+            # следующей не привёл к повторной выгрузке уже записанных.
+            analytics.save_watermarks(directory, watermarks)
+            self.stdout.write(
+                f'{name}: выгружено строк {exported}'
+                + (f' в {path}.' if path else '.'))
+
+        self.stdout.write(self.style.SUCCESS('Выгрузка завершена.'))
@@ -0,0 +1,66 @@
+from functools import partial
+
+from django.core.management.base import BaseCommand
+
+from common.constants import RECIPES_EXPORT_CHUNK_SIZE
+from recipes.models import Recipe
+from recipes.ndjson import export_recipes
+
+
+class Command(BaseCommand):
+    help = 'Потоковый экспорт рецептов в файл формата NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            type=str,
+            default='-',
+            help='Путь к выходному файлу. По умолчанию — стандартный вывод.',
+        )
+        parser.add_argument(
+            '--author',
+            type=str,
+            nargs='+',
+            help='Имена пользователей, рецепты которых нужно выгрузить.',
+        )
+        parser.add_argument(
+            '--tags',
+            type=str,
+            nargs='+',
+            help='Слаги тегов, рецепты с которыми нужно выгрузить.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=RECIPES_EXPORT_CHUNK_SIZE,
+            help='Количество рецептов, читаемых из базы за один раз.',
+        )
+
+    def handle(self, *args, **kwargs):
+        queryset = Recipe.objects.all()
+        if kwargs['author']:
+            queryset = queryset.filter(author__username__in=kwargs['author'])
+        if kwargs['tags']:
+            queryset = queryset.filter(
+                pk__in=Recipe.tags.through.objects
+                .filter(tag__slug__in=kwargs['tags'])
+                .values('recipe_id'))
+
+        file_path = kwargs['file']
+        output = (
+            None if file_path == '-'
+            else open(file_path, 'w', encoding='utf-8'))
+        write = (
+            output.write if output
+            else partial(self.stdout.write, ending=''))
+        exported = 0
+        try:
+            for line in export_recipes(queryset, kwargs['chunk_size']):
+                write(line)
+                exported += 1
+        finally:
+            if output:
+                output.close()
+
+        self.stderr.write(self.style.SUCCESS(
+            f'Экспортировано рецептов: {exported}.'))
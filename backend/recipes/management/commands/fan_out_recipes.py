@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from common.constants import FEED_FANOUT_BATCH_SIZE
+from recipes.feed import fan_out_recipe
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Рассылает в ленты подписчиков рецепты, которые ещё не были '
+        'разосланы, например опубликованные до появления ленты')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=FEED_FANOUT_BATCH_SIZE,
+            help='Количество рецептов, читаемых из базы за один раз.',
+        )
+
+    def handle(self, *args, **kwargs):
+        fanned_out = skipped = 0
+        recipes = (
+            Recipe.objects
+            .filter(fanned_out=False)
+            .only('pk', 'author_id', 'pub_date')
+            .iterator(chunk_size=kwargs['batch_size']))
+
+        for recipe in recipes:
+            if fan_out_recipe(recipe):
+                fanned_out += 1
+            else:
+                skipped += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Разослано рецептов: {fanned_out}, '
+            f'оставлено для чтения по подписке: {skipped}.'))
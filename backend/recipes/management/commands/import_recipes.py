@@ -0,0 +1,47 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from common.constants import RECIPES_IMPORT_BATCH_SIZE
+from recipes.ndjson import import_recipes
+
+
+class Command(BaseCommand):
+    help = 'Пакетный импорт рецептов из файла формата NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            type=str,
+            default='-',
+            help='Путь к NDJSON-файлу. По умолчанию — стандартный ввод.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=RECIPES_IMPORT_BATCH_SIZE,
+            help='Количество рецептов, сохраняемых в одной транзакции.',
+        )
+
+    def handle(self, *args, **kwargs):
+        file_path = kwargs['file']
+        try:
+            source = (
+                sys.stdin if file_path == '-'
+                else open(file_path, 'r', encoding='utf-8'))
+        except FileNotFoundError:
+            self.stdout.write(self.style.ERROR(f'Файл не найден: {file_path}'))
+            return
+
+        try:
+            imported, errors = import_recipes(source, kwargs['batch_size'])
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        for line_number, message in errors:
+            self.stdout.write(self.style.WARNING(
+                f'Строка {line_number}: {message}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано рецептов: {imported}, '
+            f'пропущено: {len(errors)}.'))
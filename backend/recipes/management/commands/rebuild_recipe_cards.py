@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from common.constants import RECIPE_CARD_BATCH_SIZE
+from recipes.cards import refresh_recipe_cards
+from recipes.models import Recipe
+from recipes.ndjson import chunked
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает карточки всех рецептов в проекции RecipeCard.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=RECIPE_CARD_BATCH_SIZE,
+            help='Количество рецептов, обрабатываемых за один раз.',
+        )
+
+    def handle(self, *args, **kwargs):
+        recipe_ids = (
+            Recipe.objects
+            .order_by('pk')
+            .values_list('pk', flat=True)
+            .iterator(chunk_size=kwargs['batch_size']))
+        rebuilt = 0
+        for batch in chunked(recipe_ids, kwargs['batch_size']):
+            rebuilt += len(refresh_recipe_cards(batch))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано карточек рецептов: {rebuilt}.'))
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from common.constants import TAG_MASK_BATCH_SIZE, TAG_MASK_INDEX_NAME
+from recipes.models import Recipe, Tag
+from recipes.ndjson import chunked
+from recipes.tag_mask import get_tag_bit, refresh_tags_masks
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает битовые маски тегов рецептов по связям с тегами '
+        'и при необходимости создаёт частичные индексы для каждого тега.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=TAG_MASK_BATCH_SIZE,
+            help='Количество рецептов, обрабатываемых за один раз.',
+        )
+        parser.add_argument(
+            '--create-indexes',
+            action='store_true',
+            help='Создать частичные индексы для тегов (только PostgreSQL).',
+        )
+
+    def handle(self, *args, **kwargs):
+        recipe_ids = (
+            Recipe.objects
+            .order_by('pk')
+            .values_list('pk', flat=True)
+            .iterator(chunk_size=kwargs['batch_size']))
+        rebuilt = 0
+        for batch in chunked(recipe_ids, kwargs['batch_size']):
+            refresh_tags_masks(batch)
+            rebuilt += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано масок тегов: {rebuilt}.'))
+
+        if kwargs['create_indexes']:
+            self._create_indexes()
+
+    def _create_indexes(self):
+        """
+        Создаёт для каждого тега частичный индекс по дате публикации,
+        условие которого совпадает с условием фильтра по этому тегу.
+        """
+        if connection.vendor != 'postgresql':
+            self.stderr.write(
+                'Частичные индексы создаются только для PostgreSQL.')
+            return
+
+        table = connection.ops.quote_name(Recipe._meta.db_table)
+        created = 0
+        with connection.cursor() as cursor:
+            for tag_id in Tag.objects.values_list('pk', flat=True):
+                bit = get_tag_bit(tag_id)
+                if bit is None:
+                    continue
+                name = connection.ops.quote_name(
+                    TAG_MASK_INDEX_NAME.format(tag_id=tag_id))
+                cursor.execute(
+                    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+                    f'ON {table} ("pub_date" DESC, "id" DESC) '
+                    f'WHERE ("tags_mask" & {bit}) > 0')
+                created += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено частичных индексов тегов: {created}.'))
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.3 on 2026-10-19 10:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0017_recipe_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('tags', 'Тег'), ('ingredients', 'Ингредиент')], max_length=16, verbose_name='Справочник')),
+                ('object_id', models.BigIntegerField(verbose_name='Идентификатор записи')),
+                ('deleted', models.BooleanField(default=False, verbose_name='Удалено')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Время изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение справочника',
+                'verbose_name_plural': 'Изменения справочника',
+                'ordering': ['id'],
+            },
+        ),
+    ]
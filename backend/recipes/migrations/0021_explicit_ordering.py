@@ -0,0 +1,28 @@
+# Generated by Django 3.2.3 on 2026-10-19 11:23
+
+from django.db import migrations
+
+
+def delete_recipe_cards(apps, schema_editor):
+    # Теги в карточках были упорядочены по времени добавления к рецепту;
+    # карточки соберутся заново при первом чтении.
+    apps.get_model('recipes', 'RecipeCard').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0020_engagement_created_at'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipeingredient',
+            options={'default_related_name': 'recipe_ingredients', 'ordering': ['id'], 'verbose_name': 'Ингредиент', 'verbose_name_plural': 'Ингредиенты'},
+        ),
+        migrations.AlterModelOptions(
+            name='tag',
+            options={'ordering': ['id'], 'verbose_name': 'Тег', 'verbose_name_plural': 'Теги'},
+        ),
+        migrations.RunPython(delete_recipe_cards, migrations.RunPython.noop),
+    ]
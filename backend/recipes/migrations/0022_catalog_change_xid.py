@@ -0,0 +1,22 @@
+# Generated by Django 3.2.3 on 2026-10-19 11:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0021_explicit_ordering'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='catalogchange',
+            options={'ordering': ['xid', 'id'], 'verbose_name': 'Изменение справочника', 'verbose_name_plural': 'Изменения справочника'},
+        ),
+        migrations.AddField(
+            model_name='catalogchange',
+            name='xid',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False, verbose_name='Номер транзакции'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-19 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0022_catalog_change_xid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipeingredient',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, null=True, verbose_name='Время добавления'),
+        ),
+    ]
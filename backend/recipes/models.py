@@ -3,12 +3,19 @@ import uuid
 from django.contrib.auth import get_user_model
 from django.db import models
 
-from common.constants import (DEFAULT_MAX_LENGTH, RECIPE_IMAGE_UPLOAD_FOLDER,
+from common.constants import (CATALOG_INGREDIENTS, CATALOG_KIND_MAX_LENGTH,
+                              CATALOG_TAGS, DEFAULT_MAX_LENGTH,
+                              RECIPE_IMAGE_UPLOAD_FOLDER,
                               RECIPE_NAME_MAX_LENGTH, SHORT_CODE_MAX_LENGTH)
 
 User = get_user_model()
 
 
+def generate_short_code():
+    """Генерирует код для короткой ссылки на основе обрезанного UUID."""
+    return str(uuid.uuid4())[:SHORT_CODE_MAX_LENGTH]
+
+
 class Tag(models.Model):
     name = models.CharField(
         max_length=DEFAULT_MAX_LENGTH,
@@ -21,6 +28,7 @@ class Tag(models.Model):
     class Meta:
         verbose_name = 'Тег'
         verbose_name_plural = 'Теги'
+        ordering = ['id']
 
     def __str__(self):
         return self.name
@@ -55,7 +63,7 @@ class Recipe(models.Model):
         verbose_name='Название')
     image = models.ImageField(
         blank=False, null=False,
-        upload_to=RECIPE_IMAGE_UPLOAD_FOLDER,
+        upload_to=RECIPE_IMAGE_UPLOAD_FOLDER, db_index=True,
         verbose_name='Фото')
     text = models.TextField(
         blank=False, null=False,
@@ -83,11 +91,26 @@ class Recipe(models.Model):
         max_length=SHORT_CODE_MAX_LENGTH,
         unique=True, blank=True,
         verbose_name='Код для короткой ссылки')
+    fanned_out = models.BooleanField(
+        default=False,
+        verbose_name='Разослан в ленты подписчиков')
+    tags_mask = models.BigIntegerField(
+        default=0, editable=False,
+        verbose_name='Битовая маска тегов')
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                condition=models.Q(fanned_out=False),
+                name='recipe_feed_pull_idx'),
+            models.Index(
+                fields=['cooking_time', '-pub_date'],
+                name='recipe_cooking_time_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -98,7 +121,7 @@ class Recipe(models.Model):
         Если short_code отсутствует, генерируется на основе обрезанного UUID.
         """
         if not self.short_code:
-            self.short_code = str(uuid.uuid4())[:SHORT_CODE_MAX_LENGTH]
+            self.short_code = generate_short_code()
         super().save(*args, **kwargs)
 
 
@@ -121,16 +144,26 @@ class RecipeIngredient(models.Model):
         verbose_name='Ингредиенты')
     amount = models.PositiveSmallIntegerField(
         verbose_name='Количество')
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        null=True,
+        verbose_name='Время добавления')
 
     class Meta:
         default_related_name = 'recipe_ingredients'
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        ordering = ['id']
         constraints = [
             models.UniqueConstraint(
                 fields=['recipe', 'ingredient'],
                 name='unique_recipe_ingredient')
         ]
+        indexes = [
+            models.Index(
+                fields=['ingredient', 'recipe'],
+                name='recipe_ingredient_lookup_idx'),
+        ]
 
     def __str__(self):
         return (
@@ -150,6 +183,10 @@ class Favorite(models.Model):
         on_delete=models.CASCADE,
         related_name='favorited_by',
         verbose_name='Избранный рецепт')
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        null=True,
+        verbose_name='Время добавления')
 
     class Meta:
         verbose_name = 'Избранное'
@@ -172,6 +209,10 @@ class ShoppingCart(models.Model):
         Recipe,
         on_delete=models.CASCADE,
         related_name='in_shopping_carts')
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        null=True,
+        verbose_name='Время добавления')
 
     class Meta:
         verbose_name = 'Корзина покупок'
@@ -183,3 +224,216 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'Корзина: {self.user.username} -> {self.recipe.name}'
+
+
+class FeedEntry(models.Model):
+    """
+    Запись в ленте пользователя о рецепте автора, на которого он подписан.
+    Записи создаются при публикации рецепта (fan-out on write), поэтому
+    чтение ленты не зависит от количества подписок.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пользователь')
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор')
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_feed_entry')
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_entry_keyset_idx'),
+            models.Index(
+                fields=['user', 'author'], name='feed_entry_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'Лента {self.user_id}: {self.recipe_id}'
+
+
+class RecipeSignature(models.Model):
+    """
+    MinHash-сигнатура набора ингредиентов рецепта. Отсутствие сигнатуры
+    означает, что рецепт ещё не проиндексирован или изменился, а пустая
+    сигнатура — что у рецепта нет ингредиентов.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='signature',
+        verbose_name='Рецепт')
+    signature = models.BinaryField(
+        verbose_name='Сигнатура')
+
+    class Meta:
+        verbose_name = 'Сигнатура рецепта'
+        verbose_name_plural = 'Сигнатуры рецептов'
+
+    def __str__(self):
+        return f'Сигнатура рецепта {self.recipe_id}'
+
+
+class RecipeBucket(models.Model):
+    """Корзина LSH, в которую попала одна из полос сигнатуры рецепта."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='buckets',
+        verbose_name='Рецепт')
+    bucket = models.BigIntegerField(
+        db_index=True,
+        verbose_name='Хеш полосы сигнатуры')
+
+    class Meta:
+        verbose_name = 'Корзина LSH'
+        verbose_name_plural = 'Корзины LSH'
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.bucket}'
+
+
+class SimilarRecipe(models.Model):
+    """Заранее вычисленный похожий рецепт с оценкой сходства Жаккара."""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт')
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий рецепт')
+    score = models.FloatField(
+        verbose_name='Оценка сходства')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'], name='unique_similar_recipe')
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'], name='similar_recipe_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} ~ {self.similar_id} ({self.score:.2f})'
+
+
+class RecipePopularity(models.Model):
+    """
+    Оценка популярности рецепта, затухающая со временем. Увеличивается при
+    добавлении в избранное и корзину, уменьшается при удалении и
+    периодически умножается на коэффициент затухания.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='popularity',
+        verbose_name='Рецепт')
+    score = models.FloatField(
+        default=0,
+        verbose_name='Оценка популярности')
+    decayed_at = models.DateTimeField(
+        verbose_name='Время последнего затухания')
+
+    class Meta:
+        verbose_name = 'Популярность рецепта'
+        verbose_name_plural = 'Популярность рецептов'
+        indexes = [
+            models.Index(fields=['-score'], name='recipe_popularity_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.score:.2f}'
+
+
+class CatalogChange(models.Model):
+    """
+    Запись журнала изменений справочника: тег или ингредиент был создан,
+    изменён или удалён. Версия справочника вычисляется по номерам
+    транзакций записей (в PostgreSQL) или по номерам записей.
+    """
+
+    KIND_CHOICES = (
+        (CATALOG_TAGS, 'Тег'),
+        (CATALOG_INGREDIENTS, 'Ингредиент'),
+    )
+
+    kind = models.CharField(
+        max_length=CATALOG_KIND_MAX_LENGTH,
+        choices=KIND_CHOICES,
+        verbose_name='Справочник')
+    object_id = models.BigIntegerField(
+        verbose_name='Идентификатор записи')
+    deleted = models.BooleanField(
+        default=False,
+        verbose_name='Удалено')
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Время изменения')
+    xid = models.BigIntegerField(
+        default=0, editable=False, db_index=True,
+        verbose_name='Номер транзакции')
+
+    class Meta:
+        verbose_name = 'Изменение справочника'
+        verbose_name_plural = 'Изменения справочника'
+        ordering = ['xid', 'id']
+
+    def __str__(self):
+        return f'{self.pk}: {self.kind} {self.object_id}'
+
+
+class RecipeCard(models.Model):
+    """
+    Заранее собранная общая для всех пользователей часть представления
+    рецепта в списках (см. recipes.cards).
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='card',
+        verbose_name='Рецепт')
+    data = models.JSONField(
+        verbose_name='Карточка')
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Время сборки')
+
+    class Meta:
+        verbose_name = 'Карточка рецепта'
+        verbose_name_plural = 'Карточки рецептов'
+
+    def __str__(self):
+        return f'Карточка рецепта {self.recipe_id}'
@@ -0,0 +1,318 @@
+"""
+Потоковый экспорт и пакетный импорт рецептов в формате NDJSON.
+
+Каждая строка файла — самостоятельный JSON-объект рецепта, в котором
+автор, теги и ингредиенты указаны по естественным ключам (имя пользователя,
+слаг, название и единица измерения), а изображение — путём в хранилище.
+Это позволяет переносить рецепты между базами с разными первичными ключами.
+"""
+from itertools import islice
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from common.constants import (ABOVE_ZERO_VALUE, ERROR_DUPLICATE_INGREDIENTS,
+                              ERROR_DUPLICATE_TAGS, ERROR_EMPTY_INGREDIENTS,
+                              ERROR_EMPTY_TAGS, ERROR_IMPORT_INVALID_JSON,
+                              ERROR_IMPORT_INVALID_VALUE,
+                              ERROR_IMPORT_MISSING_FIELD,
+                              ERROR_IMPORT_UNKNOWN_AUTHOR,
+                              ERROR_IMPORT_UNKNOWN_INGREDIENT,
+                              ERROR_IMPORT_UNKNOWN_TAG, RECIPE_NAME_MAX_LENGTH,
+                              RECIPES_EXPORT_CHUNK_SIZE,
+                              RECIPES_IMPORT_BATCH_SIZE, SHORT_CODE_MAX_LENGTH)
+from .models import (Ingredient, Recipe, RecipeIngredient, Tag,
+                     generate_short_code)
+from .tag_mask import build_tags_mask
+
+User = get_user_model()
+
+REQUIRED_FIELDS = ('name', 'text', 'cooking_time', 'image', 'author',
+                   'tags', 'ingredients',)
+
+
+class RecordError(Exception):
+    """Ошибка валидации отдельной записи импорта."""
+
+
+def chunked(iterable, size):
+    """Разбивает итерируемый объект на списки длиной не более size."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def export_recipes(queryset, chunk_size=RECIPES_EXPORT_CHUNK_SIZE):
+    """
+    Построчно выгружает рецепты из queryset в формате NDJSON.
+
+    Рецепты читаются через серверный курсор, а ингредиенты и теги
+    подгружаются одним запросом на каждую пачку из chunk_size рецептов,
+    поэтому потребление памяти не зависит от размера выгрузки.
+    """
+    rows = (
+        queryset
+        .order_by('pk')
+        .values('id', 'name', 'text', 'cooking_time', 'image', 'pub_date',
+                'short_code', 'author__username')
+        .iterator(chunk_size=chunk_size))
+
+    for chunk in chunked(rows, chunk_size):
+        recipe_ids = [row['id'] for row in chunk]
+
+        ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+        for recipe_id, name, measurement_unit, amount in (
+                RecipeIngredient.objects
+                .filter(recipe_id__in=recipe_ids)
+                .order_by('pk')
+                .values_list('recipe_id', 'ingredient__name',
+                             'ingredient__measurement_unit', 'amount')):
+            ingredients[recipe_id].append({
+                'name': name,
+                'measurement_unit': measurement_unit,
+                'amount': amount,
+            })
+
+        tags = {recipe_id: [] for recipe_id in recipe_ids}
+        for recipe_id, slug in (
+                Recipe.tags.through.objects
+                .filter(recipe_id__in=recipe_ids)
+                .order_by('pk')
+                .values_list('recipe_id', 'tag__slug')):
+            tags[recipe_id].append(slug)
+
+        for row in chunk:
+            record = {
+                'name': row['name'],
+                'text': row['text'],
+                'cooking_time': row['cooking_time'],
+                'image': row['image'],
+                'pub_date': row['pub_date'].isoformat(),
+                'short_code': row['short_code'],
+                'author': row['author__username'],
+                'tags': tags[row['id']],
+                'ingredients': ingredients[row['id']],
+            }
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def import_recipes(lines, batch_size=RECIPES_IMPORT_BATCH_SIZE):
+    """
+    Импортирует рецепты из строк NDJSON пачками по batch_size.
+
+    Для каждой пачки авторы, теги и ингредиенты разрешаются одним запросом
+    на каждую сущность, после чего рецепты, их ингредиенты и теги
+    создаются через bulk_create в одной транзакции. Некорректные записи
+    пропускаются.
+
+    Возвращает:
+        Кортеж из количества импортированных рецептов и списка ошибок
+        в виде пар (номер строки, сообщение).
+    """
+    imported = 0
+    errors = []
+
+    numbered = (
+        (line_number, line)
+        for line_number, line in enumerate(lines, start=1)
+        if line.strip())
+
+    for batch in chunked(numbered, batch_size):
+        records = []
+        for line_number, line in batch:
+            try:
+                records.append((line_number, _parse_record(line)))
+            except RecordError as error:
+                errors.append((line_number, str(error)))
+
+        batch_imported, batch_errors = _import_batch(records)
+        imported += batch_imported
+        errors.extend(batch_errors)
+
+    return imported, errors
+
+
+def _parse_record(line):
+    """Разбирает строку NDJSON и проверяет структуру записи рецепта."""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        raise RecordError(ERROR_IMPORT_INVALID_JSON)
+    if not isinstance(record, dict):
+        raise RecordError(ERROR_IMPORT_INVALID_JSON)
+
+    for field in REQUIRED_FIELDS:
+        if field not in record:
+            raise RecordError(ERROR_IMPORT_MISSING_FIELD.format(field=field))
+
+    for field in ('name', 'text', 'image', 'author'):
+        if not isinstance(record[field], str) or not record[field]:
+            raise RecordError(ERROR_IMPORT_INVALID_VALUE.format(field=field))
+    if len(record['name']) > RECIPE_NAME_MAX_LENGTH:
+        raise RecordError(ERROR_IMPORT_INVALID_VALUE.format(field='name'))
+
+    if not _is_positive_int(record['cooking_time']):
+        raise RecordError(
+            ERROR_IMPORT_INVALID_VALUE.format(field='cooking_time'))
+
+    if not isinstance(record['tags'], list) or not record['tags']:
+        raise RecordError(ERROR_EMPTY_TAGS)
+    if not all(isinstance(slug, str) for slug in record['tags']):
+        raise RecordError(ERROR_IMPORT_INVALID_VALUE.format(field='tags'))
+    if len(record['tags']) != len(set(record['tags'])):
+        raise RecordError(ERROR_DUPLICATE_TAGS)
+
+    if not isinstance(record['ingredients'], list) or not (
+            record['ingredients']):
+        raise RecordError(ERROR_EMPTY_INGREDIENTS)
+    seen = set()
+    for ingredient in record['ingredients']:
+        if (not isinstance(ingredient, dict)
+                or not isinstance(ingredient.get('name'), str)
+                or not isinstance(ingredient.get('measurement_unit'), str)
+                or not _is_positive_int(ingredient.get('amount'))):
+            raise RecordError(
+                ERROR_IMPORT_INVALID_VALUE.format(field='ingredients'))
+        key = (ingredient.get('name'), ingredient.get('measurement_unit'))
+        if key in seen:
+            raise RecordError(ERROR_DUPLICATE_INGREDIENTS)
+        seen.add(key)
+
+    pub_date = record.get('pub_date')
+    if pub_date is not None:
+        try:
+            record['pub_date'] = parse_datetime(pub_date)
+        except (TypeError, ValueError):
+            record['pub_date'] = None
+        if record['pub_date'] is None:
+            raise RecordError(
+                ERROR_IMPORT_INVALID_VALUE.format(field='pub_date'))
+
+    return record
+
+
+def _is_positive_int(value):
+    return (
+        isinstance(value, int)
+        and not isinstance(value, bool)
+        and value >= ABOVE_ZERO_VALUE)
+
+
+def _import_batch(records):
+    """Разрешает ссылки пачки записей и массово сохраняет рецепты."""
+    errors = []
+    if not records:
+        return 0, errors
+
+    authors = dict(
+        User.objects
+        .filter(username__in={record['author'] for _, record in records})
+        .values_list('username', 'id'))
+    tags = dict(
+        Tag.objects
+        .filter(slug__in={
+            slug for _, record in records for slug in record['tags']})
+        .values_list('slug', 'id'))
+    ingredients = {
+        (name, measurement_unit): pk
+        for pk, name, measurement_unit in (
+            Ingredient.objects
+            .filter(name__in={
+                ingredient.get('name')
+                for _, record in records
+                for ingredient in record['ingredients']})
+            .values_list('id', 'name', 'measurement_unit'))
+    }
+    taken_short_codes = set(
+        Recipe.objects
+        .filter(short_code__in={
+            record.get('short_code') for _, record in records})
+        .values_list('short_code', flat=True))
+
+    resolved = []
+    for line_number, record in records:
+        try:
+            resolved.append(_resolve_record(
+                record, authors, tags, ingredients, taken_short_codes))
+        except RecordError as error:
+            errors.append((line_number, str(error)))
+
+    if not resolved:
+        return 0, errors
+
+    with transaction.atomic():
+        Recipe.objects.bulk_create([recipe for recipe, *_ in resolved])
+
+        dated = []
+        recipe_ingredients = []
+        recipe_tags = []
+        for recipe, pub_date, tag_ids, amounts in resolved:
+            if pub_date is not None:
+                recipe.pub_date = pub_date
+                dated.append(recipe)
+            recipe_tags.extend(
+                Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+                for tag_id in tag_ids)
+            recipe_ingredients.extend(
+                RecipeIngredient(recipe_id=recipe.pk,
+                                 ingredient_id=ingredient_id, amount=amount)
+                for ingredient_id, amount in amounts)
+
+        if dated:
+            Recipe.objects.bulk_update(dated, ['pub_date'])
+        Recipe.tags.through.objects.bulk_create(recipe_tags)
+        RecipeIngredient.objects.bulk_create(recipe_ingredients)
+
+    return len(resolved), errors
+
+
+def _resolve_record(record, authors, tags, ingredients, taken_short_codes):
+    """
+    Сопоставляет естественные ключи записи с первичными ключами в базе.
+
+    Возвращает несохранённый рецепт, дату публикации, идентификаторы тегов
+    и пары (идентификатор ингредиента, количество).
+    """
+    author_id = authors.get(record['author'])
+    if author_id is None:
+        raise RecordError(
+            ERROR_IMPORT_UNKNOWN_AUTHOR.format(username=record['author']))
+
+    tag_ids = []
+    for slug in record['tags']:
+        if slug not in tags:
+            raise RecordError(ERROR_IMPORT_UNKNOWN_TAG.format(slug=slug))
+        tag_ids.append(tags[slug])
+
+    amounts = []
+    for ingredient in record['ingredients']:
+        key = (ingredient.get('name'), ingredient.get('measurement_unit'))
+        if key not in ingredients:
+            raise RecordError(ERROR_IMPORT_UNKNOWN_INGREDIENT.format(
+                name=key[0], measurement_unit=key[1]))
+        amounts.append((ingredients[key], ingredient['amount']))
+
+    short_code = record.get('short_code')
+    if (not isinstance(short_code, str)
+            or not short_code
+            or len(short_code) > SHORT_CODE_MAX_LENGTH
+            or short_code in taken_short_codes):
+        short_code = generate_short_code()
+        while short_code in taken_short_codes:
+            short_code = generate_short_code()
+    taken_short_codes.add(short_code)
+
+    recipe = Recipe(
+        name=record['name'],
+        text=record['text'],
+        cooking_time=record['cooking_time'],
+        image=record['image'],
+        author_id=author_id,
+        short_code=short_code,
+        tags_mask=build_tags_mask(tag_ids))
+    return recipe, record.get('pub_date'), tag_ids, amounts
@@ -0,0 +1,82 @@
+"""
+Поиск похожих рецептов по MinHash-сигнатурам наборов ингредиентов.
+
+Сигнатуры и корзины LSH строятся офлайн командой build_similar_recipes
+только для рецептов без сигнатуры: при изменении ингредиентов сигнатура
+рецепта удаляется через mark_stale. Для каждого рецепта заранее
+сохраняется список наиболее похожих, поэтому ответ API — одно чтение
+по индексу.
+"""
+import numpy as np
+
+from common.constants import (SIMILARITY_BANDS, SIMILARITY_NUM_PERMUTATIONS,
+                              SIMILARITY_SEED)
+from .models import RecipeSignature
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+BUCKET_MULTIPLIER = np.uint64(1000003)
+ROWS_PER_BAND = SIMILARITY_NUM_PERMUTATIONS // SIMILARITY_BANDS
+
+_random = np.random.RandomState(SIMILARITY_SEED)
+_A = _random.randint(
+    1, 1 << 32, size=SIMILARITY_NUM_PERMUTATIONS, dtype=np.uint64)
+_B = _random.randint(
+    0, 1 << 32, size=SIMILARITY_NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def mark_stale(recipe):
+    """Помечает рецепт для переиндексации после изменения ингредиентов."""
+    RecipeSignature.objects.filter(recipe=recipe).delete()
+
+
+def compute_signatures(recipe_ids, ingredient_ids):
+    """
+    Вычисляет MinHash-сигнатуры для пар (рецепт, ингредиент),
+    отсортированных по рецепту.
+
+    Возвращает массив уникальных id рецептов и матрицу сигнатур
+    размера (число рецептов, SIMILARITY_NUM_PERMUTATIONS) типа uint32.
+    """
+    recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+    ingredient_ids = np.asarray(ingredient_ids, dtype=np.uint64)
+    if not len(recipe_ids):
+        return recipe_ids, np.empty(
+            (0, SIMILARITY_NUM_PERMUTATIONS), dtype=np.uint32)
+
+    hashes = (np.outer(ingredient_ids, _A) + _B) % MERSENNE_PRIME
+    hashes &= MAX_HASH
+
+    starts = np.flatnonzero(
+        np.concatenate(([True], recipe_ids[1:] != recipe_ids[:-1])))
+    signatures = np.minimum.reduceat(hashes, starts, axis=0)
+    return recipe_ids[starts], signatures.astype(np.uint32)
+
+
+def compute_buckets(signatures):
+    """
+    Разбивает сигнатуры на полосы и хеширует каждую полосу вместе
+    с её номером. Возвращает матрицу (число рецептов, SIMILARITY_BANDS)
+    знаковых 64-битных хешей.
+    """
+    bands = signatures.reshape(
+        len(signatures), SIMILARITY_BANDS, ROWS_PER_BAND).astype(np.uint64)
+    buckets = np.broadcast_to(
+        np.arange(SIMILARITY_BANDS, dtype=np.uint64),
+        (len(signatures), SIMILARITY_BANDS)).copy()
+    for row in range(ROWS_PER_BAND):
+        buckets = buckets * BUCKET_MULTIPLIER ^ bands[:, :, row]
+    return buckets.view(np.int64)
+
+
+def estimate_similarity(signature, candidates):
+    """Оценивает сходство Жаккара сигнатуры с матрицей сигнатур."""
+    return (candidates == signature).mean(axis=1)
+
+
+def to_bytes(signature):
+    return signature.astype('<u4').tobytes()
+
+
+def from_bytes(data):
+    return np.frombuffer(bytes(data), dtype='<u4')
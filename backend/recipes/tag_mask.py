@@ -0,0 +1,68 @@
+"""
+Битовая маска тегов рецепта.
+
+Помимо связи многие-ко-многим, которая остаётся источником истины,
+каждый рецепт хранит в поле tags_mask биты своих тегов: тегу с id N
+соответствует бит N - 1. Фильтр по тегам превращается в проверку битов
+без соединения с промежуточной таблицей, а для каждого тега можно
+построить частичный индекс командой rebuild_tag_masks.
+
+Теги с id больше TAG_MASK_MAX_ID в маску не попадают, фильтр по ним
+выполняется через подзапрос к промежуточной таблице.
+"""
+from django.db.models import Exists, F, OuterRef, Q
+
+from common.constants import TAG_MASK_MAX_ID
+from .models import Recipe
+
+
+def get_tag_bit(tag_id):
+    """Возвращает бит тега или None, если тег не помещается в маску."""
+    if 0 < tag_id <= TAG_MASK_MAX_ID:
+        return 1 << (tag_id - 1)
+    return None
+
+
+def build_tags_mask(tag_ids):
+    """Собирает маску из идентификаторов тегов."""
+    mask = 0
+    for tag_id in tag_ids:
+        bit = get_tag_bit(tag_id)
+        if bit is not None:
+            mask |= bit
+    return mask
+
+
+def refresh_tags_masks(recipe_ids):
+    """Пересчитывает маски рецептов по промежуточной таблице тегов."""
+    masks = dict.fromkeys(recipe_ids, 0)
+    for recipe_id, tag_id in (
+            Recipe.tags.through.objects
+            .filter(recipe_id__in=masks)
+            .values_list('recipe_id', 'tag_id')):
+        masks[recipe_id] |= build_tags_mask([tag_id])
+
+    Recipe.objects.bulk_update(
+        [Recipe(pk=recipe_id, tags_mask=mask)
+         for recipe_id, mask in masks.items()],
+        ['tags_mask'])
+
+
+def filter_by_tags(queryset, tag_ids):
+    """
+    Оставляет рецепты, у которых есть хотя бы один из тегов. Для каждого
+    тега проверяется отдельный бит, чтобы условие совпадало с условием
+    частичного индекса этого тега.
+    """
+    if any(get_tag_bit(tag_id) is None for tag_id in tag_ids):
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'), tag_id__in=tag_ids)))
+
+    condition = Q()
+    for tag_id in tag_ids:
+        alias = f'tag_bit_{tag_id}'
+        queryset = queryset.alias(
+            **{alias: F('tags_mask').bitand(get_tag_bit(tag_id))})
+        condition |= Q(**{f'{alias}__gt': 0})
+    return queryset.filter(condition)
@@ -0,0 +1,160 @@
+import csv
+from datetime import timedelta
+import gzip
+from io import StringIO
+import os
+import tempfile
+from unittest import mock, skipIf
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from common.constants import (ANALYTICS_FORMAT_CSV, ANALYTICS_FORMAT_PARQUET,
+                              ANALYTICS_WATERMARK_FILE, ANALYTICS_WATERMARK_ID,
+                              ANALYTICS_WATERMARK_TIME)
+from recipes import analytics
+from recipes.models import Favorite, RecipeIngredient
+from recipes.tests.utils import create_catalog, create_recipe, create_user
+
+
+def read_csv(path):
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as file:
+        return list(csv.reader(file))
+
+
+def make_old(queryset, minutes=5):
+    queryset.update(created_at=timezone.now() - timedelta(minutes=minutes))
+
+
+class ExportTableTest(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.user = create_user('reader')
+        author = create_user('author')
+        _, self.ingredients = create_catalog(tags=0, ingredients=3)
+        self.recipes = [
+            create_recipe(author, self.ingredients[:2], name=f'Рецепт {n}')
+            for n in range(3)]
+
+    def export(self, name, incremental=None, watermarks=None,
+               file_format=ANALYTICS_FORMAT_CSV):
+        return analytics.export_table(
+            name, self.directory, file_format, watermarks=watermarks,
+            incremental=incremental, batch_size=2)
+
+    def favorite(self, recipe):
+        return Favorite.objects.create(user=self.user, recipe=recipe)
+
+    def test_full_export_to_csv(self):
+        favorites = [self.favorite(recipe) for recipe in self.recipes]
+        make_old(Favorite.objects.all())
+
+        path, exported = self.export('favorites')
+
+        self.assertEqual(exported, 3)
+        rows = read_csv(path)
+        self.assertEqual(rows[0], ['id', 'user_id', 'recipe_id', 'created_at'])
+        self.assertEqual(
+            [row[:3] for row in rows[1:]],
+            [[str(favorite.pk), str(self.user.pk), str(favorite.recipe_id)]
+             for favorite in favorites])
+        self.assertFalse(
+            [name for name in os.listdir(self.directory)
+             if name.endswith('.part')])
+
+    def test_id_watermark_waits_for_recent_rows(self):
+        old = self.favorite(self.recipes[0])
+        make_old(Favorite.objects.all())
+        recent = self.favorite(self.recipes[1])
+        watermarks = {}
+
+        path, exported = self.export(
+            'favorites', ANALYTICS_WATERMARK_ID, watermarks)
+        self.assertEqual(exported, 1)
+        self.assertEqual(read_csv(path)[1][0], str(old.pk))
+        self.assertEqual(watermarks, {ANALYTICS_WATERMARK_ID: old.pk})
+
+        make_old(Favorite.objects.filter(pk=recent.pk), minutes=2)
+        path, exported = self.export(
+            'favorites', ANALYTICS_WATERMARK_ID, watermarks)
+        self.assertEqual(exported, 1)
+        self.assertEqual(read_csv(path)[1][0], str(recent.pk))
+
+        self.assertEqual(
+            self.export('favorites', ANALYTICS_WATERMARK_ID, watermarks),
+            (None, 0))
+
+    def test_full_export_does_not_move_id_watermark_past_recent_rows(self):
+        old = self.favorite(self.recipes[0])
+        make_old(Favorite.objects.all())
+        self.favorite(self.recipes[1])
+        watermarks = {}
+
+        _, exported = self.export('favorites', watermarks=watermarks)
+
+        self.assertEqual(exported, 2)
+        self.assertEqual(watermarks, {ANALYTICS_WATERMARK_ID: old.pk})
+
+    @mock.patch('recipes.analytics.ANALYTICS_WATERMARK_LAG', 0)
+    def test_time_watermark_exports_ingredients_of_old_recipes(self):
+        recipe = self.recipes[0]
+        watermarks = {}
+        _, exported = self.export(
+            'recipe_ingredients', ANALYTICS_WATERMARK_TIME, watermarks)
+        self.assertEqual(exported, 6)
+
+        added = RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=self.ingredients[2], amount=5)
+        path, exported = self.export(
+            'recipe_ingredients', ANALYTICS_WATERMARK_TIME, watermarks)
+
+        self.assertEqual(exported, 1)
+        rows = read_csv(path)
+        self.assertEqual(rows[1][:3], [
+            str(added.pk), str(recipe.pk), str(self.ingredients[2].pk)])
+
+    @skipIf(analytics.pyarrow is None, 'pyarrow не установлен.')
+    def test_export_to_parquet(self):
+        path, exported = self.export(
+            'recipe_ingredients', file_format=ANALYTICS_FORMAT_PARQUET)
+
+        self.assertEqual(exported, 6)
+        table = analytics.pyarrow.parquet.read_table(path)
+        self.assertEqual(
+            table.column_names, analytics.TABLES['recipe_ingredients'].names)
+        self.assertEqual(
+            table.column('id').to_pylist(),
+            list(RecipeIngredient.objects.values_list('pk', flat=True)))
+        self.assertEqual(
+            table.column('ingredient_name').to_pylist()[:2],
+            [ingredient.name for ingredient in self.ingredients[:2]])
+
+
+class ExportAnalyticsCommandTest(TestCase):
+
+    def test_writes_files_and_watermarks(self):
+        user = create_user('reader')
+        recipe = create_recipe(create_user('author'))
+        favorite = Favorite.objects.create(user=user, recipe=recipe)
+        make_old(Favorite.objects.all())
+
+        with tempfile.TemporaryDirectory() as directory:
+            call_command(
+                'export_analytics', output=directory,
+                format=ANALYTICS_FORMAT_CSV,
+                incremental=ANALYTICS_WATERMARK_ID,
+                tables=['favorites', 'shopping_cart'], stdout=StringIO())
+
+            watermarks = analytics.load_watermarks(directory)
+            files = sorted(os.listdir(directory))
+
+        self.assertEqual(watermarks, {
+            'favorites': {ANALYTICS_WATERMARK_ID: favorite.pk},
+            'shopping_cart': {},
+        })
+        self.assertEqual(len(files), 2)
+        self.assertIn(ANALYTICS_WATERMARK_FILE, files)
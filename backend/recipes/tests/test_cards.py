@@ -0,0 +1,146 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from recipes.cards import build_recipe_cards, refresh_recipe_cards
+from recipes.models import RecipeCard
+from recipes.tests.utils import create_catalog, create_recipe, create_user
+
+
+class RecipeCardTestCase(TestCase):
+
+    def setUp(self):
+        self.author = create_user('author')
+        self.tags, self.ingredients = create_catalog(tags=2, ingredients=2)
+        self.recipe = create_recipe(
+            self.author, self.ingredients, self.tags[:1])
+        self.other = create_recipe(
+            create_user('other'), self.ingredients[1:], name='Другой')
+        refresh_recipe_cards([self.recipe.pk, self.other.pk])
+
+    def card(self, recipe=None):
+        return RecipeCard.objects.get(pk=(recipe or self.recipe).pk).data
+
+    def assert_cards_fresh(self):
+        cards = dict(RecipeCard.objects.values_list('recipe_id', 'data'))
+        self.assertEqual(cards, build_recipe_cards(list(cards)))
+        self.assertEqual(set(cards), {self.recipe.pk, self.other.pk})
+
+
+class InvalidationTest(RecipeCardTestCase):
+
+    def test_tag_change_rebuilds_cards(self):
+        tag = self.tags[0]
+        tag.name = 'Завтрак'
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.save()
+
+        self.assertEqual(self.card()['tags'][0]['name'], 'Завтрак')
+        self.assert_cards_fresh()
+
+    def test_tag_delete_rebuilds_cards(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tags[0].delete()
+
+        self.assertEqual(self.card()['tags'], [])
+        self.assert_cards_fresh()
+
+    def test_ingredient_change_rebuilds_cards(self):
+        ingredient = self.ingredients[1]
+        ingredient.measurement_unit = 'кг'
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient.save()
+
+        for recipe in (self.recipe, self.other):
+            self.assertEqual(
+                self.card(recipe)['ingredients'][-1]['measurement_unit'],
+                'кг')
+        self.assert_cards_fresh()
+
+    def test_ingredient_delete_rebuilds_cards(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingredients[0].delete()
+
+        self.assertEqual(
+            [item['id'] for item in self.card()['ingredients']],
+            [self.ingredients[1].pk])
+        self.assert_cards_fresh()
+
+    def test_author_profile_change_rebuilds_cards(self):
+        self.author.first_name = 'Новое'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save()
+
+        self.assertEqual(self.card()['author']['first_name'], 'Новое')
+        self.assertEqual(self.card(self.other)['author']['username'], 'other')
+        self.assert_cards_fresh()
+
+    def test_author_avatar_change_rebuilds_cards(self):
+        self.author.avatar = 'users/avatar.png'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save()
+
+        self.assertEqual(self.card()['author']['avatar'], 'users/avatar.png')
+        self.assert_cards_fresh()
+
+    def test_unrelated_author_change_keeps_cards(self):
+        self.author.is_active = False
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.author.save()
+
+        self.assertEqual(callbacks, [])
+        self.assertTrue(RecipeCard.objects.filter(pk=self.recipe.pk).exists())
+
+    def test_card_saved_by_racing_read_is_replaced(self):
+        stale = build_recipe_cards([self.recipe.pk])[self.recipe.pk]
+        tag = self.tags[0]
+        tag.name = 'Завтрак'
+        with self.captureOnCommitCallbacks() as callbacks:
+            tag.save()
+        # Чтение, начавшееся до фиксации, сохраняет карточку из старых
+        # строк уже после того, как изменение её удалило.
+        RecipeCard.objects.bulk_create(
+            [RecipeCard(recipe=self.recipe, data=stale)],
+            ignore_conflicts=True)
+        self.assertEqual(self.card(), stale)
+
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(self.card()['tags'][0]['name'], 'Завтрак')
+
+
+class CheckRecipeCardsCommandTest(RecipeCardTestCase):
+
+    def check(self, **kwargs):
+        stdout = StringIO()
+        call_command('check_recipe_cards', stdout=stdout, **kwargs)
+        return stdout.getvalue()
+
+    def make_stale(self):
+        data = self.card()
+        data['name'] = 'Устаревшее название'
+        RecipeCard.objects.filter(pk=self.recipe.pk).update(data=data)
+
+    def test_fresh_cards(self):
+        self.assertIn('Расхождений нет.', self.check())
+
+    def test_reports_drift(self):
+        self.make_stale()
+
+        with self.assertRaisesMessage(CommandError, str(self.recipe.pk)):
+            self.check()
+
+        self.assertEqual(self.card()['name'], 'Устаревшее название')
+
+    def test_fix_rebuilds_stale_cards(self):
+        self.make_stale()
+
+        output = self.check(fix=True)
+
+        self.assertIn('Пересобрано карточек: 1.', output)
+        self.assertEqual(self.card()['name'], self.recipe.name)
+        self.assert_cards_fresh()
+        self.assertIn('Расхождений нет.', self.check())
@@ -0,0 +1,72 @@
+import threading
+from unittest import skipUnless
+
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
+
+from common.constants import CATALOG_ETAG
+from recipes.catalog import get_catalog_version, get_changes
+from recipes.models import Ingredient, Tag
+from recipes.tests.utils import token_client
+
+
+class CatalogTest(TestCase):
+
+    def test_changes_after_snapshot_version(self):
+        tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        snapshot = token_client().get('/api/catalog/').data
+        self.assertEqual(snapshot['tags'], [[tag.pk, 'Завтрак', 'breakfast']])
+
+        salt = Ingredient.objects.create(name='Соль', measurement_unit='г')
+        tag_id = tag.pk
+        tag.delete()
+        changes = token_client().get(
+            '/api/catalog/', {'since': snapshot['version']}).data
+
+        self.assertEqual(changes['ingredients'], [[salt.pk, 'Соль', 'г']])
+        self.assertEqual(changes['tags'], [])
+        self.assertEqual(changes['deleted']['tags'], [tag_id])
+
+    def test_version_is_stable_without_changes(self):
+        Tag.objects.create(name='Обед', slug='lunch')
+        response = token_client().get('/api/catalog/')
+        version = response.data['version']
+
+        self.assertEqual(get_catalog_version(), version)
+        self.assertEqual(
+            token_client().get(
+                '/api/catalog/',
+                HTTP_IF_NONE_MATCH=CATALOG_ETAG.format(version=version)
+            ).status_code, 304)
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'Номера транзакций есть только в PostgreSQL.')
+class CatalogVisibilityTest(TransactionTestCase):
+
+    def test_change_committed_late_is_not_skipped(self):
+        Tag.objects.create(name='Завтрак', slug='breakfast')
+        recorded = threading.Event()
+        release = threading.Event()
+
+        def slow_transaction():
+            try:
+                with transaction.atomic():
+                    Tag.objects.create(name='Ужин', slug='dinner')
+                    recorded.set()
+                    release.wait(10)
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=slow_transaction)
+        thread.start()
+        recorded.wait(10)
+        Ingredient.objects.create(name='Перец', measurement_unit='г')
+        version = get_catalog_version()
+
+        release.set()
+        thread.join()
+        changes = get_changes(version, get_catalog_version())
+
+        self.assertEqual(
+            [row[2] for row in changes['tags']], ['dinner'])
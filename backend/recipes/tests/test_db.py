@@ -0,0 +1,106 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from unittest import mock, skipUnless
+
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+
+from common.db import delete_returning, insert_ignore
+from recipes.models import Favorite
+from recipes.tests.utils import create_recipe, create_user
+
+THREADS = 8
+
+
+class RelationQueriesMixin:
+
+    def create_objects(self):
+        self.user = create_user('user')
+        self.recipe = create_recipe(create_user('author'))
+
+    def check_insert_and_delete(self):
+        created = insert_ignore(Favorite, user=self.user, recipe=self.recipe)
+        self.assertIsNotNone(created)
+        self.assertIsNone(
+            insert_ignore(Favorite, user=self.user, recipe=self.recipe))
+
+        self.assertEqual(
+            delete_returning(Favorite, user=self.user, recipe=self.recipe),
+            [created])
+        self.assertEqual(
+            delete_returning(Favorite, user=self.user, recipe=self.recipe),
+            [])
+
+    def check_returning_fields(self):
+        insert_ignore(Favorite, user=self.user, recipe=self.recipe)
+        created_at = Favorite.objects.get().created_at
+
+        self.assertEqual(
+            delete_returning(
+                Favorite, returning=['created_at', 'recipe_id'],
+                user=self.user, recipe=self.recipe),
+            [(created_at, self.recipe.pk)])
+
+
+class RelationQueriesTest(RelationQueriesMixin, TestCase):
+
+    def setUp(self):
+        self.create_objects()
+
+    def test_insert_and_delete(self):
+        self.check_insert_and_delete()
+
+    def test_returning_fields(self):
+        self.check_returning_fields()
+
+    def test_orm_fallback(self):
+        with mock.patch('common.db.RETURNING_VENDORS', ()):
+            self.check_insert_and_delete()
+            self.check_returning_fields()
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'Одновременные запросы проверяются на PostgreSQL.')
+class RelationQueriesConcurrencyTest(RelationQueriesMixin,
+                                     TransactionTestCase):
+
+    def setUp(self):
+        self.create_objects()
+
+    def run_concurrently(self, function):
+        barrier = threading.Barrier(THREADS)
+
+        def run(_):
+            try:
+                barrier.wait()
+                return function(
+                    Favorite, user=self.user, recipe=self.recipe)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=THREADS) as executor:
+            return list(executor.map(run, range(THREADS)))
+
+    def test_exactly_one_insert_wins(self):
+        results = self.run_concurrently(insert_ignore)
+
+        self.assertEqual(
+            len([pk for pk in results if pk is not None]), 1)
+        self.assertEqual(Favorite.objects.count(), 1)
+
+    def test_exactly_one_delete_wins(self):
+        insert_ignore(Favorite, user=self.user, recipe=self.recipe)
+
+        results = self.run_concurrently(delete_returning)
+
+        self.assertEqual(sorted(map(len, results)), [0] * (THREADS - 1) + [1])
+        self.assertFalse(Favorite.objects.exists())
+
+    def test_orm_fallback_has_no_integrity_errors(self):
+        with mock.patch('common.db.RETURNING_VENDORS', ()):
+            inserted = self.run_concurrently(insert_ignore)
+            deleted = self.run_concurrently(delete_returning)
+
+        self.assertEqual(
+            len([pk for pk in inserted if pk is not None]), 1)
+        self.assertEqual(sum(map(len, deleted)), 1)
@@ -0,0 +1,126 @@
+import threading
+from unittest import mock
+
+from django.test import TestCase
+
+from recipes.ingredient_index import IngredientIndex
+from recipes.models import RecipeIngredient
+from recipes.tests.utils import create_catalog, create_recipe, create_user
+
+
+class IngredientIndexTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        _, cls.ingredients = create_catalog(tags=0, ingredients=3)
+        milk, eggs, flour = cls.ingredients
+        cls.omelette = create_recipe(cls.author, [milk, eggs])
+        cls.pancakes = create_recipe(cls.author, [milk, eggs, flour])
+
+    def setUp(self):
+        self.index = IngredientIndex()
+
+    def search(self, *ingredients, **kwargs):
+        return self.index.search(
+            [ingredient.pk for ingredient in ingredients], **kwargs)
+
+    def test_search_ranks_by_coverage(self):
+        milk, eggs, _ = self.ingredients
+
+        self.assertEqual(self.search(milk, eggs), [
+            (self.omelette.pk, 1.0, 0),
+            (self.pancakes.pk, 2 / 3, 1),
+        ])
+        self.assertEqual(
+            self.search(milk, eggs, max_missing=0),
+            [(self.omelette.pk, 1.0, 0)])
+
+    def test_search_within_recipe_ids(self):
+        milk = self.ingredients[0]
+
+        self.assertEqual(
+            self.search(milk, recipe_ids={self.pancakes.pk, 10 ** 6}),
+            [(self.pancakes.pk, 1 / 3, 2)])
+        self.assertEqual(self.search(milk, recipe_ids=set()), [])
+
+    def test_recipe_changed_during_build_is_reloaded(self):
+        milk, eggs, flour = self.ingredients
+        read = self.index._read
+
+        def read_then_change():
+            data = read()
+            # Изменение зафиксировано после того, как индекс прочитан.
+            RecipeIngredient.objects.filter(
+                recipe=self.omelette, ingredient=eggs).delete()
+            self.index.update_recipe(self.omelette.pk, [milk.pk])
+            return data
+
+        with mock.patch.object(self.index, '_read', read_then_change):
+            self.index.build()
+
+        self.assertEqual(
+            self.search(milk), [
+                (self.omelette.pk, 1.0, 0),
+                (self.pancakes.pk, 1 / 3, 2)])
+
+    def test_invalidate_keeps_index_while_rebuilding_in_background(self):
+        milk = self.ingredients[0]
+        self.search(milk)
+        self.index._refresh = threading.Event()
+        create_recipe(self.author, [milk], name='Новый')
+
+        self.index.invalidate()
+
+        self.assertTrue(self.index._refresh.is_set())
+        self.assertEqual(len(self.search(milk)), 2)
+        self.index.build()
+        self.assertEqual(len(self.search(milk)), 3)
+
+    def test_search_does_not_rebuild_with_background_thread(self):
+        milk = self.ingredients[0]
+        self.search(milk)
+        self.index._refresh = threading.Event()
+        self.index._built_at -= self.index.ttl + 1
+        create_recipe(self.author, [milk], name='Новый')
+
+        with mock.patch.object(self.index, '_read') as read:
+            self.assertEqual(len(self.search(milk)), 2)
+
+        read.assert_not_called()
+
+    def test_mark_dirty_reloads_recipes_changed_elsewhere(self):
+        milk, eggs, flour = self.ingredients
+        self.search(milk)
+        # Другой процесс изменил рецепты и прислал их id через шину.
+        RecipeIngredient.objects.filter(
+            recipe=self.omelette, ingredient=eggs).delete()
+        RecipeIngredient.objects.create(
+            recipe=self.omelette, ingredient=flour, amount=1)
+        pancakes_id = self.pancakes.pk
+        self.pancakes.delete()
+        added = create_recipe(self.author, [eggs], name='Новый')
+
+        self.assertEqual(len(self.search(milk)), 2)
+        with mock.patch.object(self.index, '_read') as read:
+            self.index.mark_dirty(
+                [self.omelette.pk, pancakes_id, added.pk])
+            self.assertEqual(self.search(milk, eggs), [
+                (added.pk, 1.0, 0), (self.omelette.pk, 1 / 2, 1)])
+
+        read.assert_not_called()
+        self.assertEqual(self.index._dirty, set())
+
+    def test_mark_dirty_before_build_is_ignored(self):
+        self.index.mark_dirty([self.omelette.pk])
+
+        self.assertEqual(self.index._dirty, set())
+
+    def test_mark_dirty_all_rebuilds(self):
+        milk = self.ingredients[0]
+        self.search(milk)
+        create_recipe(self.author, [milk], name='Новый')
+
+        self.index.mark_dirty(None)
+
+        self.assertEqual(len(self.search(milk)), 3)
@@ -0,0 +1,65 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from recipes.models import RecipeSignature, SimilarRecipe
+from recipes.tests.utils import create_catalog, create_recipe, create_user
+
+
+def build(*args):
+    call_command('build_similar_recipes', *args, stdout=StringIO())
+
+
+class SimilarRecipesMixin:
+
+    def create_recipes(self):
+        self.author = create_user('author')
+        _, self.ingredients = create_catalog()
+        self.recipes = [
+            create_recipe(self.author, self.ingredients[index:index + 5],
+                          name=f'Рецепт {index}')
+            for index in range(4)]
+        self.empty = create_recipe(self.author, name='Без ингредиентов')
+
+    def assert_indexed(self):
+        self.assertEqual(
+            bytes(RecipeSignature.objects.get(recipe=self.empty).signature),
+            b'')
+        self.assertEqual(RecipeSignature.objects.count(), 5)
+        pairs = set(SimilarRecipe.objects.values_list(
+            'recipe_id', 'similar_id'))
+        self.assertTrue(pairs)
+        self.assertEqual(
+            pairs, {(similar, recipe) for recipe, similar in pairs})
+        self.assertFalse(
+            SimilarRecipe.objects.filter(recipe=self.empty).exists())
+
+
+class BuildSimilarRecipesTest(SimilarRecipesMixin, TestCase):
+
+    def setUp(self):
+        self.create_recipes()
+
+    def test_builds_index(self):
+        build('--batch-size', '2')
+        self.assert_indexed()
+
+    def test_recipe_without_ingredients_is_not_reprocessed(self):
+        build()
+        with self.assertNumQueries(1):
+            build()
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'Процессы пула не видят тестовую базу SQLite в памяти.')
+class BuildSimilarRecipesWorkersTest(SimilarRecipesMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.create_recipes()
+
+    def test_builds_index_with_workers(self):
+        build('--workers', '2', '--batch-size', '1')
+        self.assert_indexed()
@@ -0,0 +1,103 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock, skipUnless
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from common.constants import CONTENT_STORAGE_RELEASE_GRACE
+from common.storage import release_file
+from recipes.tests.utils import create_recipe, create_user
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def save(content=b'image'):
+    return default_storage.save('photo.png', ContentFile(content))
+
+
+def make_old(name):
+    old = time.time() - CONTENT_STORAGE_RELEASE_GRACE - 1
+    os.utime(default_storage.path(name), (old, old))
+
+
+class StorageTestMixin:
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ContentAddressedStorageTest(StorageTestMixin, TestCase):
+
+    def release(self, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            release_file(name)
+
+    def test_same_content_is_stored_once_and_touched(self):
+        name = save()
+        make_old(name)
+
+        self.assertEqual(save(), name)
+        self.assertGreater(
+            os.path.getmtime(default_storage.path(name)),
+            time.time() - CONTENT_STORAGE_RELEASE_GRACE)
+
+    def test_release_deletes_old_unreferenced_file(self):
+        name = save(b'unreferenced')
+        make_old(name)
+
+        self.release(name)
+
+        self.assertFalse(default_storage.exists(name))
+
+    def test_release_keeps_recently_saved_file(self):
+        name = save(b'recent')
+
+        self.release(name)
+
+        self.assertTrue(default_storage.exists(name))
+
+    def test_release_keeps_referenced_file(self):
+        name = save(b'referenced')
+        make_old(name)
+        create_recipe(create_user('author'), image=name)
+
+        self.release(name)
+
+        self.assertTrue(default_storage.exists(name))
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'Рекомендательные блокировки есть только в PostgreSQL.')
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ContentAddressedStorageLockTest(StorageTestMixin, TransactionTestCase):
+
+    def test_release_waits_for_transaction_that_reuses_file(self):
+        name = save(b'shared')
+        author = create_user('author')
+
+        def release():
+            try:
+                release_file(name)
+            finally:
+                connections.close_all()
+
+        with mock.patch('common.storage.CONTENT_STORAGE_RELEASE_GRACE', 0):
+            with transaction.atomic():
+                self.assertEqual(save(b'shared'), name)
+                thread = threading.Thread(target=release)
+                thread.start()
+                thread.join(0.5)
+                self.assertTrue(thread.is_alive())
+                create_recipe(author, image=name)
+            thread.join()
+
+        self.assertTrue(default_storage.exists(name))
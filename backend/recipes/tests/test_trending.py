@@ -0,0 +1,104 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from common.constants import TRENDING_HALF_LIFE_HOURS, TRENDING_WEIGHTS
+from events.invalidation import flush_all
+from recipes.models import Favorite, RecipePopularity
+from recipes.tag_mask import refresh_tags_masks
+from recipes.tests.utils import (create_catalog, create_recipe, create_user,
+                                 token_client)
+from recipes.trending import get_trending
+
+WEIGHT = TRENDING_WEIGHTS['favorite']
+
+
+class RecordEngagementTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.old_fan = create_user('old_fan')
+        cls.new_fan = create_user('new_fan')
+        cls.recipe = create_recipe(cls.author)
+
+    def setUp(self):
+        flush_all()
+
+    def test_favorite_adds_weight(self):
+        response = token_client(self.new_fan).post(
+            f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.assertEqual(response.status_code, 201)
+        self.assertAlmostEqual(
+            RecipePopularity.objects.get(recipe=self.recipe).score, WEIGHT,
+            places=3)
+
+    def test_removing_old_engagement_keeps_recent_credit(self):
+        now = timezone.now()
+        engaged_at = now - timedelta(hours=TRENDING_HALF_LIFE_HOURS * 10)
+        Favorite.objects.create(user=self.old_fan, recipe=self.recipe)
+        Favorite.objects.filter(user=self.old_fan).update(
+            created_at=engaged_at)
+        Favorite.objects.create(user=self.new_fan, recipe=self.recipe)
+        RecipePopularity.objects.create(
+            recipe=self.recipe, score=WEIGHT * 0.5 ** 10 + WEIGHT,
+            decayed_at=now)
+
+        response = token_client(self.old_fan).delete(
+            f'/api/recipes/{self.recipe.pk}/favorite/')
+
+        self.assertEqual(response.status_code, 204)
+        self.assertAlmostEqual(
+            RecipePopularity.objects.get(recipe=self.recipe).score, WEIGHT,
+            places=6)
+
+    def test_removing_engagement_without_timestamp_keeps_score(self):
+        Favorite.objects.create(user=self.old_fan, recipe=self.recipe)
+        Favorite.objects.filter(user=self.old_fan).update(created_at=None)
+        RecipePopularity.objects.create(
+            recipe=self.recipe, score=WEIGHT, decayed_at=timezone.now())
+
+        token_client(self.old_fan).delete(
+            f'/api/recipes/{self.recipe.pk}/favorite/')
+
+        self.assertEqual(
+            RecipePopularity.objects.get(recipe=self.recipe).score, WEIGHT)
+
+
+class GetTrendingTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        cls.tags, _ = create_catalog()
+        cls.breakfast = create_recipe(author, tags=[cls.tags[0]])
+        cls.dinner = create_recipe(author, tags=[cls.tags[1]])
+        cls.both = create_recipe(author, tags=cls.tags[:2])
+        refresh_tags_masks([cls.breakfast.pk, cls.dinner.pk, cls.both.pk])
+        now = timezone.now()
+        for score, recipe in enumerate(
+                (cls.breakfast, cls.dinner, cls.both), start=1):
+            RecipePopularity.objects.create(
+                recipe=recipe, score=score, decayed_at=now)
+
+    def setUp(self):
+        flush_all()
+
+    def test_orders_by_score(self):
+        self.assertEqual(
+            get_trending(),
+            [self.both.pk, self.dinner.pk, self.breakfast.pk])
+
+    def test_filters_by_tags_mask_without_join(self):
+        with CaptureQueriesContext(connection) as queries:
+            recipe_ids = get_trending([self.tags[0].slug])
+        self.assertEqual(recipe_ids, [self.both.pk, self.breakfast.pk])
+        self.assertFalse(any(
+            'recipes_recipe_tags' in query['sql']
+            for query in queries.captured_queries))
+
+    def test_unknown_tag_returns_nothing(self):
+        self.assertEqual(get_trending(['unknown']), [])
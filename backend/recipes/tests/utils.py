@@ -0,0 +1,60 @@
+"""Общие помощники тестов: создание пользователей, каталога и рецептов."""
+import base64
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+
+def create_user(username, **kwargs):
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com',
+        password='password', first_name='Имя', last_name='Фамилия',
+        **kwargs)
+
+
+def create_catalog(tags=3, ingredients=10):
+    return (
+        [Tag.objects.create(name=f'Тег {index}', slug=f'tag{index}')
+         for index in range(tags)],
+        [Ingredient.objects.create(
+            name=f'Ингредиент {index}', measurement_unit='г')
+         for index in range(ingredients)])
+
+
+def create_recipe(author, ingredients=(), tags=(), name='Рецепт',
+                  image='recipe_images/test.png', cooking_time=10, **kwargs):
+    """Создаёт рецепт через ORM, минуя сериализатор."""
+    recipe = Recipe.objects.create(
+        author=author, name=name, text='Описание', cooking_time=cooking_time,
+        image=image, **kwargs)
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                         amount=index + 1)
+        for index, ingredient in enumerate(ingredients))
+    recipe.tags.set(tags)
+    return recipe
+
+
+def image_data(color=(255, 0, 0)):
+    """Изображение в формате data URL, как его отправляет фронтенд."""
+    buffer = BytesIO()
+    Image.new('RGB', (2, 2), color).save(buffer, 'PNG')
+    return (
+        'data:image/png;base64,'
+        + base64.b64encode(buffer.getvalue()).decode())
+
+
+def token_client(user=None):
+    """Клиент API с настоящей аутентификацией по токену."""
+    client = APIClient()
+    if user is not None:
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
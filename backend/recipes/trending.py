@@ -0,0 +1,123 @@
+"""
+Популярные рецепты с оценкой, затухающей со временем.
+
+Оценка обновляется при каждом добавлении рецепта в избранное или корзину
+и при удалении оттуда, а команда decay_trending периодически умножает все
+оценки на коэффициент экспоненциального затухания. Поэтому выдача
+популярных рецептов — чтение верхушки индекса по оценке без агрегации по
+таблицам избранного и корзины.
+
+Оценка хранится на момент последнего затухания decayed_at: связь,
+добавленная в момент t, входит в неё с весом weight * 0.5 ** ((decayed_at
+- t) / период полураспада). При удалении связи вычитается именно этот
+вклад, поэтому удаление давней связи не отнимает вклад недавних.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import DurationField, ExpressionWrapper, F, Value
+from django.db.models.functions import Extract, Greatest, Power
+from django.utils import timezone
+
+from common.cache import namespaces
+from common.constants import (CACHE_TRENDING, TRENDING_HALF_LIFE_HOURS,
+                              TRENDING_LIMIT, TRENDING_MIN_SCORE,
+                              TRENDING_WEIGHTS)
+from .models import Recipe, RecipePopularity, Tag
+from .tag_mask import filter_by_tags
+
+trending_cache = namespaces[CACHE_TRENDING]
+
+
+def get_contribution(weight, decayed_at, engaged_at):
+    """Вклад связи, добавленной в engaged_at, в оценку на decayed_at."""
+    hours = (decayed_at - engaged_at).total_seconds() / 3600
+    return weight * 0.5 ** (hours / TRENDING_HALF_LIFE_HOURS)
+
+
+def record_engagement(recipe, model, added, engaged_at=None):
+    """
+    Добавляет к оценке рецепта вклад связи model (избранное или корзина)
+    или вычитает вклад удалённой связи, созданной в engaged_at. Вклад
+    связей без времени создания (созданных до появления этого поля) не
+    вычитается: он и так почти затух.
+    """
+    weight = TRENDING_WEIGHTS[model._meta.model_name]
+    if added:
+        engaged_at = timezone.now()
+    elif engaged_at is None:
+        return
+
+    while True:
+        decayed_at = (
+            RecipePopularity.objects
+            .filter(recipe=recipe)
+            .values_list('decayed_at', flat=True)
+            .first())
+        if decayed_at is None:
+            if not added:
+                return
+            try:
+                with transaction.atomic():
+                    RecipePopularity.objects.create(
+                        recipe=recipe, score=weight, decayed_at=engaged_at)
+                return
+            except IntegrityError:
+                continue
+
+        delta = get_contribution(weight, decayed_at, engaged_at)
+        # Условие на decayed_at не даёт применить вклад, посчитанный для
+        # другого момента, если затухание прошло между чтением и записью.
+        if RecipePopularity.objects.filter(
+                recipe=recipe, decayed_at=decayed_at).update(
+                    score=Greatest(
+                        F('score') + (delta if added else -delta),
+                        Value(0.0))):
+            return
+
+
+def decay_scores():
+    """
+    Применяет экспоненциальное затухание ко всем оценкам с учётом времени,
+    прошедшего с предыдущего затухания каждой из них, и удаляет
+    оценки, ставшие пренебрежимо малыми.
+    """
+    now = timezone.now()
+    elapsed_seconds = Extract(
+        ExpressionWrapper(
+            Value(now) - F('decayed_at'), output_field=DurationField()),
+        'epoch')
+    half_life_seconds = TRENDING_HALF_LIFE_HOURS * 3600
+
+    with transaction.atomic():
+        decayed = RecipePopularity.objects.update(
+            score=F('score') * Power(
+                Value(0.5), elapsed_seconds / Value(half_life_seconds)),
+            decayed_at=now)
+        removed, _ = RecipePopularity.objects.filter(
+            score__lt=TRENDING_MIN_SCORE).delete()
+    trending_cache.clear()
+    return decayed, removed
+
+
+def get_trending(tags=None):
+    """
+    Возвращает id самых популярных рецептов, при необходимости только
+    с указанными тегами. Результат кэшируется в пространстве имён
+    CACHE_TRENDING и сбрасывается после затухания оценок.
+    """
+    tags = sorted(set(tags or ()))
+
+    def build():
+        queryset = RecipePopularity.objects.filter(score__gt=0)
+        if tags:
+            tag_ids = list(Tag.objects.filter(slug__in=tags).values_list(
+                'pk', flat=True))
+            if not tag_ids:
+                return []
+            queryset = queryset.filter(recipe_id__in=filter_by_tags(
+                Recipe.objects.all(), tag_ids).values('pk'))
+        return list(
+            queryset
+            .order_by('-score', '-recipe_id')
+            .values_list('recipe_id', flat=True)[:TRENDING_LIMIT])
+
+    return trending_cache.get_or_set(','.join(tags), build)
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-19 10:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_auto_20241114_1806'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='foodgramuser',
+            name='avatar',
+            field=models.ImageField(blank=True, db_index=True, null=True, upload_to='profile_pictures/', verbose_name='Фото'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-19 11:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_avatar_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, null=True, verbose_name='Время подписки'),
+        ),
+    ]
@@ -28,7 +28,7 @@ class FoodgramUser(AbstractUser):
         max_length=NAME_MAX_LENGTH, blank=False, null=False,
         verbose_name='Фамилия')
     avatar = models.ImageField(
-        upload_to=AVATAR_UPLOAD_FOLDER, blank=True, null=True,
+        upload_to=AVATAR_UPLOAD_FOLDER, blank=True, null=True, db_index=True,
         verbose_name='Фото')
 
     class Meta:
@@ -51,6 +51,10 @@ class Subscription(models.Model):
         related_name='subscribers',
         on_delete=models.CASCADE,
         verbose_name='Подписан на')
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        null=True,
+        verbose_name='Время подписки')
 
     class Meta:
         constraints = [
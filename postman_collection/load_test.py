@@ -0,0 +1,473 @@
+"""
+Нагрузочное тестирование API на основе postman-коллекции.
+
+Сначала запросы коллекции выполняются по порядку, как при обычном запуске
+в Postman: так создаются пользователи, токены и рецепты, а значения
+переменных (id, токены, слаги) извлекаются из ответов по тем же
+правилам, что и в тестовых скриптах коллекции. Затем несколько
+асинхронных клиентов в течение заданного времени выполняют сценарии из
+файла сценариев, выбирая их случайно с учётом весов, и для каждого
+запроса собирается статистика: количество, пропускная способность,
+доля ошибок и перцентили задержки.
+
+Скрипт использует только стандартную библиотеку Python.
+
+Пример запуска:
+    python load_test.py --reset --concurrency 20 --duration 60
+"""
+import argparse
+import asyncio
+from collections import Counter, defaultdict
+import fnmatch
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_COLLECTION = os.path.join(BASE_DIR, 'foodgram.postman_collection.json')
+DEFAULT_SCENARIOS = os.path.join(BASE_DIR, 'load_scenarios.json')
+CLEAR_DB_SCRIPT = os.path.join(BASE_DIR, 'clear_db.sh')
+
+VARIABLE = re.compile(r'{{\s*(\w+)\s*}}')
+SET_VARIABLE = re.compile(
+    r'pm\.collectionVariables\.set\(\s*["\'](\w+)["\']\s*,\s*(.+?)\s*\)\s*;?$')
+GET_FIELD = re.compile(
+    r'const (\w+) = _\.get\(responseData,\s*["\'](\w+)["\']\)')
+ITEM_FIELD = re.compile(
+    r'^responseData\[(\d+)\]\.(\w+)(?:\.slice\(0,\s*(\d+)\))?$')
+PERCENTILES = (50, 95, 99)
+
+
+class Request:
+    """
+    Запрос из коллекции с шаблонами переменных и правилами извлечения.
+    Если у запроса не задана авторизация, используется авторизация
+    ближайшей папки, как в Postman.
+    """
+
+    def __init__(self, name, item, inherited_auth=None):
+        request = item['request']
+        url = request['url']
+        self.name = name
+        self.method = request['method']
+        self.url = url['raw'] if isinstance(url, dict) else url
+        self.headers = [
+            (header['key'], header['value'])
+            for header in request.get('header', [])
+            if not header.get('disabled')]
+        self.body = None
+        body = request.get('body') or {}
+        if body.get('mode') == 'raw' and body.get('raw'):
+            self.body = body['raw']
+            language = body.get('options', {}).get('raw', {}).get('language')
+            if language == 'json':
+                self.headers.append(('Content-Type', 'application/json'))
+
+        auth = request.get('auth') or inherited_auth or {}
+        if auth.get('type') == 'apikey':
+            options = {
+                option['key']: option['value'] for option in auth['apikey']}
+            self.headers.append((options['key'], options['value']))
+
+        self.extractors = parse_extractors(item.get('event', []))
+
+
+def parse_extractors(events):
+    """
+    Находит в тестовых скриптах вызовы pm.collectionVariables.set и
+    переводит их в пары (переменная, функция извлечения из ответа).
+    Поддерживаются формы, используемые в коллекции: _.get(responseData,
+    "поле") и responseData[i].поле с необязательным .slice(0, n).
+    """
+    extractors = []
+    for event in events:
+        if event.get('listen') != 'test':
+            continue
+        lines = [line.strip() for line in event['script']['exec']]
+        fields = dict(
+            match.groups()
+            for line in lines for match in [GET_FIELD.search(line)] if match)
+        for line in lines:
+            match = SET_VARIABLE.search(line)
+            if not match:
+                continue
+            variable, expression = match.groups()
+            if expression in fields:
+                extractors.append(
+                    (variable, field_getter(fields[expression])))
+                continue
+            item_match = ITEM_FIELD.match(expression)
+            if item_match:
+                index, field, length = item_match.groups()
+                extractors.append((variable, item_getter(
+                    int(index), field, int(length) if length else None)))
+    return extractors
+
+
+def field_getter(field):
+    def get(data):
+        return data.get(field) if isinstance(data, dict) else None
+    return get
+
+
+def item_getter(index, field, length):
+    def get(data):
+        if isinstance(data, dict):
+            data = data.get('results', [])
+        if not isinstance(data, list) or len(data) <= index:
+            return None
+        value = data[index].get(field)
+        if length is not None and isinstance(value, str):
+            value = value[:length]
+        return value
+    return get
+
+
+def load_collection(path):
+    """
+    Возвращает запросы коллекции в порядке выполнения и переменные
+    коллекции. Имя запроса состоит из названий папок и самого запроса
+    через "/".
+    """
+    with open(path, encoding='utf-8') as file:
+        collection = json.load(file)
+
+    variables = {
+        variable['key']: variable['value']
+        for variable in collection.get('variable', [])}
+    requests = []
+
+    def walk(items, prefix, auth):
+        for item in items:
+            name = prefix + item['name'].strip()
+            if 'item' in item:
+                walk(item['item'], name + '/', item.get('auth') or auth)
+            else:
+                requests.append(Request(name, item, auth))
+
+    walk(collection['item'], '', collection.get('auth'))
+    return requests, variables
+
+
+def render(template, variables):
+    """Подставляет значения переменных вида {{name}} в строку."""
+    if template is None:
+        return None
+    return VARIABLE.sub(
+        lambda match: str(variables.get(match.group(1), match.group(0))),
+        template)
+
+
+class Connection:
+    """
+    Минимальный HTTP/1.1 клиент поверх asyncio с постоянным соединением.
+    Одно соединение используется одним виртуальным пользователем.
+    """
+
+    def __init__(self, host, port, use_ssl):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.reader = self.writer = None
+
+    async def request(self, method, target, headers, body):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port, ssl=self.use_ssl or None)
+        payload = body.encode() if body is not None else b''
+        lines = [f'{method} {target} HTTP/1.1', f'Host: {self.host}',
+                 f'Content-Length: {len(payload)}']
+        lines.extend(f'{key}: {value}' for key, value in headers)
+        self.writer.write(
+            ('\r\n'.join(lines) + '\r\n\r\n').encode() + payload)
+        try:
+            return await self._read_response()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.close()
+            raise
+
+    async def _read_response(self):
+        status_line = await self.reader.readuntil(b'\r\n')
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readuntil(b'\r\n')).split(
+                    b';')[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+                chunks.append(chunk[:-2])
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(
+                int(headers['content-length']))
+        else:
+            body = await self.reader.read()
+
+        if headers.get('connection', '').lower() == 'close' or (
+                'content-length' not in headers
+                and 'transfer-encoding' not in headers):
+            self.close()
+        return status, body
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def send(connection, request, variables):
+    """Выполняет запрос коллекции и возвращает статус и разобранный ответ."""
+    url = urlsplit(render(request.url, variables))
+    target = url.path or '/'
+    if url.query:
+        target += '?' + url.query
+    headers = [
+        (key, render(value, variables)) for key, value in request.headers]
+    status, body = await connection.request(
+        request.method, target, headers, render(request.body, variables))
+    try:
+        data = json.loads(body) if body else None
+    except ValueError:
+        data = None
+    return status, data
+
+
+async def run_setup(requests, variables, connection, until):
+    """
+    Выполняет запросы коллекции по порядку до первой папки с именем
+    until и обновляет переменные по ответам. Возвращает число запросов,
+    завершившихся ошибкой сервера.
+    """
+    server_errors = 0
+    for request in requests:
+        if until and request.name.split('/')[0] == until:
+            break
+        status, data = await send(connection, request, variables)
+        if status >= 500:
+            server_errors += 1
+            print(f'  {status} {request.name}', file=sys.stderr)
+        for variable, extract in request.extractors:
+            value = extract(data)
+            if value is not None:
+                variables[variable] = value
+    return server_errors
+
+
+class Stats:
+    """Задержки и статусы ответов по каждому запросу."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.expected = defaultdict(set)
+
+    def record(self, name, latency, status, expected=()):
+        """
+        Запоминает ответ. Коды из expected, например 400 при повторном
+        добавлении в избранное, ошибкой не считаются.
+        """
+        self.latencies[name].append(latency)
+        self.statuses[name][status] += 1
+        self.expected[name].update(expected)
+
+    def report(self, elapsed):
+        rows = []
+        for name in sorted(self.latencies):
+            latencies = sorted(self.latencies[name])
+            statuses = self.statuses[name]
+            count = len(latencies)
+            errors = sum(
+                number for status, number in statuses.items()
+                if status == 'error'
+                or status >= 400 and status != 429
+                and status not in self.expected[name])
+            rows.append({
+                'request': name,
+                'count': count,
+                'rps': round(count / elapsed, 2),
+                'error_rate': round(errors / count, 4),
+                'throttled': statuses.get(429, 0),
+                **{f'p{percentile}': round(
+                    percentile_value(latencies, percentile), 2)
+                   for percentile in PERCENTILES},
+            })
+        return rows
+
+
+def percentile_value(values, percentile):
+    """Перцентиль по методу ближайшего ранга для отсортированного списка."""
+    if not values:
+        return 0.0
+    rank = max(1, -(-percentile * len(values) // 100))
+    return values[rank - 1]
+
+
+def load_scenarios(path, requests):
+    """
+    Загружает сценарии: список объектов с полями name, weight, requests
+    (имена или шаблоны имён запросов коллекции) и необязательными vars —
+    словарём переменных со списками значений, одно из которых случайно
+    выбирается для каждого выполнения сценария, и expected_statuses —
+    кодами ответов 4xx, которые в этом сценарии ошибкой не считаются.
+    """
+    with open(path, encoding='utf-8') as file:
+        scenarios = json.load(file)
+
+    for scenario in scenarios:
+        resolved = []
+        for pattern in scenario['requests']:
+            matches = [
+                request for request in requests
+                if fnmatch.fnmatchcase(request.name, pattern)]
+            if not matches:
+                raise SystemExit(
+                    f'Сценарий {scenario["name"]}: запрос "{pattern}" '
+                    'не найден в коллекции.')
+            resolved.append(matches[0])
+        scenario['requests'] = resolved
+        scenario.setdefault('vars', {})
+        scenario.setdefault('expected_statuses', [])
+    return scenarios
+
+
+async def virtual_user(scenarios, variables, base_url, deadline, stats):
+    """Выполняет случайно выбранные сценарии до наступления deadline."""
+    url = urlsplit(base_url)
+    connection = Connection(
+        url.hostname, url.port or (443 if url.scheme == 'https' else 80),
+        url.scheme == 'https')
+    weights = [scenario['weight'] for scenario in scenarios]
+    try:
+        while time.monotonic() < deadline:
+            scenario = random.choices(scenarios, weights)[0]
+            scenario_variables = dict(variables)
+            for name, values in scenario['vars'].items():
+                scenario_variables[name] = render(
+                    str(random.choice(values)), variables)
+            for request in scenario['requests']:
+                started = time.perf_counter()
+                try:
+                    status, _ = await send(
+                        connection, request, scenario_variables)
+                except (OSError, asyncio.IncompleteReadError, ValueError):
+                    status = 'error'
+                stats.record(
+                    request.name, (time.perf_counter() - started) * 1000,
+                    status, scenario['expected_statuses'])
+    finally:
+        connection.close()
+
+
+def reset_database():
+    """Удаляет объекты предыдущего запуска скриптом clear_db.sh."""
+    result = subprocess.run(['bash', CLEAR_DB_SCRIPT], cwd=BASE_DIR)
+    if result.returncode:
+        print('clear_db.sh завершился с ошибкой, продолжаем.',
+              file=sys.stderr)
+
+
+def print_report(rows, elapsed):
+    header = (f'{"запрос":60} {"кол-во":>7} {"rps":>8} {"ошибки":>7} '
+              f'{"429":>5} {"p50":>8} {"p95":>8} {"p99":>8}')
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        print(f'{row["request"][-60:]:60} {row["count"]:>7} '
+              f'{row["rps"]:>8} {row["error_rate"]:>7.2%} '
+              f'{row["throttled"]:>5} {row["p50"]:>8} {row["p95"]:>8} '
+              f'{row["p99"]:>8}')
+    total = sum(row['count'] for row in rows)
+    print(f'\nВсего запросов: {total} за {elapsed:.1f} с '
+          f'({total / elapsed:.1f} запросов/с). Задержки в мс.')
+
+
+async def main(args):
+    requests, variables = load_collection(args.collection)
+    if args.base_url:
+        variables['baseUrl'] = args.base_url
+    for assignment in args.var:
+        key, _, value = assignment.partition('=')
+        variables[key] = value
+    scenarios = load_scenarios(args.scenarios, requests)
+
+    if args.reset:
+        reset_database()
+
+    base_url = variables['baseUrl']
+    if not args.no_setup:
+        url = urlsplit(base_url)
+        connection = Connection(
+            url.hostname, url.port or (443 if url.scheme == 'https' else 80),
+            url.scheme == 'https')
+        print('Подготовка данных запросами коллекции...')
+        try:
+            server_errors = await run_setup(
+                requests, variables, connection, args.setup_until)
+        finally:
+            connection.close()
+        if server_errors:
+            print(f'Ошибок сервера при подготовке: {server_errors}.',
+                  file=sys.stderr)
+
+    print(f'Нагрузка: {args.concurrency} клиентов, {args.duration} с.')
+    stats = Stats()
+    started = time.monotonic()
+    deadline = started + args.duration
+    await asyncio.gather(*(
+        virtual_user(scenarios, variables, base_url, deadline, stats)
+        for _ in range(args.concurrency)))
+    elapsed = time.monotonic() - started
+
+    rows = stats.report(elapsed)
+    print_report(rows, elapsed)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({'elapsed': elapsed, 'concurrency': args.concurrency,
+                       'requests': rows}, file, ensure_ascii=False, indent=2)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--collection', default=DEFAULT_COLLECTION,
+                        help='Файл postman-коллекции.')
+    parser.add_argument('--scenarios', default=DEFAULT_SCENARIOS,
+                        help='Файл со сценариями нагрузки и их весами.')
+    parser.add_argument('--base-url',
+                        help='Адрес сервера вместо переменной baseUrl.')
+    parser.add_argument('--var', action='append', default=[],
+                        metavar='ИМЯ=ЗНАЧЕНИЕ',
+                        help='Переопределить переменную коллекции.')
+    parser.add_argument('--concurrency', type=int, default=10,
+                        help='Количество одновременных клиентов.')
+    parser.add_argument('--duration', type=float, default=30,
+                        help='Длительность нагрузки в секундах.')
+    parser.add_argument('--setup-until', default='delete_requests',
+                        help='Папка коллекции, перед которой остановить '
+                             'подготовку данных.')
+    parser.add_argument('--no-setup', action='store_true',
+                        help='Не выполнять подготовку данных.')
+    parser.add_argument('--reset', action='store_true',
+                        help='Перед запуском очистить базу скриптом '
+                             'clear_db.sh.')
+    parser.add_argument('--output',
+                        help='Сохранить результаты в JSON-файл.')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))